@@ -0,0 +1 @@
+"""Local stub API and benchmarks for the ProfiMaktab integration."""
@@ -0,0 +1,22 @@
+"""
+Import the integration's HA-free modules (api, parser, refresh, ...) without
+Home Assistant: the package __init__ imports homeassistant, so it is
+registered as a bare namespace instead of being executed.
+"""
+from __future__ import annotations
+
+import importlib
+import sys
+import types
+from pathlib import Path
+
+PACKAGE = "profimaktab"
+PACKAGE_DIR = Path(__file__).resolve().parent.parent / "custom_components" / PACKAGE
+
+
+def load(module: str):
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [str(PACKAGE_DIR)]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{module}")
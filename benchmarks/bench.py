@@ -0,0 +1,380 @@
+"""
+Benchmarks for refresh latency and throughput against the local stub API.
+
+    python -m benchmarks.bench --students 12 --latency 0.05
+    python -m benchmarks.bench --compare benchmarks/results/<previous>.json
+
+Scenarios:
+  cold_start     pooled client login, /profile/, /student_contacts/ and the
+                 first diary fetch + parse for every student
+  refresh        single-student diary fetch + parse latency (p50/p95)
+  button_press   wall time of a bounded concurrent refresh of N students
+  parse          DairyDay.parse throughput on generated diary days
+  transport      per diary fetch latency and CPU: shared default session +
+                 stdlib json (before) vs create_session() + orjson (after),
+                 plus decode-only time per diary body
+  parse_batch    parse_dairy_batch throughput (target: --parse-target
+                 lessons/s) and a day-by-day equality check of
+                 DairyDay.from_batch against DairyDay.parse
+  memory         memory retained by --parse-days parsed days: as_dict()
+                 payload dicts (before) vs the interned DairyDay model
+                 (after)
+
+Results are written to benchmarks/results/ with the current commit so runs
+can be compared across commits.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import tracemalloc
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import aiohttp
+
+from ._integration import load
+from .stub_server import StubConfig, StubServer, make_dairy
+
+api = load("api")
+model = load("model")
+parser = load("parser")
+refresh = load("refresh")
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+BENCHMARKS: Dict[str, Callable[..., Any]] = {}
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__.removeprefix("bench_")] = func
+    return func
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _new_client(session: aiohttp.ClientSession, base_url: str):
+    api.ProfiMaktabClient.BASE_URL = base_url
+    # Fresh breaker state for every scenario
+    api.CircuitBreaker._hosts.clear()  # noqa: SLF001
+    return api.ProfiMaktabClientPool().acquire(
+        session, "bench", "bench", backoff_base=0.05
+    )
+
+
+async def _refresh_student(client, student_id: int, day: date) -> bool:
+    raw, _fingerprint = await client.async_get_dairy_if_changed(student_id, day)
+    model.DairyDay.parse(
+        raw, student=f"Student {student_id}", date=day.isoformat()
+    )
+    return True
+
+
+@benchmark
+async def bench_cold_start(args, server: StubServer) -> Dict[str, float]:
+    durations = []
+    for _ in range(args.runs):
+        async with aiohttp.ClientSession() as session:
+            started = time.perf_counter()
+            client = _new_client(session, server.base_url)
+            profile = await client.async_get_profile()
+            contacts = await client.async_get_student_contacts(
+                profile["additional_data"]["contact_id"]
+            )
+            await asyncio.gather(
+                *(
+                    _refresh_student(client, student["id"], date.today())
+                    for student in contacts["students"]
+                )
+            )
+            durations.append(time.perf_counter() - started)
+    return {
+        "median_s": statistics.median(durations),
+        "max_s": max(durations),
+    }
+
+
+@benchmark
+async def bench_refresh(args, server: StubServer) -> Dict[str, float]:
+    latencies = []
+    async with aiohttp.ClientSession() as session:
+        client = _new_client(session, server.base_url)
+        await client.async_ensure_authenticated()
+        for _ in range(args.samples):
+            started = time.perf_counter()
+            await _refresh_student(client, 1, date.today())
+            latencies.append(time.perf_counter() - started)
+    return {
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+@benchmark
+async def bench_button_press(args, server: StubServer) -> Dict[str, float]:
+    durations = []
+    failures = 0
+    async with aiohttp.ClientSession() as session:
+        client = _new_client(session, server.base_url)
+        await client.async_ensure_authenticated()
+        for _ in range(args.runs):
+            jobs = [
+                refresh.RefreshJob(
+                    key=str(student_id),
+                    name=f"Student {student_id}",
+                    factory=lambda sid=student_id: _refresh_student(
+                        client, sid, date.today()
+                    ),
+                    timeout=args.timeout,
+                )
+                for student_id in range(1, args.students + 1)
+            ]
+            started = time.perf_counter()
+            results = await refresh.async_run_bounded(
+                jobs, max_concurrency=args.concurrency
+            )
+            durations.append(time.perf_counter() - started)
+            failures += sum(1 for result in results if not result.success)
+    return {
+        "median_s": statistics.median(durations),
+        "max_s": max(durations),
+        "failures": failures,
+    }
+
+
+async def _fetch_samples(
+    session: aiohttp.ClientSession, base_url: str, samples: int
+) -> Dict[str, float]:
+    client = _new_client(session, base_url)
+    await client.async_ensure_authenticated()
+    # Прогрев: соединение и первый разбор не входят в замер
+    await _refresh_student(client, 1, date.today())
+    latencies = []
+    cpu_started = time.process_time()
+    for _ in range(samples):
+        started = time.perf_counter()
+        await _refresh_student(client, 1, date.today())
+        latencies.append(time.perf_counter() - started)
+    cpu = time.process_time() - cpu_started
+    client.close()
+    return {
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        # Stub server runs in this process: CPU includes its side too
+        "cpu_ms": cpu / samples * 1000,
+    }
+
+
+@benchmark
+async def bench_transport(args, server: StubServer) -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    tuned_loads = api._json_loads  # noqa: SLF001
+    try:
+        # До: общая сессия по умолчанию и stdlib json
+        api._json_loads = json.loads  # noqa: SLF001
+        async with aiohttp.ClientSession() as session:
+            before = await _fetch_samples(session, server.base_url, args.samples)
+        # После: отдельный keep-alive пул и orjson (если установлен)
+        api._json_loads = tuned_loads  # noqa: SLF001
+        async with api.create_session() as session:
+            after = await _fetch_samples(session, server.base_url, args.samples)
+    finally:
+        api._json_loads = tuned_loads  # noqa: SLF001
+
+    for name, metrics in (("before", before), ("after", after)):
+        for metric, value in metrics.items():
+            results[f"{name}_{metric}"] = value
+
+    body = json.dumps(
+        make_dairy(1, date.today().isoformat(), args.lessons, args.homework_chars)
+    ).encode()
+    for name, loads in (("stdlib", json.loads), ("fast", tuned_loads)):
+        rounds = 2000
+        started = time.perf_counter()
+        for _ in range(rounds):
+            loads(body)
+        results[f"decode_{name}_us"] = (time.perf_counter() - started) / rounds * 1e6
+    return results
+
+
+def _generated_days(args) -> List[tuple]:
+    start = date(2026, 9, 1)
+    days = []
+    for offset in range(args.parse_days):
+        day = (start + timedelta(days=offset)).isoformat()
+        days.append(
+            (day, make_dairy(1, day, args.lessons, args.homework_chars))
+        )
+    return days
+
+
+@benchmark
+async def bench_parse(args, server: StubServer) -> Dict[str, float]:
+    days = _generated_days(args)
+    started = time.perf_counter()
+    for day, raw in days:
+        model.DairyDay.parse(raw, student="Student 1", date=day)
+    elapsed = time.perf_counter() - started
+    return {
+        "days_per_s": len(days) / elapsed,
+        "lessons_per_s": len(days) * args.lessons / elapsed,
+    }
+
+
+@benchmark
+async def bench_parse_batch(args, server: StubServer) -> Dict[str, float]:
+    days = _generated_days(args)
+    started = time.perf_counter()
+    batch = parser.parse_dairy_batch(days)
+    elapsed = time.perf_counter() - started
+
+    # Every day view must match a day parsed on its own
+    mismatches = sum(
+        1
+        for number, (day, raw) in enumerate(days)
+        if model.DairyDay.from_batch(batch, number, student="Student 1").as_dict()
+        != model.DairyDay.parse(raw, student="Student 1", date=day).as_dict()
+    )
+    lessons_per_s = len(batch) / elapsed
+    return {
+        "days_per_s": len(days) / elapsed,
+        "lessons_per_s": lessons_per_s,
+        "target_met": float(lessons_per_s >= args.parse_target),
+        "mismatches": mismatches,
+    }
+
+
+def _retained_bytes(bodies: List[tuple], build: Callable[..., Any]) -> int:
+    """Memory still held after parsing every body (raw JSON is dropped)."""
+    tracemalloc.start()
+    kept = [
+        build(json.loads(body), student="Student 1", date=day)
+        for day, body in bodies
+    ]
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current
+
+
+def _payload_dict(raw, *, student: str, date: str) -> Dict[str, Any]:
+    return model.DairyDay.parse(raw, student=student, date=date).as_dict()
+
+
+@benchmark
+async def bench_memory(args, server: StubServer) -> Dict[str, float]:
+    # Decoded per day, like API responses: no strings shared across days
+    bodies = [(day, json.dumps(raw)) for day, raw in _generated_days(args)]
+    before = _retained_bytes(bodies, _payload_dict)
+    after = _retained_bytes(bodies, model.DairyDay.parse)
+    return {
+        "before_bytes_per_day": before / len(bodies),
+        "after_bytes_per_day": after / len(bodies),
+        "ratio": after / before,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compare(current: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    print(f"\nCompared with {previous['commit']} ({previous['timestamp']}):")
+    for name, metrics in current["results"].items():
+        before = previous["results"].get(name, {})
+        for metric, value in metrics.items():
+            if metric not in before or not before[metric]:
+                continue
+            change = (value - before[metric]) / before[metric] * 100
+            print(
+                f"  {name:13} {metric:14} {before[metric]:12.3f} -> "
+                f"{value:12.3f} ({change:+.1f}%)"
+            )
+
+
+async def _run(args) -> Dict[str, Any]:
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        lessons=args.lessons,
+        homework_chars=args.homework_chars,
+        students=args.students,
+        compress=not args.no_compress,
+    )
+    selected = args.only or list(BENCHMARKS)
+    results: Dict[str, Any] = {}
+    async with StubServer(config) as server:
+        for name in selected:
+            results[name] = await BENCHMARKS[name](args, server)
+            print(
+                f"{name:13} "
+                + "  ".join(f"{k}={v:.3f}" for k, v in results[name].items())
+            )
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("compare", "only", "no_save")
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(
+        description="ProfiMaktab refresh benchmarks"
+    )
+    arg_parser.add_argument("--students", type=int, default=12)
+    arg_parser.add_argument("--concurrency", type=int, default=4)
+    arg_parser.add_argument("--timeout", type=float, default=60)
+    arg_parser.add_argument("--latency", type=float, default=0.05)
+    arg_parser.add_argument("--jitter", type=float, default=0.01)
+    arg_parser.add_argument("--error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--lessons", type=int, default=8)
+    arg_parser.add_argument("--homework-chars", type=int, default=200)
+    arg_parser.add_argument("--runs", type=int, default=5)
+    arg_parser.add_argument("--samples", type=int, default=50)
+    arg_parser.add_argument("--no-compress", action="store_true")
+    arg_parser.add_argument("--parse-days", type=int, default=2000)
+    arg_parser.add_argument("--parse-target", type=float, default=500_000)
+    arg_parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS))
+    arg_parser.add_argument("--compare", type=Path)
+    arg_parser.add_argument("--no-save", action="store_true")
+    args = arg_parser.parse_args()
+
+    report = asyncio.run(_run(args))
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit']}.json"
+        path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nSaved {path}")
+
+    if args.compare:
+        _compare(report, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
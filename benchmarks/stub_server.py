@@ -0,0 +1,219 @@
+"""
+Local aiohttp stub of the ProfiMaktab API.
+
+Serves /token/, /token/refresh/, /profile/, /student_contacts/{id}/,
+/student_students/{id} and /dairy/ under /api with injectable latency,
+error rate and payload size. Diary responses are compressed when the
+client sends Accept-Encoding (disable with --no-compress).
+
+    python -m benchmarks.stub_server --port 8080 --latency 0.05 --error-rate 0.02
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from aiohttp import web
+
+SUBJECTS = [
+    "Matematika",
+    "Ona tili",
+    "Ingliz tili",
+    "Rus tili",
+    "Fizika",
+    "Kimyo",
+    "Biologiya",
+    "Tarix",
+    "Geografiya",
+    "Informatika",
+]
+
+
+@dataclass
+class StubConfig:
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    lessons: int = 8
+    homework_chars: int = 200
+    students: int = 3
+    token_ttl: int = 300
+    compress: bool = True
+    seed: int = 1
+    counters: Dict[str, int] = field(default_factory=dict)
+
+
+def make_jwt(ttl: int) -> str:
+    def _b64(data: Dict[str, Any]) -> str:
+        raw = json.dumps(data, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    claims = {"exp": int(time.time()) + ttl, "token_type": "access"}
+    return f"{_b64({'alg': 'HS256', 'typ': 'JWT'})}.{_b64(claims)}.stub"
+
+
+def make_dairy(
+    student_id: int, day: str, lessons: int, homework_chars: int
+) -> List[Dict[str, Any]]:
+    """Deterministic diary for (student, day) shaped like the real /dairy/."""
+    rnd = random.Random(f"{student_id}:{day}")
+    items = []
+    for order in range(1, lessons + 1):
+        subject_id = rnd.randrange(len(SUBJECTS))
+        item: Dict[str, Any] = {
+            "id": rnd.randrange(10**6),
+            "lesson_order": order,
+            "subject": {"id": subject_id, "name": SUBJECTS[subject_id]},
+            "themes": [
+                {
+                    "title": f"Mavzu {rnd.randrange(100)}",
+                    "notes": "x" * homework_chars,
+                }
+            ],
+            "marks": [],
+        }
+        if rnd.random() < 0.4:
+            item["marks"].append(
+                {"value": rnd.choice([3, 4, 5, 5]), "reason": "Javob"}
+            )
+        items.append(item)
+    rnd.shuffle(items)
+    return items
+
+
+def create_app(config: StubConfig) -> web.Application:
+    rnd = random.Random(config.seed)
+
+    async def _delay_and_fail(request: web.Request) -> None:
+        name = request.match_info.route.name or request.path
+        config.counters[name] = config.counters.get(name, 0) + 1
+        if config.latency or config.jitter:
+            await asyncio.sleep(config.latency + rnd.uniform(0, config.jitter))
+        if config.error_rate and rnd.random() < config.error_rate:
+            raise web.HTTPServiceUnavailable()
+
+    def _authorized(request: web.Request) -> None:
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            raise web.HTTPUnauthorized()
+
+    async def token(request: web.Request) -> web.Response:
+        await _delay_and_fail(request)
+        body = await request.json()
+        if not body.get("username") or not body.get("password"):
+            raise web.HTTPUnauthorized()
+        return web.json_response(
+            {"access": make_jwt(config.token_ttl), "refresh": "stub-refresh"}
+        )
+
+    async def token_refresh(request: web.Request) -> web.Response:
+        await _delay_and_fail(request)
+        return web.json_response({"access": make_jwt(config.token_ttl)})
+
+    async def profile(request: web.Request) -> web.Response:
+        await _delay_and_fail(request)
+        _authorized(request)
+        return web.json_response(
+            {"id": 1, "additional_data": {"contact_id": 1}}
+        )
+
+    async def student_contacts(request: web.Request) -> web.Response:
+        await _delay_and_fail(request)
+        _authorized(request)
+        return web.json_response(
+            {
+                "id": int(request.match_info["contact_id"]),
+                "students": [
+                    {"id": sid, "user": {"name": f"Student {sid}"}}
+                    for sid in range(1, config.students + 1)
+                ],
+            }
+        )
+
+    async def student(request: web.Request) -> web.Response:
+        await _delay_and_fail(request)
+        _authorized(request)
+        sid = int(request.match_info["student_id"])
+        return web.json_response({"id": sid, "user": {"name": f"Student {sid}"}})
+
+    async def dairy(request: web.Request) -> web.Response:
+        await _delay_and_fail(request)
+        _authorized(request)
+        response = web.json_response(
+            make_dairy(
+                int(request.query["student"]),
+                request.query["for_date"],
+                config.lessons,
+                config.homework_chars,
+            )
+        )
+        if config.compress:
+            response.enable_compression()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/api/token/", token, name="token")
+    app.router.add_post("/api/token/refresh/", token_refresh, name="token_refresh")
+    app.router.add_get("/api/profile/", profile, name="profile")
+    app.router.add_get(
+        "/api/student_contacts/{contact_id}/", student_contacts, name="contacts"
+    )
+    app.router.add_get("/api/student_students/{student_id}", student, name="student")
+    app.router.add_get("/api/dairy/", dairy, name="dairy")
+    return app
+
+
+class StubServer:
+    """Run the stub on 127.0.0.1 inside the current event loop."""
+
+    def __init__(self, config: StubConfig, port: int = 0) -> None:
+        self.config = config
+        self._port = port
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    async def __aenter__(self) -> "StubServer":
+        self._runner = web.AppRunner(create_app(self.config))
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", self._port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # noqa: SLF001
+        self.base_url = f"http://127.0.0.1:{port}/api"
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        assert self._runner is not None
+        await self._runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--lessons", type=int, default=8)
+    parser.add_argument("--homework-chars", type=int, default=200)
+    parser.add_argument("--students", type=int, default=3)
+    parser.add_argument("--no-compress", action="store_true")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        lessons=args.lessons,
+        homework_chars=args.homework_chars,
+        students=args.students,
+        compress=not args.no_compress,
+    )
+    web.run_app(create_app(config), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,23 +2,55 @@ from __future__ import annotations
 
 import logging
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import SOURCE_INTEGRATION_DISCOVERY, ConfigEntry
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import discovery_flow
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
 
-from .api import ProfiMaktabClient
+from .api import ProfiMaktabApiError, ProfiMaktabClientPool, create_session
+from .ratelimit import RequestScheduler
 from .const import (
     DOMAIN,
     CONF_USERNAME,
     CONF_PASSWORD,
     DATA_CLIENT,
+    DATA_CLIENTS,
     DATA_PAYLOAD,
+    DATA_STATS,
+    DATA_SCHEDULER,
+    DATA_DAY_CHANGE,
+    DATA_BACKFILL,
+    DATA_DISCOVERED,
+    DATA_SESSION,
+    DATA_DEDICATED_CONNECTION,
+    DATA_REQUEST_SCHEDULER,
+    STORAGE_VERSION,
+    CONF_AUTO_UPDATE,
+    DEFAULT_AUTO_UPDATE,
+    CONF_DEDICATED_CONNECTION,
+    DEFAULT_DEDICATED_CONNECTION,
+    CONF_RATE_LIMIT,
+    CONF_RATE_BURST,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_RATE_BURST,
+)
+from .backfill import ProfiMaktabBackfill
+from .config_flow import children_from_contacts, configured_student_ids
+from .nextday import ProfiMaktabNextDay
+from .scheduler import ProfiMaktabScheduler
+from .services import async_register_services
+from .update import (
+    async_load_entry_payload,
+    async_loaded_entries,
+    async_update_entry,
+    local_today,
 )
-from .update import async_update_entry
 
 _LOGGER = logging.getLogger(__name__)
 
-SENSOR_PLATFORMS = ["sensor"]
+ENTRY_PLATFORMS = ["sensor", "calendar"]
 BUTTON_PLATFORMS = ["button"]
 
 
@@ -27,6 +59,12 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     _LOGGER.debug("ProfiMaktab: async_setup called")
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN].setdefault("button_created", False)
+    hass.data[DOMAIN].setdefault(DATA_CLIENTS, ProfiMaktabClientPool())
+    hass.data[DOMAIN].setdefault(
+        DATA_REQUEST_SCHEDULER,
+        RequestScheduler(DEFAULT_RATE_LIMIT, DEFAULT_RATE_BURST),
+    )
+    async_register_services(hass)
     _LOGGER.info("ProfiMaktab: initial setup complete")
     return True
 
@@ -39,62 +77,243 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         entry.entry_id,
     )
     
-    session = async_get_clientsession(hass)
+    dedicated = entry.options.get(
+        CONF_DEDICATED_CONNECTION, DEFAULT_DEDICATED_CONNECTION
+    )
+    if dedicated:
+        session = _async_dedicated_session(hass)
+    else:
+        session = async_get_clientsession(hass)
 
-    # 🔌 Runtime API client
-    client = ProfiMaktabClient(
-        session=session,
-        username=entry.data[CONF_USERNAME],
-        password=entry.data[CONF_PASSWORD],
+    # 🔌 Runtime API client — один на аккаунт (и выбор пула соединений),
+    # общий для всех учеников
+    pool: ProfiMaktabClientPool = hass.data[DOMAIN][DATA_CLIENTS]
+    client = pool.acquire(
+        session,
+        entry.data[CONF_USERNAME],
+        entry.data[CONF_PASSWORD],
+        dedicated=dedicated,
+        today=local_today,
+        scheduler=hass.data[DOMAIN][DATA_REQUEST_SCHEDULER],
+    )
+    _LOGGER.debug(
+        "ProfiMaktab: API client acquired for %s (%d account(s))",
+        entry.title,
+        len(pool),
     )
-    _LOGGER.debug("ProfiMaktab: API client created for %s", entry.title)
 
-    hass.data[DOMAIN][entry.entry_id] = {
-        DATA_CLIENT: client,
-        DATA_PAYLOAD: None,
-    }
+    try:
+        hass.data[DOMAIN][entry.entry_id] = {
+            DATA_CLIENT: client,
+            DATA_DEDICATED_CONNECTION: dedicated,
+            DATA_PAYLOAD: None,
+            # Счётчики пропуска неизменённых ответов
+            DATA_STATS: {"unchanged": 0, "changed": 0},
+        }
 
-    # 📟 Сенсоры — для КАЖДОЙ записи
-    _LOGGER.debug("ProfiMaktab: setting up sensors for %s", entry.title)
-    await hass.config_entries.async_forward_entry_setups(
-        entry, SENSOR_PLATFORMS
-    )
+        _async_configure_rate_limit(hass)
+
+        # 💾 Последние сохранённые данные — показываем сразу, помечены как stale
+        await async_load_entry_payload(hass, entry)
 
-    # 🔘 Глобальная кнопка — ТОЛЬКО ОДИН РАЗ
-    if not hass.data[DOMAIN]["button_created"]:
-        _LOGGER.info("ProfiMaktab: creating global update button")
+        # 📟 Сенсоры и календарь — для КАЖДОЙ записи
+        _LOGGER.debug("ProfiMaktab: setting up sensors for %s", entry.title)
         await hass.config_entries.async_forward_entry_setups(
-            entry, BUTTON_PLATFORMS
+            entry, ENTRY_PLATFORMS
         )
-        hass.data[DOMAIN]["button_created"] = True
-    else:
-        _LOGGER.debug("ProfiMaktab: button already created, skipping")
 
-    # 🔄 Автоматическое первичное обновление данных
-    _LOGGER.debug("ProfiMaktab: starting initial data update for %s", entry.title)
-    try:
-        await async_update_entry(hass, entry)
-        _LOGGER.info("ProfiMaktab: initial update successful for %s", entry.title)
-    except Exception as err:
-        _LOGGER.error(
-            "ProfiMaktab: initial update FAILED for %s: %s",
-            entry.title,
-            err,
-            exc_info=True,
+        # 🔘 Глобальная кнопка — ТОЛЬКО ОДИН РАЗ
+        if not hass.data[DOMAIN]["button_created"]:
+            _LOGGER.info("ProfiMaktab: creating global update button")
+            await hass.config_entries.async_forward_entry_setups(
+                entry, BUTTON_PLATFORMS
+            )
+            hass.data[DOMAIN]["button_created"] = True
+        else:
+            _LOGGER.debug("ProfiMaktab: button already created, skipping")
+
+        # 🔄 Первичное обновление — в фоне, не блокируя запуск HA
+        _LOGGER.debug("ProfiMaktab: scheduling initial data update for %s", entry.title)
+        entry.async_create_background_task(
+            hass,
+            async_update_entry(hass, entry),
+            f"{DOMAIN}_initial_update_{entry.entry_id}",
         )
-        # Продолжаем setup даже если update упал
+
+        # ⏰ Встроенный планировщик — только если включён в настройках
+        if entry.options.get(CONF_AUTO_UPDATE, DEFAULT_AUTO_UPDATE):
+            scheduler = ProfiMaktabScheduler(hass, entry)
+            hass.data[DOMAIN][entry.entry_id][DATA_SCHEDULER] = scheduler
+            scheduler.async_start()
+            entry.async_on_unload(scheduler.async_stop)
+            _LOGGER.info("ProfiMaktab: scheduler enabled for %s", entry.title)
+
+        # 🌙 Смена дня в полночь (по часовому поясу HA) и вечерняя предзагрузка
+        day_change = ProfiMaktabNextDay(hass, entry)
+        hass.data[DOMAIN][entry.entry_id][DATA_DAY_CHANGE] = day_change
+        day_change.async_start()
+        entry.async_on_unload(day_change.async_stop)
+
+        # 📥 Незавершённая загрузка истории — продолжаем с контрольной точки
+        backfill = ProfiMaktabBackfill(hass, entry)
+        hass.data[DOMAIN][entry.entry_id][DATA_BACKFILL] = backfill
+        entry.async_on_unload(backfill.async_stop)
+        if checkpoint := await backfill.async_pending():
+            _LOGGER.info(
+                "ProfiMaktab: resuming backfill for %s from %s",
+                entry.title,
+                checkpoint["next"],
+            )
+            entry.async_create_background_task(
+                hass,
+                backfill.async_run(checkpoint),
+                f"{DOMAIN}_backfill_{entry.entry_id}",
+            )
+
+        # 👪 Новые дети в аккаунте — предлагаем добавить без повторного входа
+        entry.async_create_background_task(
+            hass,
+            _async_discover_children(hass, entry),
+            f"{DOMAIN}_discover_children_{entry.entry_id}",
+        )
+
+        entry.async_on_unload(entry.add_update_listener(_async_options_updated))
+
+    except BaseException:
+        # async_unload_entry не вызывается для неудачной настройки —
+        # иначе ссылка на общий клиент (и его сессию) останется навсегда
+        _LOGGER.debug(
+            "ProfiMaktab: setup of %s failed, releasing API client", entry.title
+        )
+        await _async_release_client(hass, entry, dedicated)
+        raise
 
     _LOGGER.info("ProfiMaktab: setup complete for %s", entry.title)
     return True
 
 
+@callback
+def _async_configure_rate_limit(hass: HomeAssistant) -> None:
+    """The strictest rate limit among loaded entries applies to all of them."""
+    limits = [
+        (
+            entry.options.get(CONF_RATE_LIMIT, DEFAULT_RATE_LIMIT),
+            entry.options.get(CONF_RATE_BURST, DEFAULT_RATE_BURST),
+        )
+        for entry, _entry_data in async_loaded_entries(hass)
+    ]
+    if limits:
+        hass.data[DOMAIN][DATA_REQUEST_SCHEDULER].configure(
+            min(rate for rate, _burst in limits),
+            min(burst for _rate, burst in limits),
+        )
+
+
+@callback
+def _async_dedicated_session(hass: HomeAssistant):
+    """Shared keep-alive session for the API host, closed with HA or its last client."""
+    session = hass.data[DOMAIN].get(DATA_SESSION)
+    if session is not None and not session.closed:
+        return session
+
+    session = create_session()
+    hass.data[DOMAIN][DATA_SESSION] = session
+
+    async def _async_close(_event: Event) -> None:
+        await session.close()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close)
+    _LOGGER.debug("ProfiMaktab: dedicated API connection pool created")
+    return session
+
+
+async def _async_discover_children(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """
+    Start a discovery flow for every child of this account that has no
+    entry yet. Runs once per account per HA start, using the shared client.
+    """
+    contact_id = entry.data.get("contact_id")
+    account = entry.data[CONF_USERNAME]
+    discovered: set = hass.data[DOMAIN].setdefault(DATA_DISCOVERED, set())
+    if not contact_id or account in discovered:
+        return
+    discovered.add(account)
+
+    client = hass.data[DOMAIN][entry.entry_id][DATA_CLIENT]
+    try:
+        data = await client.async_get_student_contacts(contact_id)
+    except ProfiMaktabApiError as err:
+        # Попробуем снова при следующей загрузке записи
+        discovered.discard(account)
+        _LOGGER.debug("ProfiMaktab: child discovery failed for %s: %s", entry.title, err)
+        return
+
+    configured = configured_student_ids(hass)
+    for student_id, child in children_from_contacts(data).items():
+        if student_id in configured:
+            continue
+        _LOGGER.info("ProfiMaktab: discovered new student %s", child["student_name"])
+        discovery_flow.async_create_flow(
+            hass,
+            DOMAIN,
+            context={"source": SOURCE_INTEGRATION_DISCOVERY},
+            data={
+                CONF_USERNAME: entry.data[CONF_USERNAME],
+                CONF_PASSWORD: entry.data[CONF_PASSWORD],
+                "contact_id": contact_id,
+                **child,
+            },
+        )
+
+
+async def _async_options_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the entry so new options take effect."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload ProfiMaktab config entry."""
     _LOGGER.info("ProfiMaktab: unloading entry %s", entry.title)
     unload_ok = await hass.config_entries.async_unload_platforms(
-        entry, SENSOR_PLATFORMS
+        entry, ENTRY_PLATFORMS
     )
 
-    hass.data[DOMAIN].pop(entry.entry_id, None)
+    entry_data = hass.data[DOMAIN].get(entry.entry_id) or {}
+    # Опции могли измениться — освобождаем клиента с тем ключом, что при настройке
+    await _async_release_client(
+        hass, entry, entry_data.get(DATA_DEDICATED_CONNECTION, False)
+    )
     _LOGGER.debug("ProfiMaktab: entry %s unloaded", entry.title)
     return unload_ok
+
+
+async def _async_release_client(
+    hass: HomeAssistant, entry: ConfigEntry, dedicated: bool
+) -> None:
+    """Drop the entry's runtime data and its reference to the shared client."""
+    hass.data[DOMAIN].pop(entry.entry_id, None)
+    pool: ProfiMaktabClientPool = hass.data[DOMAIN][DATA_CLIENTS]
+    pool.release(
+        entry.data[CONF_USERNAME],
+        entry.data[CONF_PASSWORD],
+        dedicated=dedicated,
+    )
+
+    _async_configure_rate_limit(hass)
+
+    # Отдельный пул соединений больше никем не используется — закрываем
+    session = hass.data[DOMAIN].get(DATA_SESSION)
+    if session is not None and not pool.uses_session(session):
+        hass.data[DOMAIN].pop(DATA_SESSION)
+        await session.close()
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove stored payload when a config entry is deleted."""
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}").async_remove()
+    await Store(
+        hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}_backfill"
+    ).async_remove()
+    await Store(
+        hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}_days"
+    ).async_remove()
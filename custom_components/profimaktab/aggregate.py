@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .const import TERM_STARTS
+
+# Key of the all-subjects total inside a period
+ALL_SUBJECTS = ""
+UNKNOWN_SUBJECT = "—"
+
+
+def week_key(day: date) -> str:
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def school_year_key(day: date) -> str:
+    """School year starts in September: 2026-10-17 → "2026-2027"."""
+    start = day.year if day.month >= TERM_STARTS[0][0] else day.year - 1
+    return f"{start}-{start + 1}"
+
+
+def term_key(day: date) -> str:
+    """Term inside the school year, e.g. "2026-2027/T2"."""
+    year = school_year_key(day)
+    start_year = int(year[:4])
+    term = 1
+    for index, (month, mday) in enumerate(TERM_STARTS):
+        term_year = start_year if month >= TERM_STARTS[0][0] else start_year + 1
+        if day >= date(term_year, month, mday):
+            term = index + 1
+    return f"{year}/T{term}"
+
+
+class MarkAggregator:
+    """
+    Running mark sums and counts per period (week, term, school year) and
+    subject.
+
+    Each day is ingested once; re-ingesting a day replaces its previous
+    contribution, so an update costs O(marks of that day) and reading an
+    average is O(1).
+    """
+
+    def __init__(self) -> None:
+        # "YYYY-MM-DD" -> [(subject, mark), ...] already counted
+        self._days: Dict[str, List[Tuple[str, int]]] = {}
+        # period -> subject -> [sum, count]
+        self._totals: Dict[str, Dict[str, List[int]]] = {}
+        self._subjects: Set[str] = set()
+
+    @staticmethod
+    def periods(day: date) -> Tuple[str, str, str]:
+        return week_key(day), term_key(day), school_year_key(day)
+
+    def add_day(self, day: date, marks: Iterable[Tuple[str, int]]) -> Set[str]:
+        """Ingest a day's marks. Returns subjects seen for the first time."""
+        marks = list(marks)
+        key = day.isoformat()
+        previous = self._days.get(key)
+        if previous == marks:
+            return set()
+
+        periods = self.periods(day)
+        if previous:
+            self._apply(periods, previous, -1)
+        if marks:
+            self._days[key] = marks
+            self._apply(periods, marks, 1)
+        else:
+            self._days.pop(key, None)
+
+        new_subjects = {subject for subject, _ in marks} - self._subjects
+        self._subjects |= new_subjects
+        return new_subjects
+
+    def _apply(
+        self,
+        periods: Tuple[str, ...],
+        marks: List[Tuple[str, int]],
+        sign: int,
+    ) -> None:
+        for period in periods:
+            totals = self._totals.setdefault(period, {})
+            for subject, value in marks:
+                for key in (subject, ALL_SUBJECTS):
+                    item = totals.setdefault(key, [0, 0])
+                    item[0] += sign * value
+                    item[1] += sign
+                    if item[1] == 0:
+                        del totals[key]
+            if not totals:
+                del self._totals[period]
+
+    def average(self, period: str, subject: str = ALL_SUBJECTS) -> Optional[float]:
+        item = self._totals.get(period, {}).get(subject)
+        if not item or not item[1]:
+            return None
+        return round(item[0] / item[1], 2)
+
+    def count(self, period: str, subject: str = ALL_SUBJECTS) -> int:
+        item = self._totals.get(period, {}).get(subject)
+        return item[1] if item else 0
+
+    @property
+    def subjects(self) -> Set[str]:
+        return set(self._subjects)
+
+    def has_day(self, day: date) -> bool:
+        return day.isoformat() in self._days
+
+    # ---------- Persistence ----------
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "days": {
+                key: [list(item) for item in marks]
+                for key, marks in self._days.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "MarkAggregator":
+        """Rebuild from stored days (totals are derived, not stored)."""
+        aggregator = cls()
+        for key, marks in ((data or {}).get("days") or {}).items():
+            aggregator.add_day(
+                date.fromisoformat(key),
+                [(subject, int(value)) for subject, value in marks],
+            )
+        return aggregator
@@ -1,14 +1,75 @@
 from __future__ import annotations
 
 import asyncio
+import base64
+import binascii
+import hashlib
+import json
 import logging
-from datetime import date
-from typing import Any, Dict, Optional
+import random
+import re
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+from urllib.parse import urlsplit
 
 import aiohttp
 
+from .cache import TTLCache
+from .ratelimit import RequestScheduler
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - HA ships orjson
+    orjson = None
+
+try:
+    from aiohttp.compression_utils import HAS_BROTLI
+except ImportError:  # pragma: no cover - very old aiohttp
+    HAS_BROTLI = False
+
 _LOGGER = logging.getLogger(__name__)
 
+# orjson is several times faster than the stdlib decoder on diary bodies
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# Only advertise brotli when aiohttp can decode it
+ACCEPT_ENCODING = "gzip, deflate, br" if HAS_BROTLI else "gzip, deflate"
+
+# Dedicated transport for api.profimaktab.uz (see create_session)
+CONNECTION_LIMIT_PER_HOST = 8
+KEEPALIVE_TIMEOUT = 60
+DNS_CACHE_TTL = 600
+
+
+def create_session(**kwargs: Any) -> aiohttp.ClientSession:
+    """
+    Session with its own keep-alive pool for the API host: a few
+    persistent connections, kept open between refreshes, and cached DNS.
+    The caller owns the session and must close it.
+    """
+    connector = aiohttp.TCPConnector(
+        limit_per_host=CONNECTION_LIMIT_PER_HOST,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        enable_cleanup_closed=True,
+    )
+    return aiohttp.ClientSession(connector=connector, **kwargs)
+
 
 class ProfiMaktabApiError(Exception):
     """Base API error."""
@@ -18,11 +79,292 @@ class ProfiMaktabAuthError(ProfiMaktabApiError):
     """Authentication failed."""
 
 
+class ProfiMaktabCircuitOpenError(ProfiMaktabApiError):
+    """Backend considered down; request not sent."""
+
+
+class ProfiMaktabTokenUnavailableError(ProfiMaktabApiError):
+    """Token endpoint answered 429 or 5xx; retryable, not an auth failure."""
+
+    def __init__(self, status: int, retry_after: Optional[float] = None) -> None:
+        super().__init__(f"Token endpoint error {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _token_data(body: bytes, endpoint: str) -> Dict[str, Any]:
+    """Decoded token endpoint body; anything but a JSON object is an API error."""
+    try:
+        data = _json_loads(body)
+    except ValueError as err:
+        raise ProfiMaktabApiError(f"Invalid JSON from {endpoint}") from err
+    if not isinstance(data, dict):
+        raise ProfiMaktabApiError(f"Unexpected response from {endpoint}")
+    return data
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.
+    Opens after failure_threshold consecutive failures; after reset_timeout
+    one trial request is let through (half-open) and closes it on success.
+    """
+
+    _hosts: Dict[str, "CircuitBreaker"] = {}
+
+    def __init__(
+        self,
+        host: str,
+        *,
+        failure_threshold: int = 5,
+        reset_timeout: float = 60.0,
+    ) -> None:
+        self.host = host
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @classmethod
+    def for_host(cls, host: str) -> "CircuitBreaker":
+        """Shared breaker for a host."""
+        breaker = cls._hosts.get(host)
+        if breaker is None:
+            breaker = cls._hosts[host] = cls(host)
+        return breaker
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self._reset_timeout:
+            return "half_open"
+        return "open"
+
+    def retry_in(self) -> float:
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._reset_timeout - (time.monotonic() - self._opened_at))
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self) -> None:
+        """Give up a half-open trial without an outcome (e.g. cancelled)."""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            _LOGGER.info("ProfiMaktab: %s is back, closing circuit", self.host)
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._trial_in_flight or (
+            self._opened_at is None and self._failures >= self._failure_threshold
+        ):
+            _LOGGER.warning(
+                "ProfiMaktab: %s failing (%d errors), opening circuit for %.0fs",
+                self.host,
+                self._failures,
+                self._reset_timeout,
+            )
+            self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+def _retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Parse Retry-After (seconds or HTTP date)."""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+_ID_SEGMENT = re.compile(r"/\d+")
+
+
+@dataclass
+class EndpointMetrics:
+    """HTTP attempts against one endpoint."""
+
+    requests: int = 0
+    errors: int = 0
+    bytes: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+    last_latency: float = 0.0
+    # One counter per LATENCY_BUCKETS_MS bound, plus overflow
+    histogram: List[int] = field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    )
+    # Status code (or "error" for connection failures) -> count
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["latency_avg"] = (
+            self.latency_total / self.requests if self.requests else None
+        )
+        data["histogram"] = {
+            label: count
+            for label, count in zip(
+                [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + ["inf"],
+                self.histogram,
+            )
+        }
+        return data
+
+
+@dataclass
+class ClientMetrics:
+    """Request counters and per-endpoint timings of one client."""
+
+    requests: int = 0
+    coalesced: int = 0
+    retries: int = 0
+    relogins: int = 0
+    circuit_rejections: int = 0
+    endpoints: Dict[str, EndpointMetrics] = field(default_factory=dict)
+
+    def record(
+        self,
+        path: str,
+        status: Optional[int],
+        latency: float,
+        size: int,
+    ) -> None:
+        """Record one HTTP attempt; status None means a connection error."""
+        endpoint = self.endpoints.setdefault(
+            _ID_SEGMENT.sub("/{id}", path), EndpointMetrics()
+        )
+        endpoint.requests += 1
+        endpoint.bytes += size
+        endpoint.latency_total += latency
+        endpoint.latency_max = max(endpoint.latency_max, latency)
+        endpoint.last_latency = latency
+        endpoint.histogram[bisect_left(LATENCY_BUCKETS_MS, latency * 1000)] += 1
+        key = str(status) if status is not None else "error"
+        endpoint.statuses[key] = endpoint.statuses.get(key, 0) + 1
+        if status is None or status >= 400:
+            endpoint.errors += 1
+
+    @contextmanager
+    def track(self, path: str) -> Iterator[Dict[str, Any]]:
+        """Time a block; the caller fills in "status" and "size"."""
+        sample: Dict[str, Any] = {"status": None, "size": 0}
+        started = time.monotonic()
+        try:
+            yield sample
+        finally:
+            self.record(
+                path, sample["status"], time.monotonic() - started, sample["size"]
+            )
+
+    @property
+    def error_rate(self) -> Optional[float]:
+        """Share of HTTP attempts that failed (status >= 400 or no response)."""
+        total = sum(endpoint.requests for endpoint in self.endpoints.values())
+        if not total:
+            return None
+        errors = sum(endpoint.errors for endpoint in self.endpoints.values())
+        return errors / total
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "relogins": self.relogins,
+            "circuit_rejections": self.circuit_rejections,
+            "error_rate": self.error_rate,
+            "endpoints": {
+                path: endpoint.as_dict()
+                for path, endpoint in self.endpoints.items()
+            },
+        }
+
+
+@dataclass
+class ProfiMaktabResponse:
+    """Undecoded API response."""
+
+    status: int
+    headers: Mapping[str, str]
+    body: bytes
+
+    def json(self) -> Any:
+        if not self.body:
+            return None
+        try:
+            return _json_loads(self.body)
+        except ValueError as err:
+            # orjson/json decode errors are ValueError, not aiohttp errors
+            raise ProfiMaktabApiError("Invalid JSON in API response") from err
+
+    def fingerprint(self) -> str:
+        """Validator for change detection: ETag, Last-Modified or body hash."""
+        etag = self.headers.get("ETag")
+        if etag:
+            return f"etag:{etag}"
+        last_modified = self.headers.get("Last-Modified")
+        if last_modified:
+            return f"lm:{last_modified}"
+        return "sha1:" + hashlib.sha1(self.body).hexdigest()
+
+
+def _jwt_expiry(token: str) -> Optional[float]:
+    """Return the exp claim of a JWT (unverified), or None if not a JWT."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError, binascii.Error):
+        return None
+
+
 class ProfiMaktabClient:
     """HTTP client for ProfiMaktab API."""
 
     BASE_URL = "https://api.profimaktab.uz/api"
     TOKEN_ENDPOINT = "/token/"
+    REFRESH_ENDPOINT = "/token/refresh/"
+    # Renew the access token this many seconds before it expires
+    # (at most half of the token lifetime)
+    RENEW_MARGIN = 60
+    # Background renewal only while requests are made; idle clients renew
+    # lazily on the next request
+    RENEW_IDLE_AFTER = 15 * 60
+    # Background renewals are never closer together than this
+    RENEW_MIN_DELAY = 30
+    # Diary cache: today/future days change during the day, past days do not
+    DAIRY_TTL_CURRENT = 5 * 60
+    DAIRY_TTL_PAST = 7 * 24 * 3600
+    DAIRY_CACHE_SIZE = 2048
+    # Profile, contacts and student records change rarely
+    META_TTL = 24 * 3600
+    META_CACHE_SIZE = 64
 
     def __init__(
         self,
@@ -31,19 +373,51 @@ class ProfiMaktabClient:
         password: str,
         *,
         request_timeout: int = 30,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        today: Optional[Callable[[], date]] = None,
+        scheduler: Optional[RequestScheduler] = None,
     ) -> None:
         self._session = session
+        # "Today" in the user's time zone (HA passes its own); host date otherwise
+        self._today = today or date.today
+        # Shared rate limit of the integration; None sends immediately
+        self._scheduler = scheduler
+        self._default_headers = {
+            "Accept": "application/json",
+            "Accept-Encoding": ACCEPT_ENCODING,
+        }
         self._username = username
         self._password = password
         self._timeout = aiohttp.ClientTimeout(total=request_timeout)
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._breaker = CircuitBreaker.for_host(urlsplit(self.BASE_URL).netloc)
 
         self._access_token: Optional[str] = None
+        self._refresh_token: Optional[str] = None
+        self._access_expires_at: Optional[float] = None
+        self._renew_margin: float = self.RENEW_MARGIN
+        self._last_used: Optional[float] = None
         self._auth_lock = asyncio.Lock()
+        self._renew_handle: Optional[asyncio.TimerHandle] = None
+        self._renew_task: Optional[asyncio.Task] = None
+
+        self._inflight: Dict[Tuple[Any, ...], asyncio.Task] = {}
+        self.metrics = ClientMetrics()
+
+        self._dairy_cache: TTLCache[Tuple[int, date], Any] = TTLCache(
+            self.DAIRY_CACHE_SIZE
+        )
+        # path -> response of a metadata endpoint
+        self._meta_cache: TTLCache[str, Any] = TTLCache(self.META_CACHE_SIZE)
 
     # ---------- Auth ----------
 
     async def async_login(self) -> None:
-        """Authenticate and obtain access token."""
+        """Authenticate and obtain access and refresh tokens."""
         url = f"{self.BASE_URL}{self.TOKEN_ENDPOINT}"
         payload = {
             "username": self._username,
@@ -52,39 +426,201 @@ class ProfiMaktabClient:
 
         _LOGGER.debug("ProfiMaktab: logging in")
 
-        async with self._session.post(
-            url, json=payload, timeout=self._timeout
-        ) as resp:
-            if resp.status != 200:
-                text = await resp.text()
-                _LOGGER.error(
-                    "ProfiMaktab: login failed (%s): %s", resp.status, text
-                )
-                raise ProfiMaktabAuthError("Login failed")
+        await self._async_throttle()
+        with self.metrics.track(self.TOKEN_ENDPOINT) as sample:
+            async with self._session.post(
+                url,
+                json=payload,
+                headers=self._default_headers,
+                timeout=self._timeout,
+            ) as resp:
+                sample["status"] = resp.status
+                sample["size"] = resp.content_length or 0
+                if resp.status == 429 or resp.status >= 500:
+                    raise ProfiMaktabTokenUnavailableError(
+                        resp.status, _retry_after(resp.headers)
+                    )
+                if resp.status != 200:
+                    text = await resp.text()
+                    _LOGGER.error(
+                        "ProfiMaktab: login failed (%s): %s", resp.status, text
+                    )
+                    raise ProfiMaktabAuthError("Login failed")
 
-            data = await resp.json()
+                data = _token_data(await resp.read(), self.TOKEN_ENDPOINT)
 
         access = data.get("access")
         if not access:
             _LOGGER.error("ProfiMaktab: access token missing in response")
             raise ProfiMaktabAuthError("Access token missing")
 
-        self._access_token = access
+        self._set_tokens(access, data.get("refresh"))
         _LOGGER.debug("ProfiMaktab: login successful")
 
+    async def async_refresh_access_token(self) -> None:
+        """Obtain a new access token using the refresh token."""
+        if not self._refresh_token:
+            raise ProfiMaktabAuthError("No refresh token")
+
+        url = f"{self.BASE_URL}{self.REFRESH_ENDPOINT}"
+
+        _LOGGER.debug("ProfiMaktab: refreshing access token")
+
+        await self._async_throttle()
+        with self.metrics.track(self.REFRESH_ENDPOINT) as sample:
+            async with self._session.post(
+                url,
+                json={"refresh": self._refresh_token},
+                headers=self._default_headers,
+                timeout=self._timeout,
+            ) as resp:
+                sample["status"] = resp.status
+                sample["size"] = resp.content_length or 0
+                if resp.status == 429 or resp.status >= 500:
+                    raise ProfiMaktabTokenUnavailableError(
+                        resp.status, _retry_after(resp.headers)
+                    )
+                if resp.status != 200:
+                    _LOGGER.debug(
+                        "ProfiMaktab: token refresh rejected (%s)", resp.status
+                    )
+                    raise ProfiMaktabAuthError("Token refresh failed")
+
+                data = _token_data(await resp.read(), self.REFRESH_ENDPOINT)
+
+        access = data.get("access")
+        if not access:
+            raise ProfiMaktabAuthError("Access token missing")
+
+        # SimpleJWT may rotate the refresh token
+        self._set_tokens(access, data.get("refresh") or self._refresh_token)
+        _LOGGER.debug("ProfiMaktab: access token refreshed")
+
+    def _set_tokens(self, access: str, refresh: Optional[str]) -> None:
+        self._access_token = access
+        self._refresh_token = refresh
+        self._access_expires_at = _jwt_expiry(access)
+        if self._access_expires_at is not None:
+            # Short-lived tokens would otherwise never count as fresh
+            lifetime = self._access_expires_at - time.time()
+            self._renew_margin = max(0.0, min(self.RENEW_MARGIN, lifetime / 2))
+        self._schedule_renewal()
+
+    def _token_is_fresh(self) -> bool:
+        if not self._access_token:
+            return False
+        if self._access_expires_at is None:
+            # Opaque token: rely on 401 handling
+            return True
+        return time.time() < self._access_expires_at - self._renew_margin
+
+    async def _async_renew(self) -> None:
+        """Renew the access token: refresh first, password login as fallback."""
+        if self._refresh_token:
+            try:
+                await self.async_refresh_access_token()
+                return
+            except ProfiMaktabTokenUnavailableError:
+                # Backend trouble, not a bad refresh token: retry later
+                raise
+            except (ProfiMaktabApiError, aiohttp.ClientError, asyncio.TimeoutError) as err:
+                _LOGGER.debug(
+                    "ProfiMaktab: refresh failed (%s), falling back to login", err
+                )
+                self._refresh_token = None
+        await self.async_login()
+
+    def _is_idle(self) -> bool:
+        return (
+            self._last_used is None
+            or time.monotonic() - self._last_used > self.RENEW_IDLE_AFTER
+        )
+
+    def _schedule_renewal(self) -> None:
+        """Schedule a background renewal shortly before the access token expires."""
+        if self._renew_handle is not None:
+            self._renew_handle.cancel()
+            self._renew_handle = None
+
+        if self._access_expires_at is None or self._is_idle():
+            return
+
+        delay = max(
+            self.RENEW_MIN_DELAY,
+            self._access_expires_at - self._renew_margin - time.time(),
+        )
+        loop = asyncio.get_running_loop()
+        self._renew_handle = loop.call_later(delay, self._start_background_renewal)
+
+    def _start_background_renewal(self) -> None:
+        self._renew_handle = None
+        if self._is_idle():
+            # Nobody is using the client: async_ensure_authenticated renews
+            # on the next request instead
+            _LOGGER.debug("ProfiMaktab: client idle, background renewal stopped")
+            return
+        if self._renew_task is not None and not self._renew_task.done():
+            return
+        self._renew_task = asyncio.get_running_loop().create_task(
+            self._async_background_renew()
+        )
+
+    async def _async_background_renew(self) -> None:
+        try:
+            async with self._auth_lock:
+                if self._token_is_fresh():
+                    return
+                await self._async_renew()
+        except Exception as err:  # noqa: BLE001
+            # Next request will retry via async_ensure_authenticated
+            _LOGGER.warning("ProfiMaktab: background token renewal failed: %s", err)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        return self._session
+
+    @property
+    def breaker_state(self) -> Dict[str, Any]:
+        return {
+            "host": self._breaker.host,
+            "state": self._breaker.state,
+            "retry_in": round(self._breaker.retry_in(), 1),
+        }
+
+    def close(self) -> None:
+        """Cancel pending background renewal."""
+        if self._renew_handle is not None:
+            self._renew_handle.cancel()
+            self._renew_handle = None
+        if self._renew_task is not None:
+            self._renew_task.cancel()
+            self._renew_task = None
+
     async def async_ensure_authenticated(self) -> None:
         """
         Ensure we have a valid access token.
         Uses a lock to avoid concurrent re-logins.
         """
-        if self._access_token:
+        if self._token_is_fresh():
             return
 
         async with self._auth_lock:
             # Double-check inside the lock
-            if self._access_token:
+            if self._token_is_fresh():
                 return
-            await self.async_login()
+            # Refresh token first (kept across transient failures), else login
+            await self._async_renew()
+
+    async def _async_reauthenticate(self, failed_token: Optional[str]) -> None:
+        """
+        Re-login after a 401.
+        Concurrent callers that failed with the same token share one login.
+        """
+        async with self._auth_lock:
+            if self._access_token and self._access_token != failed_token:
+                return
+            self._access_token = None
+            await self._async_renew()
 
     # ---------- Low-level request ----------
 
@@ -95,68 +631,310 @@ class ProfiMaktabClient:
         *,
         params: Optional[Dict[str, Any]] = None,
         json: Optional[Dict[str, Any]] = None,
-        retry_on_401: bool = True,
     ) -> Any:
-        await self.async_ensure_authenticated()
-
-        url = f"{self.BASE_URL}{path}"
-        headers = {
-            "Authorization": f"Bearer {self._access_token}",
-        }
-
-        async with self._session.request(
+        response = await self._request_raw(
             method,
-            url,
-            headers=headers,
+            path,
             params=params,
             json=json,
-            timeout=self._timeout,
-        ) as resp:
-            if resp.status == 401 and retry_on_401:
-                _LOGGER.debug("ProfiMaktab: 401 received, re-authenticating")
-                # Token invalid/expired → relogin once
-                self._access_token = None
-                await self.async_login()
-                return await self._request(
-                    method,
-                    path,
-                    params=params,
-                    json=json,
-                    retry_on_401=False,
+        )
+        return response.json()
+
+    async def _request_raw(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> ProfiMaktabResponse:
+        """
+        Send a request and return status, headers and the undecoded body.
+        Identical concurrent GETs share one in-flight request.
+        """
+        self.metrics.requests += 1
+        idle = self._is_idle()
+        self._last_used = time.monotonic()
+        if idle:
+            # Active again: resume background renewal
+            self._schedule_renewal()
+
+        if method != "GET":
+            return await self._send(
+                method, path, params=params, json=json, headers=headers
+            )
+
+        key = (
+            method,
+            path,
+            tuple(sorted((params or {}).items())),
+            tuple(sorted((headers or {}).items())),
+        )
+        task = self._inflight.get(key)
+        if task is not None:
+            self.metrics.coalesced += 1
+            _LOGGER.debug("ProfiMaktab: coalesced %s %s", method, path)
+        else:
+            task = asyncio.get_running_loop().create_task(
+                self._send(method, path, params=params, headers=headers)
+            )
+            self._inflight[key] = task
+
+            def _done(finished: asyncio.Task, key=key) -> None:
+                self._inflight.pop(key, None)
+                # Avoid "exception never retrieved" if every caller was cancelled
+                if not finished.cancelled():
+                    finished.exception()
+
+            task.add_done_callback(_done)
+
+        # Shield: one caller timing out must not cancel the shared request
+        return await asyncio.shield(task)
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> ProfiMaktabResponse:
+        """
+        Send a request with retries.
+        5xx, 429 and connection errors are retried with exponential backoff
+        and jitter (Retry-After wins when present); a 401 triggers one
+        re-login. The per-host circuit breaker fails fast while the backend
+        is down.
+        """
+        attempt = 0
+        reauthenticated = False
+
+        while True:
+            # Only the half-open trial request may give the trial back
+            trial = self._breaker.state == "half_open"
+            if not self._breaker.allow_request():
+                self.metrics.circuit_rejections += 1
+                raise ProfiMaktabCircuitOpenError(
+                    f"{self._breaker.host} is unavailable, retry in "
+                    f"{self._breaker.retry_in():.0f}s"
                 )
 
-            if resp.status >= 400:
-                text = await resp.text()
-                _LOGGER.error(
-                    "ProfiMaktab: API error %s on %s: %s",
-                    resp.status,
+            try:
+                await self.async_ensure_authenticated()
+                token = self._access_token
+                response = await self._send_once(
+                    method, path, token, params=params, json=json, headers=headers
+                )
+            except ProfiMaktabTokenUnavailableError as err:
+                delay = self._retry_delay(
+                    err.status, err.retry_after, attempt, path
+                )
+            except ProfiMaktabAuthError:
+                # The server answered, it is just refusing the credentials
+                self._breaker.record_success()
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                self._breaker.record_failure()
+                if attempt >= self._max_retries:
+                    _LOGGER.error(
+                        "ProfiMaktab: connection error on %s: %s", path, err
+                    )
+                    raise ProfiMaktabApiError(
+                        f"Connection error on {path}: {err!r}"
+                    ) from err
+                delay = self._backoff(attempt)
+                _LOGGER.debug(
+                    "ProfiMaktab: %r on %s, retry %d in %.1fs",
+                    err,
                     path,
-                    text,
+                    attempt + 1,
+                    delay,
                 )
-                raise ProfiMaktabApiError(
-                    f"API error {resp.status} on {path}"
+            except BaseException:
+                # Отмена или неожиданная ошибка: пробный запрос не должен
+                # оставить общий breaker в half-open навсегда
+                if trial:
+                    self._breaker.release_trial()
+                raise
+            else:
+                status = response.status
+
+                if status == 401 and not reauthenticated:
+                    _LOGGER.debug("ProfiMaktab: 401 received, re-authenticating")
+                    self._breaker.record_success()
+                    # Token invalid/expired → relogin once (shared per account)
+                    reauthenticated = True
+                    self.metrics.relogins += 1
+                    try:
+                        await self._async_reauthenticate(token)
+                    except ProfiMaktabTokenUnavailableError as err:
+                        delay = self._retry_delay(
+                            err.status, err.retry_after, attempt, path
+                        )
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                        self._breaker.record_failure()
+                        _LOGGER.error(
+                            "ProfiMaktab: connection error on re-login: %s", err
+                        )
+                        raise ProfiMaktabApiError(
+                            f"Connection error on re-login: {err!r}"
+                        ) from err
+                    else:
+                        continue
+
+                elif status == 429 or status >= 500:
+                    delay = self._retry_delay(
+                        status, _retry_after(response.headers), attempt, path
+                    )
+                elif status >= 400:
+                    self._breaker.record_success()
+                    _LOGGER.error(
+                        "ProfiMaktab: API error %s on %s: %s",
+                        status,
+                        path,
+                        response.body.decode(errors="replace"),
+                    )
+                    raise ProfiMaktabApiError(f"API error {status} on {path}")
+                else:
+                    self._breaker.record_success()
+                    return response
+
+            attempt += 1
+            self.metrics.retries += 1
+            await asyncio.sleep(delay)
+
+    def _retry_delay(
+        self, status: int, retry_after: Optional[float], attempt: int, path: str
+    ) -> float:
+        """Delay before retrying a 429/5xx; raises once retries are used up."""
+        if status >= 500:
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
+        if attempt >= self._max_retries or (
+            retry_after is not None and retry_after > self._backoff_max
+        ):
+            _LOGGER.error(
+                "ProfiMaktab: API error %s on %s after %d attempt(s)",
+                status,
+                path,
+                attempt + 1,
+            )
+            raise ProfiMaktabApiError(f"API error {status} on {path}")
+        delay = retry_after if retry_after is not None else self._backoff(attempt)
+        _LOGGER.debug(
+            "ProfiMaktab: %s on %s, retry %d in %.1fs",
+            status,
+            path,
+            attempt + 1,
+            delay,
+        )
+        return delay
+
+    async def _send_once(
+        self,
+        method: str,
+        path: str,
+        token: Optional[str],
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> ProfiMaktabResponse:
+        url = f"{self.BASE_URL}{path}"
+        await self._async_throttle(str((params or {}).get("student", "")))
+        request_headers = {
+            **self._default_headers,
+            **(headers or {}),
+            "Authorization": f"Bearer {token}",
+        }
+
+        with self.metrics.track(path) as sample:
+            async with self._session.request(
+                method,
+                url,
+                headers=request_headers,
+                params=params,
+                json=json,
+                timeout=self._timeout,
+            ) as resp:
+                body = await resp.read()
+                sample["status"] = resp.status
+                sample["size"] = len(body)
+                return ProfiMaktabResponse(
+                    status=resp.status,
+                    headers=resp.headers,
+                    body=body,
                 )
 
-            return await resp.json()
+    async def _async_throttle(self, student: str = "") -> None:
+        """Wait for the shared rate limit (fair per account and student)."""
+        if self._scheduler is not None:
+            await self._scheduler.acquire(self._username, student)
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with jitter (50–100% of the nominal delay)."""
+        delay = min(self._backoff_max, self._backoff_base * 2**attempt)
+        return delay * random.uniform(0.5, 1.0)
 
     # ---------- High-level API ----------
 
-    async def async_get_profile(self) -> Dict[str, Any]:
+    async def async_get_profile(
+        self, *, max_age: Optional[float] = None
+    ) -> Dict[str, Any]:
         """GET /profile/"""
-        return await self._request("GET", "/profile/")
+        return await self._async_get_meta("/profile/", max_age)
 
-    async def async_get_student_contacts(self, contact_id: int) -> Dict[str, Any]:
+    async def async_get_student_contacts(
+        self, contact_id: int, *, max_age: Optional[float] = None
+    ) -> Dict[str, Any]:
         """GET /student_contacts/{contact_id}/"""
-        return await self._request(
-            "GET", f"/student_contacts/{contact_id}/"
+        return await self._async_get_meta(
+            f"/student_contacts/{contact_id}/", max_age
         )
 
-    async def async_get_student(self, student_id: int) -> Dict[str, Any]:
+    async def async_get_student(
+        self, student_id: int, *, max_age: Optional[float] = None
+    ) -> Dict[str, Any]:
         """GET /student_students/{student_id}"""
-        return await self._request(
-            "GET", f"/student_students/{student_id}"
+        return await self._async_get_meta(
+            f"/student_students/{student_id}", max_age
         )
 
+    async def _async_get_meta(self, path: str, max_age: Optional[float]) -> Any:
+        """
+        Metadata GET served from the cache for up to META_TTL seconds
+        (or max_age, if smaller; 0 always fetches).
+        """
+        cached = self._meta_cache.get(path, max_age=max_age)
+        if cached is not None:
+            return cached
+        data = await self._request("GET", path)
+        self._meta_cache.set(path, data, self.META_TTL)
+        return data
+
+    def export_metadata(self, paths: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Cached metadata responses (optionally only `paths`) for persisting."""
+        return {
+            path: {"stored_at": stored_at, "data": data}
+            for path, stored_at, data in self._meta_cache.items()
+            if paths is None or path in paths
+        }
+
+    def restore_metadata(self, items: Optional[Dict[str, Any]]) -> None:
+        """Seed the metadata cache from export_metadata() output."""
+        for path, item in (items or {}).items():
+            current_age = self._meta_cache.age(path)
+            age = time.time() - item["stored_at"]
+            # Не затираем более свежие данные (клиент общий для записей)
+            if current_age is not None and current_age <= age:
+                continue
+            self._meta_cache.set(
+                path, item["data"], self.META_TTL, stored_at=item["stored_at"]
+            )
+
     async def async_get_dairy(
         self,
         student_id: int,
@@ -164,11 +942,221 @@ class ProfiMaktabClient:
     ) -> Any:
         """GET /dairy/?for_date=YYYY-MM-DD&student={id}"""
         if for_date is None:
-            for_date = date.today()
+            for_date = self._today()
 
         params = {
             "for_date": for_date.isoformat(),
             "student": student_id,
         }
 
-        return await self._request("GET", "/dairy/", params=params)
+        data = await self._request("GET", "/dairy/", params=params)
+        self._dairy_cache.set(
+            (student_id, for_date), data, self._dairy_ttl(for_date)
+        )
+        return data
+
+    async def async_get_dairy_if_changed(
+        self,
+        student_id: int,
+        for_date: date,
+        fingerprint: Optional[str] = None,
+    ) -> Tuple[Any, str]:
+        """
+        Fetch a diary day unless it matches fingerprint.
+
+        Returns (data, fingerprint); data is None when the content is
+        unchanged, in which case the body is not decoded at all.
+        Uses ETag / Last-Modified when the API sends them, otherwise a
+        hash of the raw body.
+        """
+        headers: Dict[str, str] = {}
+        if fingerprint and fingerprint.startswith("etag:"):
+            headers["If-None-Match"] = fingerprint[5:]
+        elif fingerprint and fingerprint.startswith("lm:"):
+            headers["If-Modified-Since"] = fingerprint[3:]
+
+        response = await self._request_raw(
+            "GET",
+            "/dairy/",
+            params={"for_date": for_date.isoformat(), "student": student_id},
+            headers=headers,
+        )
+
+        key = (student_id, for_date)
+        if response.status == 304:
+            new_fingerprint = fingerprint or ""
+        else:
+            new_fingerprint = response.fingerprint()
+
+        if new_fingerprint == fingerprint:
+            cached = self._dairy_cache.get(key)
+            if cached is not None:
+                self._dairy_cache.set(key, cached, self._dairy_ttl(for_date))
+            return None, new_fingerprint
+
+        data = response.json()
+        self._dairy_cache.set(key, data, self._dairy_ttl(for_date))
+        return data, new_fingerprint
+
+    def get_cached_dairy(
+        self,
+        student_id: int,
+        for_date: date,
+        *,
+        max_age: Optional[float] = None,
+    ) -> Any:
+        """Return a cached diary day, or None if not cached / too old."""
+        return self._dairy_cache.get((student_id, for_date), max_age=max_age)
+
+    async def async_get_dairy_range(
+        self,
+        student_id: int,
+        start: date,
+        end: date,
+        *,
+        max_concurrency: int = 4,
+        today: Optional[date] = None,
+        max_age: Optional[float] = None,
+    ) -> Dict[date, Any]:
+        """
+        Diary for every day from start to end (inclusive).
+        Cached days (no older than max_age, if given) are served from
+        memory; only missing days are fetched, at most max_concurrency at
+        a time.
+        """
+        if end < start:
+            raise ValueError("end date is before start date")
+        days = [
+            start + timedelta(days=offset)
+            for offset in range((end - start).days + 1)
+        ]
+        return await self.async_get_dairy_days(
+            student_id,
+            days,
+            max_concurrency=max_concurrency,
+            today=today,
+            max_age=max_age,
+        )
+
+    async def async_get_dairy_days(
+        self,
+        student_id: int,
+        days: Iterable[date],
+        *,
+        max_concurrency: int = 4,
+        today: Optional[date] = None,
+        max_age: Optional[float] = None,
+    ) -> Dict[date, Any]:
+        """Diary for the given days, cached like async_get_dairy_range()."""
+        if today is None:
+            today = self._today()
+
+        days = list(days)
+        result: Dict[date, Any] = {}
+        missing: List[date] = []
+        for day in days:
+            cached = self._dairy_cache.get((student_id, day), max_age=max_age)
+            if cached is not None:
+                result[day] = cached
+            else:
+                missing.append(day)
+
+        _LOGGER.debug(
+            "ProfiMaktab: dairy days for %s (cached: %d, fetching: %d)",
+            student_id,
+            len(result),
+            len(missing),
+        )
+
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def _fetch(day: date) -> Any:
+            async with semaphore:
+                data = await self._request(
+                    "GET",
+                    "/dairy/",
+                    params={"for_date": day.isoformat(), "student": student_id},
+                )
+            self._dairy_cache.set(
+                (student_id, day), data, self._dairy_ttl(day, today)
+            )
+            return data
+
+        fetched = await asyncio.gather(
+            *(_fetch(day) for day in missing), return_exceptions=True
+        )
+        errors = [item for item in fetched if isinstance(item, BaseException)]
+        for day, item in zip(missing, fetched):
+            if not isinstance(item, BaseException):
+                result[day] = item
+        if errors:
+            # Fetched days stay cached, so a retry only requests the rest
+            raise errors[0]
+
+        return {day: result[day] for day in days}
+
+    def _dairy_ttl(self, day: date, today: Optional[date] = None) -> float:
+        if today is None:
+            today = self._today()
+        if day < today:
+            return self.DAIRY_TTL_PAST
+        return self.DAIRY_TTL_CURRENT
+
+
+class ProfiMaktabClientPool:
+    """
+    Reference-counted registry of clients, one per account and session kind.
+    All config entries that log in with the same credentials (and the same
+    dedicated_connection choice) share one client, and therefore one access
+    token and one auth lock.
+    """
+
+    def __init__(self) -> None:
+        self._clients: Dict[Tuple[str, str, bool], ProfiMaktabClient] = {}
+        self._refs: Dict[Tuple[str, str, bool], int] = {}
+
+    def acquire(
+        self,
+        session: aiohttp.ClientSession,
+        username: str,
+        password: str,
+        *,
+        dedicated: bool = False,
+        **kwargs: Any,
+    ) -> ProfiMaktabClient:
+        """Return the shared client for an account, creating it if needed."""
+        key = (username, password, dedicated)
+        client = self._clients.get(key)
+        if client is None:
+            client = ProfiMaktabClient(
+                session=session,
+                username=username,
+                password=password,
+                **kwargs,
+            )
+            self._clients[key] = client
+            self._refs[key] = 0
+            _LOGGER.debug("ProfiMaktab: new shared client for %s", username)
+        self._refs[key] += 1
+        return client
+
+    def release(
+        self, username: str, password: str, *, dedicated: bool = False
+    ) -> bool:
+        """Drop one reference. Returns True when the client was removed."""
+        key = (username, password, dedicated)
+        if key not in self._refs:
+            return False
+        self._refs[key] -= 1
+        if self._refs[key] > 0:
+            return False
+        self._refs.pop(key)
+        self._clients.pop(key).close()
+        _LOGGER.debug("ProfiMaktab: shared client for %s released", username)
+        return True
+
+    def uses_session(self, session: aiohttp.ClientSession) -> bool:
+        return any(client.session is session for client in self._clients.values())
+
+    def __len__(self) -> int:
+        return len(self._clients)
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import logging
+from datetime import date, timedelta
+from statistics import mean
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import (
+    StatisticData,
+    StatisticMeanType,
+    StatisticMetaData,
+)
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    statistics_during_period,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    DATA_CLIENT,
+    DATA_AGGREGATOR,
+    SIGNAL_DATA_UPDATED,
+    SIGNAL_NEW_SUBJECTS,
+    STORAGE_VERSION,
+    BACKFILL_CHUNK_DAYS,
+    BACKFILL_RETRY_DELAY,
+    DEFAULT_BACKFILL_CONCURRENCY,
+)
+from .api import ProfiMaktabApiError
+from .parser import parse_dairy_batch
+from .update import async_schedule_save, student_display_name
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def average_statistic_id(student_id: int) -> str:
+    return f"{DOMAIN}:average_mark_{student_id}"
+
+
+def marks_count_statistic_id(student_id: int) -> str:
+    return f"{DOMAIN}:marks_count_{student_id}"
+
+
+class ProfiMaktabBackfill:
+    """
+    Resumable import of past diary days for one student.
+
+    Days are fetched in chunks through async_get_dairy_range (bounded
+    concurrency, cached days skipped). After each chunk the daily average
+    and mark count are imported as external long-term statistics, the
+    marks are fed to the aggregator and a checkpoint is saved, so a
+    restart resumes from the first unfinished day. An API error stops the
+    run and retries it from the checkpoint after BACKFILL_RETRY_DELAY.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        self._hass = hass
+        self._entry = entry
+        self._store = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}_backfill"
+        )
+        self.running = False
+        self._unsub_retry: CALLBACK_TYPE | None = None
+        self._retry_checkpoint: dict | None = None
+
+    @callback
+    def async_stop(self) -> None:
+        """Cancel a scheduled retry (the checkpoint stays on disk)."""
+        if self._unsub_retry is not None:
+            self._unsub_retry()
+            self._unsub_retry = None
+
+    async def async_pending(self) -> dict | None:
+        """Checkpoint of an unfinished backfill, if any."""
+        checkpoint = await self._store.async_load()
+        if not checkpoint:
+            return None
+        if date.fromisoformat(checkpoint["next"]) > date.fromisoformat(
+            checkpoint["end"]
+        ):
+            return None
+        return checkpoint
+
+    async def async_start(
+        self,
+        start: date,
+        end: date,
+        max_concurrency: int = DEFAULT_BACKFILL_CONCURRENCY,
+    ) -> None:
+        """Start a new backfill, replacing any previous checkpoint."""
+        self.async_stop()
+        checkpoint = {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "next": start.isoformat(),
+            "max_concurrency": max_concurrency,
+            # Cumulative mark count for the statistics "sum" column,
+            # continued from the statistics already imported before start
+            "sum": await self._async_last_sum(start),
+        }
+        await self._store.async_save(checkpoint)
+        await self.async_run(checkpoint)
+
+    async def async_run(self, checkpoint: dict) -> None:
+        """Process days from checkpoint["next"] to checkpoint["end"]."""
+        if self.running:
+            _LOGGER.warning(
+                "ProfiMaktab backfill: already running for %s", self._entry.title
+            )
+            return
+
+        self.running = True
+        try:
+            await self._async_run(checkpoint)
+        except Exception:  # noqa: BLE001
+            # Контрольная точка остаётся — продолжим после перезапуска
+            _LOGGER.exception(
+                "ProfiMaktab backfill: unexpected error for %s", self._entry.title
+            )
+        finally:
+            self.running = False
+
+    async def _async_last_sum(self, before: date) -> float:
+        """Mark count sum of the last imported day before `before`."""
+        statistic_id = marks_count_statistic_id(self._entry.data["student_id"])
+        stats = await get_instance(self._hass).async_add_executor_job(
+            statistics_during_period,
+            self._hass,
+            dt_util.utc_from_timestamp(0),
+            dt_util.start_of_local_day(before),
+            {statistic_id},
+            "hour",
+            None,
+            {"sum"},
+        )
+        rows = stats.get(statistic_id)
+        return (rows[-1].get("sum") or 0) if rows else 0
+
+    @callback
+    def _async_schedule_retry(self, checkpoint: dict) -> None:
+        self.async_stop()
+        self._retry_checkpoint = checkpoint
+        self._unsub_retry = async_call_later(
+            self._hass, BACKFILL_RETRY_DELAY, self._handle_retry
+        )
+
+    @callback
+    def _handle_retry(self, _now) -> None:
+        self._unsub_retry = None
+        self._entry.async_create_background_task(
+            self._hass,
+            self.async_run(self._retry_checkpoint),
+            f"{DOMAIN}_backfill_{self._entry.entry_id}",
+        )
+
+    async def _async_run(self, checkpoint: dict) -> None:
+        entry_data = self._hass.data[DOMAIN][self._entry.entry_id]
+        client = entry_data[DATA_CLIENT]
+        aggregator = entry_data[DATA_AGGREGATOR]
+        student_id = self._entry.data["student_id"]
+        student_name = student_display_name(self._hass, self._entry)
+
+        end = date.fromisoformat(checkpoint["end"])
+        day = date.fromisoformat(checkpoint["next"])
+
+        _LOGGER.info(
+            "ProfiMaktab backfill: %s from %s to %s", student_name, day, end
+        )
+
+        new_subjects: set[str] = set()
+        while day <= end:
+            chunk_end = min(end, day + timedelta(days=BACKFILL_CHUNK_DAYS - 1))
+            try:
+                raw_days = await client.async_get_dairy_range(
+                    student_id,
+                    day,
+                    chunk_end,
+                    max_concurrency=checkpoint["max_concurrency"],
+                )
+            except ProfiMaktabApiError as err:
+                _LOGGER.warning(
+                    "ProfiMaktab backfill: %s stopped at %s (%s), retrying in %d min",
+                    student_name,
+                    day,
+                    err,
+                    BACKFILL_RETRY_DELAY // 60,
+                )
+                self._async_schedule_retry(checkpoint)
+                break
+
+            # Вся порция дней разбирается одним пакетом
+            days = [current for current, raw in raw_days.items() if raw]
+            batch = parse_dairy_batch(
+                (current.isoformat(), raw_days[current]) for current in days
+            )
+
+            averages: list[StatisticData] = []
+            counts: list[StatisticData] = []
+            for number, current in enumerate(days):
+                new_subjects |= aggregator.add_day(
+                    current, batch.day_subject_marks(number)
+                )
+
+                start = dt_util.start_of_local_day(current)
+                marks = batch.day_marks(number)
+                checkpoint["sum"] += len(marks)
+                counts.append(
+                    StatisticData(
+                        start=start, state=len(marks), sum=checkpoint["sum"]
+                    )
+                )
+                if marks:
+                    averages.append(
+                        StatisticData(
+                            start=start,
+                            mean=round(mean(marks), 1),
+                            min=min(marks),
+                            max=max(marks),
+                        )
+                    )
+
+            self._async_import(student_id, student_name, averages, counts)
+
+            day = chunk_end + timedelta(days=1)
+            checkpoint["next"] = day.isoformat()
+            await self._store.async_save(checkpoint)
+            async_schedule_save(self._entry, entry_data)
+            _LOGGER.debug(
+                "ProfiMaktab backfill: %s done up to %s", student_name, chunk_end
+            )
+
+        if new_subjects:
+            async_dispatcher_send(
+                self._hass,
+                SIGNAL_NEW_SUBJECTS.format(self._entry.entry_id),
+                new_subjects,
+            )
+        async_dispatcher_send(
+            self._hass, SIGNAL_DATA_UPDATED.format(self._entry.entry_id)
+        )
+        if day > end:
+            _LOGGER.info("ProfiMaktab backfill: %s complete", student_name)
+
+    def _async_import(
+        self,
+        student_id: int,
+        student_name: str,
+        averages: list[StatisticData],
+        counts: list[StatisticData],
+    ) -> None:
+        if averages:
+            async_add_external_statistics(
+                self._hass,
+                StatisticMetaData(
+                    mean_type=StatisticMeanType.ARITHMETIC,
+                    has_sum=False,
+                    name=f"{student_name} average mark",
+                    source=DOMAIN,
+                    statistic_id=average_statistic_id(student_id),
+                    unit_class=None,
+                    unit_of_measurement=None,
+                ),
+                averages,
+            )
+        if counts:
+            async_add_external_statistics(
+                self._hass,
+                StatisticMetaData(
+                    mean_type=StatisticMeanType.NONE,
+                    has_sum=True,
+                    name=f"{student_name} marks",
+                    source=DOMAIN,
+                    statistic_id=marks_count_statistic_id(student_id),
+                    unit_class=None,
+                    unit_of_measurement=None,
+                ),
+                counts,
+            )
@@ -1,17 +1,16 @@
 from __future__ import annotations
 
 import logging
-from datetime import date
 
 from homeassistant.components.button import ButtonEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.dispatcher import async_dispatcher_send
 
-from .api import ProfiMaktabApiError
-from .const import DOMAIN, DATA_CLIENT, DATA_PAYLOAD, SIGNAL_DATA_UPDATED
-from .parser import parse_dairy
+from .const import DOMAIN, DATA_STATS
+from .refresh import RefreshResult
+from .ratelimit import interactive_requests
+from .update import async_loaded_entries, async_update_all
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -44,79 +43,40 @@ class ProfiMaktabGlobalUpdateButton(ButtonEntity):
 
     def __init__(self, hass: HomeAssistant) -> None:
         self._hass = hass
+        self._last_results: list[RefreshResult] | None = None
+
+    @property
+    def extra_state_attributes(self):
+        if self._last_results is None:
+            return None
+        return {
+            "updated": sum(1 for r in self._last_results if r.success),
+            "failed": sum(1 for r in self._last_results if not r.success),
+            "unchanged": sum(1 for r in self._last_results if r.changed is False),
+            "unchanged_total": sum(
+                entry_data[DATA_STATS]["unchanged"]
+                for _entry, entry_data in async_loaded_entries(self._hass)
+            ),
+            "changed_total": sum(
+                entry_data[DATA_STATS]["changed"]
+                for _entry, entry_data in async_loaded_entries(self._hass)
+            ),
+            "results": [r.as_dict() for r in self._last_results],
+        }
 
     async def async_press(self) -> None:
         _LOGGER.info("ProfiMaktab button: global update button pressed")
 
-        today = date.today().isoformat()
-        updated_count = 0
-        failed_count = 0
-
-        for entry_id, entry_data in self._hass.data.get(DOMAIN, {}).items():
-            # Пропускаем служебные ключи
-            if entry_id == "button_created":
-                continue
-
-            # Проверяем, что это dict с данными entry
-            if not isinstance(entry_data, dict):
-                continue
-
-            client = entry_data.get(DATA_CLIENT)
-            if not client:
-                _LOGGER.debug("ProfiMaktab button: no client for entry_id %s", entry_id)
-                continue
-
-            try:
-                config_entry = self._hass.config_entries.async_get_entry(entry_id)
-                if not config_entry:
-                    _LOGGER.warning("ProfiMaktab button: config_entry not found for %s", entry_id)
-                    continue
-
-                student_id = config_entry.data["student_id"]
-                student_name = config_entry.data["student_name"]
-
-                _LOGGER.debug(
-                    "ProfiMaktab button: updating data for %s (ID: %s)",
-                    student_name,
-                    student_id,
-                )
-
-                raw = await client.async_get_dairy(
-                    student_id=student_id,
-                    for_date=date.today(),
-                )
-
-                parsed = parse_dairy(
-                    raw,
-                    student=student_name,
-                    date=today,
-                )
-
-                entry_data[DATA_PAYLOAD] = parsed
-                async_dispatcher_send(self._hass, SIGNAL_DATA_UPDATED)
-                updated_count += 1
-
-                _LOGGER.info(
-                    "ProfiMaktab button: data updated for %s", student_name
-                )
-
-            except ProfiMaktabApiError as err:
-                failed_count += 1
-                _LOGGER.error(
-                    "ProfiMaktab button: update failed for %s: %s",
-                    student_name,
-                    err,
-                )
-            except Exception as err:
-                failed_count += 1
-                _LOGGER.exception(
-                    "ProfiMaktab button: unexpected error for %s: %s",
-                    student_name,
-                    err,
-                )
+        # Нажатие кнопки — вперёд фоновых обновлений
+        with interactive_requests():
+            results = await async_update_all(self._hass)
+        self._last_results = results
 
         _LOGGER.info(
-            "ProfiMaktab button: update complete (updated: %d, failed: %d)",
-            updated_count,
-            failed_count,
+            "ProfiMaktab button: update complete (changed: %d, unchanged: %d, failed: %d, slowest: %.2fs)",
+            sum(1 for r in results if r.changed),
+            sum(1 for r in results if r.changed is False),
+            sum(1 for r in results if not r.success),
+            max((r.latency for r in results), default=0.0),
         )
+        self.async_write_ha_state()
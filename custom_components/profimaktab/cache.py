@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Iterator, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Small in-memory cache with per-item TTL and LRU eviction.
+    Timestamps are wall-clock seconds so entries can be persisted.
+    """
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        self._max_entries = max_entries
+        # key -> (stored_at, expires_at, value)
+        self._items: "OrderedDict[K, Tuple[float, float, V]]" = OrderedDict()
+
+    def get(self, key: K, *, max_age: Optional[float] = None) -> Optional[V]:
+        """Return a live value, or None if missing, expired or older than max_age."""
+        item = self._items.get(key)
+        if item is None:
+            return None
+
+        stored_at, expires_at, value = item
+        now = time.time()
+        if now >= expires_at:
+            del self._items[key]
+            return None
+        if max_age is not None and now - stored_at > max_age:
+            return None
+
+        self._items.move_to_end(key)
+        return value
+
+    def set(
+        self, key: K, value: V, ttl: float, *, stored_at: Optional[float] = None
+    ) -> None:
+        """Store a value; stored_at restores the original time of a persisted one."""
+        if stored_at is None:
+            stored_at = time.time()
+        self._items[key] = (stored_at, stored_at + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self._max_entries:
+            self._items.popitem(last=False)
+
+    def age(self, key: K) -> Optional[float]:
+        """Seconds since the value was stored, or None if missing."""
+        item = self._items.get(key)
+        if item is None:
+            return None
+        return time.time() - item[0]
+
+    def items(self) -> Iterator[Tuple[K, float, V]]:
+        """(key, stored_at, value) of every live item, oldest first."""
+        now = time.time()
+        for key, (stored_at, expires_at, value) in list(self._items.items()):
+            if now < expires_at:
+                yield key, stored_at, value
+
+    def pop(self, key: K) -> Optional[V]:
+        item = self._items.pop(key, None)
+        return item[2] if item else None
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key) is not None  # type: ignore[arg-type]
+
+    def __len__(self) -> int:
+        return len(self._items)
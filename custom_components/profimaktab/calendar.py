@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Any
+
+from homeassistant.components.calendar import CalendarEntity, CalendarEvent
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .aggregate import UNKNOWN_SUBJECT
+from .api import ProfiMaktabApiError
+from .const import (
+    DOMAIN,
+    DATA_CLIENT,
+    DATA_PAYLOAD,
+    DATA_LAST_UPDATED,
+    DATA_NEXT_DAY,
+    SIGNAL_DATA_UPDATED,
+    STORAGE_VERSION,
+    STORAGE_SAVE_DELAY,
+    CONF_MAX_CONCURRENCY,
+    CONF_SCHOOL_DAYS,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_SCHOOL_DAYS,
+    CALENDAR_MAX_DAYS,
+    CALENDAR_FETCH_LIMIT,
+    CALENDAR_RECENT_DAYS,
+    CALENDAR_RECENT_MAX_AGE,
+    CALENDAR_ARCHIVE_MAX_AGE,
+    BELL_SCHEDULE,
+)
+from .dayindex import DayIndex
+from .model import DairyDay, Lesson
+from .parser import parse_dairy_batch
+from .ratelimit import interactive_requests
+from .update import local_today, student_display_name
+
+_LOGGER = logging.getLogger(__name__)
+
+_BELLS = tuple(
+    (time.fromisoformat(start), time.fromisoformat(end))
+    for start, end in BELL_SCHEDULE
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    _LOGGER.debug("ProfiMaktab calendar: setting up calendar for %s", entry.title)
+    async_add_entities([ProfiMaktabCalendar(hass, entry)])
+
+
+class ProfiMaktabCalendar(CalendarEntity):
+    """
+    Lessons of one student on the HA calendar.
+
+    Views are answered from a per-entry index of parsed diary days,
+    persisted in its own Store; today and the prefetched next day come
+    from the update path. School days that are missing from the index or
+    stale are loaded through the client (async_get_dairy_days, so its
+    cache and concurrency limit apply). Lesson times follow
+    BELL_SCHEDULE; lessons without a slot are shown as all-day events.
+    """
+
+    _attr_has_entity_name = True
+    _attr_icon = "mdi:calendar-clock"
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        self._hass = hass
+        self._entry = entry
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}_days")
+        self._index = DayIndex(CALENDAR_MAX_DAYS)
+        self._school_days = {
+            int(day)
+            for day in entry.options.get(CONF_SCHOOL_DAYS, DEFAULT_SCHOOL_DAYS)
+        }
+        self._last_written = None
+
+    @property
+    def unique_id(self):
+        return f"{self._entry.entry_id}_calendar"
+
+    @property
+    def name(self):
+        # Без устройства имя сущности — единственное, что различает учеников
+        return f"{student_display_name(self._hass, self._entry)} Lessons"
+
+    @property
+    def _entry_data(self):
+        return self._hass.data[DOMAIN][self._entry.entry_id]
+
+    async def async_added_to_hass(self) -> None:
+        self._index = DayIndex.from_dict(
+            await self._store.async_load(), CALENDAR_MAX_DAYS
+        )
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self._hass,
+                SIGNAL_DATA_UPDATED.format(self._entry.entry_id),
+                self._handle_data_update,
+            )
+        )
+        self._index_live_days()
+        self._last_written = self.event
+        self.async_write_ha_state()
+
+    @callback
+    def _handle_data_update(self) -> None:
+        """Index the days the update path already has; write state on change."""
+        self._index_live_days()
+        event = self.event
+        if event == self._last_written:
+            return
+        self._last_written = event
+        self.async_write_ha_state()
+
+    def _index_live_days(self) -> None:
+        entry_data = self._entry_data
+        payload = entry_data.get(DATA_PAYLOAD)
+        last_updated = entry_data.get(DATA_LAST_UPDATED)
+        if payload and last_updated:
+            self._index_payload(payload, last_updated)
+        if next_day := entry_data.get(DATA_NEXT_DAY):
+            self._index_payload(next_day["payload"], next_day["updated"])
+
+    def _index_payload(self, payload: DairyDay, updated: datetime) -> None:
+        day = date.fromisoformat(payload.date)
+        current = self._index.get(day)
+        if current is not None and current[0] is payload:
+            return
+        self._index.put(day, payload, updated.timestamp(), today=local_today())
+        self._schedule_save()
+
+    def _schedule_save(self) -> None:
+        self._store.async_delay_save(self._index.as_dict, STORAGE_SAVE_DELAY)
+
+    def _live_payloads(self) -> dict[date, DairyDay]:
+        """Days kept current by the update path (never fetched here)."""
+        entry_data = self._entry_data
+        live = {}
+        if payload := entry_data.get(DATA_PAYLOAD):
+            live[date.fromisoformat(payload.date)] = payload
+        if next_day := entry_data.get(DATA_NEXT_DAY):
+            payload = next_day["payload"]
+            live[date.fromisoformat(payload.date)] = payload
+        return live
+
+    @property
+    def event(self) -> CalendarEvent | None:
+        """Current or next lesson of today."""
+        today = local_today()
+        payload = self._live_payloads().get(today)
+        if payload is None:
+            item = self._index.get(today)
+            payload = item[0] if item else None
+        if payload is None:
+            return None
+        now = dt_util.now()
+        for number, lesson in enumerate(payload.lessons):
+            event = self._lesson_event(today, number, lesson)
+            if not event.all_day and event.end > now:
+                return event
+        return None
+
+    async def async_get_events(
+        self, hass: HomeAssistant, start_date: datetime, end_date: datetime
+    ) -> list[CalendarEvent]:
+        first = dt_util.as_local(start_date).date()
+        last = dt_util.as_local(end_date - timedelta(microseconds=1)).date()
+        live = self._live_payloads()
+
+        days = [
+            first + timedelta(days=offset)
+            for offset in range((last - first).days + 1)
+        ]
+        await self._async_fetch_missing(
+            [
+                day
+                for day in days
+                if day.weekday() in self._school_days and day not in live
+            ]
+        )
+
+        payloads = {day: payload for day, payload, _ in self._index.range(first, last)}
+        payloads.update(
+            (day, payload) for day, payload in live.items() if first <= day <= last
+        )
+
+        events = []
+        for day in sorted(payloads):
+            for number, lesson in enumerate(payloads[day].lessons):
+                event = self._lesson_event(day, number, lesson)
+                if event.start_datetime_local < end_date and (
+                    event.end_datetime_local > start_date
+                ):
+                    events.append(event)
+        return events
+
+    def _max_age(self, day: date) -> float:
+        """Archive days are rechecked weekly; recent and future ones every 6 h."""
+        if day < local_today() - timedelta(days=CALENDAR_RECENT_DAYS):
+            return CALENDAR_ARCHIVE_MAX_AGE
+        return CALENDAR_RECENT_MAX_AGE
+
+    async def _async_fetch_missing(self, days: list[date]) -> None:
+        today = local_today()
+        missing = self._index.missing(days, self._max_age)
+        if not missing:
+            return
+        # Большие диапазоны — сначала дни ближе к сегодняшнему
+        missing.sort(key=lambda day: abs((day - today).days))
+        missing = missing[:CALENDAR_FETCH_LIMIT]
+
+        client = self._entry_data[DATA_CLIENT]
+        student_id = self._entry.data["student_id"]
+        raw_days: dict[date, Any] = {}
+        try:
+            # Просмотр календаря — запрос пользователя, идёт раньше фоновых
+            with interactive_requests():
+                raw_days = await client.async_get_dairy_days(
+                    student_id,
+                    missing,
+                    max_concurrency=self._entry.options.get(
+                        CONF_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY
+                    ),
+                    max_age=CALENDAR_RECENT_MAX_AGE,
+                )
+        except ProfiMaktabApiError as err:
+            # Устаревшие дни из индекса остаются в календаре
+            _LOGGER.warning(
+                "ProfiMaktab calendar: days could not be loaded for %s: %s",
+                self._entry.title,
+                err,
+            )
+            # Загрузившиеся до ошибки дни лежат в кэше клиента
+            for day in missing:
+                raw = client.get_cached_dairy(
+                    student_id, day, max_age=CALENDAR_RECENT_MAX_AGE
+                )
+                if raw is not None:
+                    raw_days[day] = raw
+
+        _LOGGER.debug(
+            "ProfiMaktab calendar: loaded %d of %d day(s) for %s",
+            len(raw_days),
+            len(missing),
+            self._entry.title,
+        )
+        if not raw_days:
+            return
+        student_name = student_display_name(self._hass, self._entry)
+        batch = parse_dairy_batch(
+            (day.isoformat(), raw or []) for day, raw in raw_days.items()
+        )
+        for number, day in enumerate(raw_days):
+            self._index.put(
+                day,
+                DairyDay.from_batch(batch, number, student=student_name),
+                today=today,
+            )
+        self._schedule_save()
+
+    def _lesson_event(self, day: date, number: int, lesson: Lesson) -> CalendarEvent:
+        slot = lesson.order if isinstance(lesson.order, int) else None
+        if slot is not None and 1 <= slot <= len(_BELLS):
+            tz = dt_util.get_default_time_zone()
+            start_time, end_time = _BELLS[slot - 1]
+            start = datetime.combine(day, start_time, tzinfo=tz)
+            end = datetime.combine(day, end_time, tzinfo=tz)
+        else:
+            start, end = day, day + timedelta(days=1)
+
+        summary = lesson.subject or UNKNOWN_SUBJECT
+        if lesson.mark:
+            summary += f" ({lesson.mark})"
+        description = []
+        if lesson.topic:
+            description.append(lesson.topic)
+        if lesson.homework:
+            description.append(f"Homework: {lesson.homework}")
+        if lesson.mark and lesson.reason:
+            description.append(f"Mark: {lesson.mark} ({lesson.reason})")
+
+        return CalendarEvent(
+            start=start,
+            end=end,
+            summary=summary,
+            description="\n".join(description) or None,
+            uid=f"{self._entry.entry_id}_{day.isoformat()}_{number}",
+        )
@@ -1,21 +1,85 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.data_entry_flow import FlowResultType
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+import homeassistant.helpers.config_validation as cv
 
 from .api import ProfiMaktabClient, ProfiMaktabAuthError, ProfiMaktabApiError
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    CONF_MAX_CONCURRENCY,
+    CONF_REFRESH_TIMEOUT,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_REFRESH_TIMEOUT,
+    CONF_AUTO_UPDATE,
+    CONF_SCHOOL_START,
+    CONF_SCHOOL_END,
+    CONF_SCHOOL_DAYS,
+    CONF_UPDATE_INTERVAL,
+    DEFAULT_AUTO_UPDATE,
+    DEFAULT_SCHOOL_START,
+    DEFAULT_SCHOOL_END,
+    DEFAULT_SCHOOL_DAYS,
+    DEFAULT_UPDATE_INTERVAL,
+    CONF_LESSON_SENSORS,
+    DEFAULT_LESSON_SENSORS,
+    CONF_DEDICATED_CONNECTION,
+    DEFAULT_DEDICATED_CONNECTION,
+    CONF_PREFETCH,
+    CONF_PREFETCH_TIME,
+    DEFAULT_PREFETCH,
+    DEFAULT_PREFETCH_TIME,
+    CONF_RATE_LIMIT,
+    CONF_RATE_BURST,
+    DEFAULT_RATE_LIMIT,
+    DEFAULT_RATE_BURST,
+    SOURCE_ADD_CHILD,
+)
+from .scheduler import parse_school_time
 
 _LOGGER = logging.getLogger(__name__)
 
 
+def children_from_contacts(data: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+    """student_id -> entry data of every child in a /student_contacts/ reply."""
+    children = {}
+    for student in data.get("students", []):
+        sid = student["id"]
+        user = student.get("user") or {}
+        children[sid] = {
+            "student_id": sid,
+            "student_name": user.get("name", f"Student {sid}"),
+        }
+    return children
+
+
+def configured_student_ids(hass: HomeAssistant) -> set:
+    return {
+        entry.data.get("student_id")
+        for entry in hass.config_entries.async_entries(DOMAIN)
+    }
+
+
+WEEKDAYS = {
+    "0": "Mon",
+    "1": "Tue",
+    "2": "Wed",
+    "3": "Thu",
+    "4": "Fri",
+    "5": "Sat",
+    "6": "Sun",
+}
+
+
 class ProfiMaktabConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Config flow for ProfiMaktab."""
 
@@ -87,44 +151,41 @@ class ProfiMaktabConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             except ProfiMaktabApiError:
                 return self.async_abort(reason="cannot_connect")
 
-            students = data.get("students", [])
-            for student in students:
-                sid = student["id"]
-                user = student.get("user") or {}
-                self._children[sid] = {
-                    "student_id": sid,
-                    "student_name": user.get("name", f"Student {sid}"),
-                }
+            self._children = children_from_contacts(data)
 
         if not self._children:
             return self.async_abort(reason="no_students")
 
-        if user_input is not None:
-            student_id = user_input["student_id"]
-
-            # Проверка на дубликат
-            for entry in self._async_current_entries():
-                if entry.data.get("student_id") == student_id:
-                    errors["base"] = "already_configured"
-                    break
+        # Уже настроенные ученики в списке не показываются
+        configured = configured_student_ids(self.hass)
+        available = {
+            sid: info["student_name"]
+            for sid, info in self._children.items()
+            if sid not in configured
+        }
+        if not available:
+            return self.async_abort(reason="already_configured")
 
-            if not errors:
-                child = self._children[student_id]
-                data = {
-                    **self._user_input,
-                    **child,
-                }
-
-                title = child["student_name"]
-                return self.async_create_entry(title=title, data=data)
+        if user_input is not None:
+            selected = [
+                int(sid)
+                for sid in user_input["student_ids"]
+                if int(sid) in available
+            ]
+            if not selected:
+                errors["base"] = "no_selection"
+            else:
+                await self._async_add_children(selected[1:])
+                return await self._async_create_child_entry(
+                    {**self._user_input, **self._children[selected[0]]}
+                )
 
         schema = vol.Schema(
             {
-                vol.Required("student_id"): vol.In(
-                    {
-                        sid: info["student_name"]
-                        for sid, info in self._children.items()
-                    }
+                vol.Required(
+                    "student_ids", default=[str(sid) for sid in available]
+                ): cv.multi_select(
+                    {str(sid): name for sid, name in available.items()}
                 )
             }
         )
@@ -135,6 +196,74 @@ class ProfiMaktabConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    async def _async_add_children(self, student_ids: List[int]) -> None:
+        """Create entries for the other selected children and wait for them."""
+        # Отдельные потоки без повторного входа: данные уже получены
+        results = await asyncio.gather(
+            *(
+                self.hass.config_entries.flow.async_init(
+                    DOMAIN,
+                    context={"source": SOURCE_ADD_CHILD},
+                    data={**self._user_input, **self._children[student_id]},
+                )
+                for student_id in student_ids
+            ),
+            return_exceptions=True,
+        )
+        for student_id, result in zip(student_ids, results):
+            name = self._children[student_id]["student_name"]
+            if isinstance(result, Exception):
+                _LOGGER.error("ProfiMaktab: could not add %s: %s", name, result)
+            elif result["type"] != FlowResultType.CREATE_ENTRY:
+                _LOGGER.warning(
+                    "ProfiMaktab: %s was not added (%s)",
+                    name,
+                    result.get("reason", result["type"]),
+                )
+
+    async def async_step_add_child(self, data: Dict[str, Any]):
+        """Create an entry for a child selected in another flow."""
+        return await self._async_create_child_entry(data)
+
+    async def async_step_integration_discovery(
+        self, discovery_info: Dict[str, Any]
+    ):
+        """A child added to an already configured account."""
+        await self.async_set_unique_id(str(discovery_info["student_id"]))
+        self._abort_if_unique_id_configured()
+        if discovery_info["student_id"] in configured_student_ids(self.hass):
+            return self.async_abort(reason="already_configured")
+
+        self._user_input = discovery_info
+        self.context["title_placeholders"] = {
+            "name": discovery_info["student_name"]
+        }
+        return await self.async_step_discovery_confirm()
+
+    async def async_step_discovery_confirm(self, user_input=None):
+        if user_input is not None:
+            return await self._async_create_child_entry(self._user_input)
+
+        return self.async_show_form(
+            step_id="discovery_confirm",
+            description_placeholders={"name": self._user_input["student_name"]},
+        )
+
+    async def _async_create_child_entry(self, data: Dict[str, Any]):
+        student_id = data["student_id"]
+        await self.async_set_unique_id(str(student_id))
+        self._abort_if_unique_id_configured()
+        # Старые записи создавались без unique_id
+        if student_id in configured_student_ids(self.hass):
+            return self.async_abort(reason="already_configured")
+        return self.async_create_entry(title=data["student_name"], data=data)
+
+    @callback
+    def async_remove(self) -> None:
+        """Stop background token renewal of the temporary flow client."""
+        if self._client is not None:
+            self._client.close()
+
     @staticmethod
     @callback
     def async_get_options_flow(config_entry):
@@ -146,4 +275,92 @@ class ProfiMaktabOptionsFlow(config_entries.OptionsFlow):
         self._config_entry = config_entry
 
     async def async_step_init(self, user_input=None):
-        return self.async_create_entry(title="", data={})
+        errors = {}
+
+        if user_input is not None:
+            try:
+                start = parse_school_time(user_input[CONF_SCHOOL_START])
+                end = parse_school_time(user_input[CONF_SCHOOL_END])
+                parse_school_time(user_input[CONF_PREFETCH_TIME])
+            except ValueError:
+                errors["base"] = "invalid_time"
+            else:
+                if start >= end:
+                    errors["base"] = "invalid_time"
+
+            if not errors:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = self._config_entry.options
+        schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_MAX_CONCURRENCY,
+                    default=options.get(
+                        CONF_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=32)),
+                vol.Required(
+                    CONF_REFRESH_TIMEOUT,
+                    default=options.get(
+                        CONF_REFRESH_TIMEOUT, DEFAULT_REFRESH_TIMEOUT
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=5, max=300)),
+                vol.Required(
+                    CONF_RATE_LIMIT,
+                    default=options.get(CONF_RATE_LIMIT, DEFAULT_RATE_LIMIT),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=50)),
+                vol.Required(
+                    CONF_RATE_BURST,
+                    default=options.get(CONF_RATE_BURST, DEFAULT_RATE_BURST),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+                vol.Required(
+                    CONF_AUTO_UPDATE,
+                    default=options.get(CONF_AUTO_UPDATE, DEFAULT_AUTO_UPDATE),
+                ): bool,
+                vol.Required(
+                    CONF_SCHOOL_START,
+                    default=options.get(CONF_SCHOOL_START, DEFAULT_SCHOOL_START),
+                ): str,
+                vol.Required(
+                    CONF_SCHOOL_END,
+                    default=options.get(CONF_SCHOOL_END, DEFAULT_SCHOOL_END),
+                ): str,
+                vol.Required(
+                    CONF_SCHOOL_DAYS,
+                    default=options.get(CONF_SCHOOL_DAYS, DEFAULT_SCHOOL_DAYS),
+                ): cv.multi_select(WEEKDAYS),
+                vol.Required(
+                    CONF_UPDATE_INTERVAL,
+                    default=options.get(
+                        CONF_UPDATE_INTERVAL, DEFAULT_UPDATE_INTERVAL
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=5, max=240)),
+                vol.Required(
+                    CONF_LESSON_SENSORS,
+                    default=options.get(
+                        CONF_LESSON_SENSORS, DEFAULT_LESSON_SENSORS
+                    ),
+                ): bool,
+                vol.Required(
+                    CONF_PREFETCH,
+                    default=options.get(CONF_PREFETCH, DEFAULT_PREFETCH),
+                ): bool,
+                vol.Required(
+                    CONF_PREFETCH_TIME,
+                    default=options.get(CONF_PREFETCH_TIME, DEFAULT_PREFETCH_TIME),
+                ): str,
+                vol.Required(
+                    CONF_DEDICATED_CONNECTION,
+                    default=options.get(
+                        CONF_DEDICATED_CONNECTION, DEFAULT_DEDICATED_CONNECTION
+                    ),
+                ): bool,
+            }
+        )
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=schema,
+            errors=errors,
+        )
@@ -4,8 +4,140 @@ CONF_USERNAME = "username"
 CONF_PASSWORD = "password"
 
 DATA_CLIENT = "client"
+DATA_CLIENTS = "clients"
 DATA_PAYLOAD = "payload"
+DATA_FINGERPRINT = "fingerprint"
+DATA_STATS = "stats"
+DATA_STORE = "store"
+DATA_LAST_UPDATED = "last_updated"
+DATA_STALE = "stale"
+DATA_LAST_REFRESH = "last_refresh"
 
-PLATFORMS = ["button", "sensor"]
-SIGNAL_DATA_UPDATED = "profimaktab_data_updated"
+STORAGE_VERSION = 1
+# Задержка записи на диск, чтобы объединять частые обновления
+STORAGE_SAVE_DELAY = 10
+
+PLATFORMS = ["button", "calendar", "sensor"]
+# Формат: SIGNAL_DATA_UPDATED.format(entry_id)
+SIGNAL_DATA_UPDATED = "profimaktab_data_updated_{}"
+# После каждой попытки обновления (для диагностических сенсоров)
+SIGNAL_DIAGNOSTICS_UPDATED = "profimaktab_diagnostics_updated_{}"
 BUTTON_CREATED = "button_created"
+
+# ⚙️ Options
+CONF_MAX_CONCURRENCY = "max_concurrency"
+CONF_REFRESH_TIMEOUT = "refresh_timeout"
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_REFRESH_TIMEOUT = 60
+
+# ⏰ Встроенный планировщик (по умолчанию выключен)
+CONF_AUTO_UPDATE = "auto_update"
+CONF_SCHOOL_START = "school_start"
+CONF_SCHOOL_END = "school_end"
+CONF_SCHOOL_DAYS = "school_days"
+CONF_UPDATE_INTERVAL = "update_interval"
+
+DEFAULT_AUTO_UPDATE = False
+DEFAULT_SCHOOL_START = "08:00"
+DEFAULT_SCHOOL_END = "18:00"
+# Понедельник–суббота (date.weekday())
+DEFAULT_SCHOOL_DAYS = ["0", "1", "2", "3", "4", "5"]
+DEFAULT_UPDATE_INTERVAL = 15  # минут
+
+# Интервал удваивается, пока данные не меняются, но не более чем в N раз
+SCHEDULER_MAX_BACKOFF = 4
+# Разброс запусков между учениками
+SCHEDULER_JITTER_FRACTION = 0.2
+SCHEDULER_START_JITTER = 300  # секунд
+
+DATA_SCHEDULER = "scheduler"
+
+# 🧩 Компактные сенсоры по урокам
+CONF_LESSON_SENSORS = "lesson_sensors"
+DEFAULT_LESSON_SENSORS = False
+LESSON_SLOTS = 8
+
+# 📊 Четверти: (месяц, день) начала; учебный год начинается с первой
+TERM_STARTS = ((9, 1), (11, 6), (1, 1), (3, 25))
+DATA_AGGREGATOR = "aggregator"
+SIGNAL_NEW_SUBJECTS = "profimaktab_new_subjects_{}"
+
+# 📥 Загрузка истории
+SERVICE_BACKFILL = "backfill"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_START_DATE = "start_date"
+ATTR_END_DATE = "end_date"
+ATTR_MAX_CONCURRENCY = "max_concurrency"
+DATA_BACKFILL = "backfill"
+BACKFILL_CHUNK_DAYS = 7
+DEFAULT_BACKFILL_CONCURRENCY = 2
+# Повтор после ошибки API (сек); контрольная точка сохраняется
+BACKFILL_RETRY_DELAY = 15 * 60
+
+# 🔄 Выборочное обновление
+SERVICE_REFRESH = "refresh"
+ATTR_STUDENT = "student"
+ATTR_DATE = "date"
+ATTR_MAX_AGE = "max_age"
+# Ответ из кэша, если данные не старше (сек)
+DEFAULT_REFRESH_MAX_AGE = 300
+REFRESH_MAX_DAYS = 31
+
+# 👪 Поиск новых детей в уже настроенных аккаунтах
+DATA_DISCOVERED = "discovered_accounts"
+# Источник потоков для остальных детей, выбранных в одном потоке user
+SOURCE_ADD_CHILD = "add_child"
+
+# 🪪 Данные ученика (имя, класс, школа) — обновляются не чаще раза в сутки
+DATA_STUDENT_INFO = "student_info"
+STUDENT_INFO_MAX_AGE = 24 * 3600
+
+# 🔌 Отдельный пул соединений к API (keep-alive, DNS-кэш)
+CONF_DEDICATED_CONNECTION = "dedicated_connection"
+DEFAULT_DEDICATED_CONNECTION = False
+DATA_SESSION = "session"
+# Выбор пула соединений при настройке записи (ключ общего клиента)
+DATA_DEDICATED_CONNECTION = "dedicated_connection"
+
+# 🌙 Следующий учебный день: вечерняя предзагрузка и смена дня в полночь
+CONF_PREFETCH = "prefetch_next_day"
+DEFAULT_PREFETCH = False
+CONF_PREFETCH_TIME = "prefetch_time"
+DEFAULT_PREFETCH_TIME = "19:00"
+# Разброс времени предзагрузки между учениками (сек)
+PREFETCH_JITTER = 3600
+# {"payload", "fingerprint", "updated"} предзагруженного дня
+DATA_NEXT_DAY = "next_day"
+DATA_DAY_CHANGE = "day_change"
+
+# 🚦 Общий лимит запросов к API (token bucket) для всех записей
+CONF_RATE_LIMIT = "rate_limit"
+DEFAULT_RATE_LIMIT = 5.0
+CONF_RATE_BURST = "rate_burst"
+DEFAULT_RATE_BURST = 10
+DATA_REQUEST_SCHEDULER = "request_scheduler"
+
+# 🔔 События об изменениях в дневнике (только изменившийся урок)
+EVENT_NEW_MARK = "profimaktab_new_mark"
+EVENT_HOMEWORK_CHANGED = "profimaktab_homework_changed"
+
+# 📅 Календарь уроков — из локального индекса дней дневника
+CALENDAR_MAX_DAYS = 200
+# Не больше стольких дней загружается за один просмотр календаря
+CALENDAR_FETCH_LIMIT = 62
+# Недавние и будущие дни перепроверяются чаще, архивные — раз в неделю
+CALENDAR_RECENT_DAYS = 7
+CALENDAR_RECENT_MAX_AGE = 6 * 3600
+CALENDAR_ARCHIVE_MAX_AGE = 7 * 24 * 3600
+# 🔔 Расписание звонков: (начало, конец) урока по его номеру
+BELL_SCHEDULE = (
+    ("08:00", "08:45"),
+    ("08:55", "09:40"),
+    ("09:50", "10:35"),
+    ("10:45", "11:30"),
+    ("11:40", "12:25"),
+    ("12:35", "13:20"),
+    ("13:30", "14:15"),
+    ("14:25", "15:10"),
+)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import time
+from bisect import bisect_left, insort
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .model import DairyDay
+
+
+class DayIndex:
+    """
+    Parsed diary days of one student, indexed by date.
+
+    Dates are kept sorted, so a date range (a calendar week or month) is
+    found with two bisections instead of a scan. Each day remembers when it
+    was fetched (wall clock, so it survives a restart); when the index is
+    full the day farthest from `today` is dropped.
+    """
+
+    def __init__(self, max_days: int) -> None:
+        self._max_days = max_days
+        self._dates: List[date] = []
+        self._days: Dict[date, Tuple[DairyDay, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def get(self, day: date) -> Optional[Tuple[DairyDay, float]]:
+        """(payload, fetched timestamp) of one day, or None."""
+        return self._days.get(day)
+
+    def put(
+        self,
+        day: date,
+        payload: DairyDay,
+        fetched: Optional[float] = None,
+        *,
+        today: Optional[date] = None,
+    ) -> None:
+        if day not in self._days:
+            insort(self._dates, day)
+        self._days[day] = (payload, time.time() if fetched is None else fetched)
+        if len(self._dates) > self._max_days:
+            self._evict(today or day)
+
+    def _evict(self, today: date) -> None:
+        while len(self._dates) > self._max_days:
+            first, last = self._dates[0], self._dates[-1]
+            victim = first if today - first >= last - today else last
+            self._dates.remove(victim)
+            del self._days[victim]
+
+    def range(self, start: date, end: date) -> List[Tuple[date, DairyDay, float]]:
+        """Indexed days with start <= day <= end, in date order."""
+        first = bisect_left(self._dates, start)
+        result = []
+        for day in self._dates[first:]:
+            if day > end:
+                break
+            payload, fetched = self._days[day]
+            result.append((day, payload, fetched))
+        return result
+
+    def missing(
+        self,
+        days: Iterable[date],
+        max_age: Callable[[date], float],
+        now: Optional[float] = None,
+    ) -> List[date]:
+        """Days that are not indexed or older than max_age(day) seconds."""
+        if now is None:
+            now = time.time()
+        result = []
+        for day in days:
+            item = self._days.get(day)
+            if item is None or now - item[1] > max_age(day):
+                result.append(day)
+        return result
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "days": [
+                {
+                    "fetched": self._days[day][1],
+                    "payload": self._days[day][0].as_dict(),
+                }
+                for day in self._dates
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], max_days: int) -> "DayIndex":
+        index = cls(max_days)
+        for item in (data or {}).get("days") or []:
+            payload = DairyDay.from_dict(item.get("payload"))
+            if payload is None:
+                continue
+            index.put(
+                date.fromisoformat(payload.date), payload, item.get("fetched", 0.0)
+            )
+        return index
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    DOMAIN,
+    CONF_USERNAME,
+    CONF_PASSWORD,
+    DATA_CLIENT,
+    DATA_PAYLOAD,
+    DATA_STATS,
+    DATA_FINGERPRINT,
+    DATA_LAST_UPDATED,
+    DATA_LAST_REFRESH,
+    DATA_STALE,
+    DATA_REQUEST_SCHEDULER,
+)
+
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD, "student_name", "student"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> Dict[str, Any]:
+    """Diagnostics for a config entry (credentials and names redacted)."""
+    entry_data = hass.data[DOMAIN].get(entry.entry_id) or {}
+    client = entry_data.get(DATA_CLIENT)
+    payload = entry_data.get(DATA_PAYLOAD)
+    fingerprint = entry_data.get(DATA_FINGERPRINT)
+    last_updated = entry_data.get(DATA_LAST_UPDATED)
+    last_refresh = entry_data.get(DATA_LAST_REFRESH)
+
+    return {
+        "entry": {
+            "title": "**REDACTED**",
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "state": {
+            "stale": entry_data.get(DATA_STALE),
+            "last_updated": last_updated.isoformat() if last_updated else None,
+            "last_refresh": (
+                {
+                    **last_refresh,
+                    "finished": last_refresh["finished"].isoformat(),
+                }
+                if last_refresh
+                else None
+            ),
+            "fingerprint": (
+                [fingerprint[0].isoformat(), fingerprint[1]]
+                if fingerprint
+                else None
+            ),
+            "stats": entry_data.get(DATA_STATS),
+            "payload": (
+                {
+                    "date": payload.date,
+                    "lesson_count": payload.lesson_count,
+                    "marks_count": payload.marks_count,
+                }
+                if payload
+                else None
+            ),
+        },
+        "client": (
+            {
+                "metrics": client.metrics.as_dict(),
+                "circuit_breaker": client.breaker_state,
+            }
+            if client
+            else None
+        ),
+        "request_scheduler": (
+            scheduler.as_dict()
+            if (scheduler := hass.data[DOMAIN].get(DATA_REQUEST_SCHEDULER))
+            else None
+        ),
+    }
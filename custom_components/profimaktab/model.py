@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import sys
+from statistics import mean
+from typing import Any, Dict, List, Optional, Tuple
+
+from .aggregate import UNKNOWN_SUBJECT
+from .parser import MISSING, DairyBatch, parse_dairy_batch, parse_mark
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+class Lesson:
+    """One lesson; repeated strings (subject, mark, reason) are interned."""
+
+    __slots__ = ("order", "subject", "topic", "homework", "mark", "reason")
+
+    def __init__(
+        self,
+        order: Any,
+        subject: Optional[str],
+        topic: Optional[str],
+        homework: Optional[str],
+        mark: Optional[str],
+        reason: Optional[str],
+    ) -> None:
+        self.order = order
+        self.subject = _intern(subject)
+        self.topic = topic
+        self.homework = homework
+        # Mark as the diary shows it ("5", "н", ...); numbers are derived
+        self.mark = _intern(mark)
+        self.reason = _intern(reason)
+
+    @property
+    def numeric_mark(self) -> Optional[int]:
+        if not self.mark:
+            return None
+        value = parse_mark(self.mark)
+        return None if value == MISSING else value
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "lesson": self.order,
+            "subject": self.subject,
+            "topic": self.topic,
+            "homework": self.homework,
+            "mark": (
+                {"value": self.mark, "reason": self.reason} if self.mark else None
+            ),
+        }
+
+
+class DairyDay:
+    """
+    Compact parsed diary day kept in hass.data and the entry Store.
+
+    Marks live only on the lessons; the marks list, counts and average are
+    derived, and dicts are built only when an entity, the Store or a
+    service response asks for them (as_dict()). Days are built from
+    DairyBatch rows, so the parsing rules live only in the batch parser.
+    """
+
+    __slots__ = ("date", "student", "lessons")
+
+    def __init__(self, date: str, student: str, lessons: Tuple[Lesson, ...]) -> None:
+        self.date = sys.intern(date)
+        self.student = student
+        self.lessons = lessons
+
+    @classmethod
+    def parse(
+        cls, dairy: List[Dict[str, Any]], *, student: str, date: str
+    ) -> "DairyDay":
+        """Parse a raw /dairy/ response."""
+        return cls.from_batch(parse_dairy_batch([(date, dairy)]), 0, student=student)
+
+    @classmethod
+    def from_batch(
+        cls, batch: DairyBatch, day_number: int, *, student: str
+    ) -> "DairyDay":
+        """One day of a parsed DairyBatch."""
+        return cls(
+            batch.dates[day_number],
+            student,
+            tuple(Lesson(*row) for row in batch.day_lessons(day_number)),
+        )
+
+    @classmethod
+    def from_dict(cls, payload: Optional[Dict[str, Any]]) -> Optional["DairyDay"]:
+        """Rebuild from an as_dict() payload (e.g. the Store)."""
+        if not payload:
+            return None
+        lessons = []
+        for lesson in payload.get("lessons") or []:
+            mark = lesson.get("mark") or {}
+            lessons.append(
+                Lesson(
+                    lesson.get("lesson"),
+                    lesson.get("subject"),
+                    lesson.get("topic"),
+                    lesson.get("homework"),
+                    mark.get("value"),
+                    mark.get("reason"),
+                )
+            )
+        return cls(payload["date"], payload.get("student"), tuple(lessons))
+
+    @property
+    def marks(self) -> List[int]:
+        return [
+            value
+            for value in (lesson.numeric_mark for lesson in self.lessons)
+            if value is not None
+        ]
+
+    @property
+    def lesson_count(self) -> int:
+        return len(self.lessons)
+
+    @property
+    def marks_count(self) -> int:
+        return len(self.marks)
+
+    @property
+    def average(self) -> Any:
+        marks = self.marks
+        return round(mean(marks), 1) if marks else 0
+
+    def subject_marks(self) -> List[Tuple[str, int]]:
+        """(subject, mark) pairs for the aggregator; non-numeric marks skipped."""
+        pairs = []
+        for lesson in self.lessons:
+            value = lesson.numeric_mark
+            if value is not None:
+                pairs.append((lesson.subject or UNKNOWN_SUBJECT, value))
+        return pairs
+
+    def lesson_dicts(self) -> List[Dict[str, Any]]:
+        return [lesson.as_dict() for lesson in self.lessons]
+
+    def as_dict(self) -> Dict[str, Any]:
+        marks = self.marks
+        return {
+            "date": self.date,
+            "student": self.student,
+            "lessons": self.lesson_dicts(),
+            "lesson_count": len(self.lessons),
+            "marks": marks,
+            "marks_count": len(marks),
+            "average": round(mean(marks), 1) if marks else 0,
+        }
+
+
+def diff_days(
+    previous: Optional[DairyDay], current: DairyDay
+) -> Tuple[
+    List[Tuple[Lesson, Optional[str]]], List[Tuple[Lesson, Optional[str]]]
+]:
+    """
+    Lessons of `current` that changed since `previous`.
+
+    Returns (new_marks, homework_changes) as (lesson, previous value) pairs.
+    Lessons are matched by (order, subject). Without a baseline for the same
+    date every mark counts as new, while homework is not reported (the first
+    payload of a day is its baseline).
+    """
+    if previous is not None and previous.date != current.date:
+        previous = None
+
+    old: Dict[Tuple[Any, Optional[str]], List[Lesson]] = {}
+    for lesson in previous.lessons if previous is not None else ():
+        old.setdefault((lesson.order, lesson.subject), []).append(lesson)
+
+    new_marks = []
+    homework = []
+    for lesson in current.lessons:
+        matches = old.get((lesson.order, lesson.subject))
+        before = matches.pop(0) if matches else None
+        previous_mark = before.mark if before else None
+        if lesson.mark and lesson.mark != previous_mark:
+            new_marks.append((lesson, previous_mark))
+        if previous is None:
+            continue
+        previous_homework = before.homework if before else None
+        if lesson.homework != previous_homework:
+            homework.append((lesson, previous_homework))
+    return new_marks, homework
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import logging
+import random
+from datetime import date, datetime, timedelta
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later, async_track_time_change
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    CONF_PREFETCH,
+    CONF_PREFETCH_TIME,
+    CONF_SCHOOL_DAYS,
+    DATA_NEXT_DAY,
+    DEFAULT_PREFETCH,
+    DEFAULT_PREFETCH_TIME,
+    DEFAULT_SCHOOL_DAYS,
+    PREFETCH_JITTER,
+    SCHEDULER_START_JITTER,
+)
+from .scheduler import parse_school_time
+from .update import async_prefetch_day, async_rollover
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ProfiMaktabNextDay:
+    """
+    Day change for one student.
+
+    At local midnight (HA time zone) the payload prefetched for the new day
+    is swapped in without any request. With the prefetch option enabled,
+    the next school day is fetched every evening at prefetch_time plus a
+    random delay, so students and installations do not hit the API at the
+    same second.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        self._hass = hass
+        self._entry = entry
+
+        options = entry.options
+        self._prefetch = options.get(CONF_PREFETCH, DEFAULT_PREFETCH)
+        self._time = parse_school_time(
+            options.get(CONF_PREFETCH_TIME, DEFAULT_PREFETCH_TIME)
+        )
+        self._days = {
+            int(day) for day in options.get(CONF_SCHOOL_DAYS, DEFAULT_SCHOOL_DAYS)
+        }
+        self._unsub_midnight: CALLBACK_TYPE | None = None
+        self._unsub_prefetch: CALLBACK_TYPE | None = None
+        # День, предзагрузка которого не удалась — ждём следующего вечера
+        self._failed_day: date | None = None
+        self._pending_day: date | None = None
+        self._running = False
+
+    @callback
+    def async_start(self) -> None:
+        self._running = True
+        self._unsub_midnight = async_track_time_change(
+            self._hass, self._handle_midnight, hour=0, minute=0, second=0
+        )
+        if self._prefetch:
+            self._schedule_prefetch()
+
+    @callback
+    def async_stop(self) -> None:
+        self._running = False
+        if self._unsub_midnight is not None:
+            self._unsub_midnight()
+            self._unsub_midnight = None
+        self._cancel_prefetch()
+
+    def _cancel_prefetch(self) -> None:
+        if self._unsub_prefetch is not None:
+            self._unsub_prefetch()
+            self._unsub_prefetch = None
+
+    def next_school_day(self, today: date) -> date | None:
+        for offset in range(1, 8):
+            day = today + timedelta(days=offset)
+            if day.weekday() in self._days:
+                return day
+        return None
+
+    def _has_prefetched(self, day: date) -> bool:
+        next_day = self._hass.data[DOMAIN][self._entry.entry_id].get(DATA_NEXT_DAY)
+        return bool(next_day) and next_day["fingerprint"][0] == day
+
+    @callback
+    def _handle_midnight(self, _now: datetime) -> None:
+        async_rollover(self._hass, self._entry)
+
+    @callback
+    def _schedule_prefetch(self) -> None:
+        self._cancel_prefetch()
+        if not self._running:
+            return
+
+        now = dt_util.now()
+        start = datetime.combine(now.date(), self._time, tzinfo=now.tzinfo)
+        day = self.next_school_day(now.date())
+        if day is None:
+            return
+
+        if (
+            now >= start
+            and day != self._failed_day
+            and not self._has_prefetched(day)
+        ):
+            # Запуск после вечернего времени — догоняем сегодняшнюю предзагрузку
+            delay = random.uniform(0, SCHEDULER_START_JITTER)
+        else:
+            if now >= start:
+                start += timedelta(days=1)
+                day = self.next_school_day(start.date())
+                if day is None:
+                    return
+            delay = (start - now).total_seconds() + random.uniform(
+                0, PREFETCH_JITTER
+            )
+
+        # Предзагрузка должна закончиться до полуночи того же вечера
+        midnight = datetime.combine(
+            (now + timedelta(seconds=delay)).date(),
+            datetime.min.time(),
+            tzinfo=now.tzinfo,
+        ) + timedelta(days=1)
+        latest = (midnight - now).total_seconds() - 60
+        delay = max(0.0, min(delay, latest))
+
+        _LOGGER.debug(
+            "ProfiMaktab: prefetch of %s for %s in %.0fs",
+            day,
+            self._entry.title,
+            delay,
+        )
+        self._pending_day = day
+        self._unsub_prefetch = async_call_later(
+            self._hass, delay, self._handle_prefetch
+        )
+
+    @callback
+    def _handle_prefetch(self, _now: datetime) -> None:
+        self._unsub_prefetch = None
+        self._entry.async_create_background_task(
+            self._hass,
+            self._async_prefetch(self._pending_day),
+            f"{DOMAIN}_prefetch_{self._entry.entry_id}",
+        )
+
+    async def _async_prefetch(self, day: date) -> None:
+        try:
+            await async_prefetch_day(self._hass, self._entry, day)
+        except Exception as err:  # noqa: BLE001
+            self._failed_day = day
+            _LOGGER.warning(
+                "ProfiMaktab: prefetch of %s failed for %s: %s",
+                day,
+                self._entry.title,
+                err,
+            )
+        finally:
+            # Следующая — завтра вечером
+            self._schedule_prefetch()
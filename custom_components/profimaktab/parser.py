@@ -1,52 +1,221 @@
 from __future__ import annotations
 
-from statistics import mean
-from typing import Any, Dict, List
-
-
-def parse_dairy(dairy: List[Dict[str, Any]], *, student: str, date: str) -> Dict[str, Any]:
-    lessons = []
-    marks: List[int] = []
-
-    for item in sorted(dairy, key=lambda x: x.get("lesson_order", 0)):
-        subject = item.get("subject", {}).get("name")
-        themes = item.get("themes") or []
-        topic = themes[0]["title"] if themes else None
-        homework = themes[0].get("notes") if themes else None
-
-        mark_value = None
-        mark_reason = None
-        if item.get("marks"):
-            m = item["marks"][0]
-            mark_value = str(m.get("value"))
-            mark_reason = m.get("reason")
-            try:
-                marks.append(int(mark_value))
-            except Exception:
-                pass
-
-        lessons.append(
-            {
-                "lesson": item.get("lesson_order"),
-                "subject": subject,
-                "topic": topic,
-                "homework": homework,
-                "mark": (
-                    {"value": mark_value, "reason": mark_reason}
-                    if mark_value
-                    else None
-                ),
-            }
-        )
-
-    avg = round(mean(marks), 1) if marks else 0
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
+from .aggregate import UNKNOWN_SUBJECT
+
+
+def _name_of(value: Any) -> Any:
+    """Name of a nested {"name": ...} object, or the value itself."""
+    if isinstance(value, dict):
+        return value.get("name") or value.get("title")
+    return value
+
+
+def parse_student(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Name, class and school from a /student_students/{id} record."""
+    user = data.get("user") or {}
+    group = data.get("group") or data.get("klass") or data.get("class")
+    school = data.get("school") or (
+        group.get("school") if isinstance(group, dict) else None
+    )
     return {
-        "date": date,
-        "student": student,
-        "lessons": lessons,
-        "lesson_count": len(lessons),
-        "marks": marks,
-        "marks_count": len(marks),
-        "average": avg,
+        "name": user.get("name") or data.get("name"),
+        "class": _name_of(group),
+        "school": _name_of(school),
     }
+
+# ---------- Diary parsing (columnar) ----------
+
+# Sentinel for "no value" in integer columns (array("i"): 32-bit signed)
+MISSING = -(2**31)
+_INT_MAX = 2**31 - 1
+
+# Marker for "lesson has no mark entry" (distinct from a mark with value None)
+_NO_MARK = object()
+
+# Fast path for the usual mark values; anything else goes through int()
+_MARK_VALUES = {str(value): value for value in range(0, 13)}
+
+
+def parse_mark(value: Any) -> int:
+    """Numeric mark (anything int() accepts as text), or MISSING."""
+    if type(value) is int:
+        mark = value
+    else:
+        text = str(value)
+        mark = _MARK_VALUES.get(text)
+        if mark is not None:
+            return mark
+        try:
+            mark = int(text)
+        except (TypeError, ValueError):
+            return MISSING
+    # Не помещается в колонку — считаем, что числовой оценки нет
+    return mark if MISSING < mark <= _INT_MAX else MISSING
+
+
+def _lesson_number(value: Any) -> int:
+    """lesson_order as an int ("1" and 1.0 included), or MISSING."""
+    if type(value) is not int:
+        try:
+            value = int(value)
+        except (TypeError, ValueError, OverflowError):
+            return MISSING
+    return value if MISSING < value <= _INT_MAX else MISSING
+
+
+def lesson_order_key(item: Dict[str, Any]) -> int:
+    order = item.get("lesson_order", 0)
+    if type(order) is int:
+        return order
+    number = _lesson_number(order)
+    return 0 if number == MISSING else number
+
+
+class DairyBatch:
+    """
+    Many parsed diary days in parallel columns.
+
+    Row i is one lesson: day_index[i], lesson_order[i], subject_id[i] and
+    mark[i] are compact integer arrays (MISSING where absent or not a
+    32-bit int); lesson_order values that are not plain ints are kept as
+    sent in `order_raw`. Subject names are interned once in `subjects`. Text columns (topic, homework,
+    mark value/reason) are only read by day_lessons(). add_day() holds the
+    diary parsing rules; model.DairyDay is built from these rows.
+    """
+
+    __slots__ = (
+        "dates",
+        "offsets",
+        "day_index",
+        "lesson_order",
+        "order_raw",
+        "subject_id",
+        "mark",
+        "mark_raw",
+        "mark_reason",
+        "topic",
+        "homework",
+        "subjects",
+        "_subject_ids",
+    )
+
+    def __init__(self) -> None:
+        self.dates: List[str] = []
+        # Row range of day d: offsets[d]:offsets[d + 1]
+        self.offsets = array("I", [0])
+        self.day_index = array("I")
+        self.lesson_order = array("i")
+        # row -> lesson_order as sent, only where it is not a plain int
+        self.order_raw: Dict[int, Any] = {}
+        self.subject_id = array("i")
+        self.mark = array("i")
+        self.mark_raw: List[Any] = []
+        self.mark_reason: List[Any] = []
+        self.topic: List[Any] = []
+        self.homework: List[Any] = []
+        self.subjects: List[str] = []
+        self._subject_ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.day_index)
+
+    def add_day(self, day: str, dairy: List[Dict[str, Any]]) -> None:
+        day_number = len(self.dates)
+        self.dates.append(sys.intern(day))
+
+        subject_ids = self._subject_ids
+        for item in sorted(dairy, key=lesson_order_key):
+            order = item.get("lesson_order")
+            name = item.get("subject", {}).get("name")
+            if name is None:
+                subject = MISSING
+            else:
+                subject = subject_ids.get(name)
+                if subject is None:
+                    subject = subject_ids[name] = len(self.subjects)
+                    self.subjects.append(sys.intern(name))
+
+            themes = item.get("themes") or []
+            marks = item.get("marks")
+            if marks:
+                first = marks[0]
+                raw = first.get("value")
+                if type(raw) is int and MISSING < raw <= _INT_MAX:
+                    mark = raw
+                else:
+                    mark = parse_mark(raw)
+                reason = first.get("reason")
+            else:
+                raw = reason = None
+                mark = MISSING
+
+            if type(order) is int and MISSING < order <= _INT_MAX:
+                number = order
+            else:
+                number = _lesson_number(order)
+                if order is not None:
+                    self.order_raw[len(self.day_index)] = order
+            self.day_index.append(day_number)
+            self.lesson_order.append(number)
+            self.subject_id.append(subject)
+            self.mark.append(mark)
+            self.mark_raw.append(raw if marks else _NO_MARK)
+            self.mark_reason.append(reason)
+            self.topic.append(themes[0]["title"] if themes else None)
+            self.homework.append(themes[0].get("notes") if themes else None)
+
+        self.offsets.append(len(self.day_index))
+
+    def day_marks(self, day_number: int) -> List[int]:
+        """Numeric marks of one day, in lesson order."""
+        start, end = self.offsets[day_number], self.offsets[day_number + 1]
+        return [mark for mark in self.mark[start:end] if mark != MISSING]
+
+    def day_subject_marks(self, day_number: int) -> List[Tuple[str, int]]:
+        """(subject, mark) pairs of one day, as DairyDay.subject_marks()."""
+        start, end = self.offsets[day_number], self.offsets[day_number + 1]
+        pairs = []
+        for row in range(start, end):
+            mark = self.mark[row]
+            if mark == MISSING:
+                continue
+            subject = self.subject_id[row]
+            pairs.append(
+                (
+                    self.subjects[subject] if subject != MISSING else UNKNOWN_SUBJECT,
+                    mark,
+                )
+            )
+        return pairs
+
+    def day_lessons(self, day_number: int) -> Iterator[Tuple[Any, ...]]:
+        """(order, subject, topic, homework, mark, reason) rows of one day."""
+        start, end = self.offsets[day_number], self.offsets[day_number + 1]
+        for row in range(start, end):
+            order = self.lesson_order[row]
+            subject = self.subject_id[row]
+            raw = self.mark_raw[row]
+            if row in self.order_raw:
+                order = self.order_raw[row]
+            elif order == MISSING:
+                order = None
+            yield (
+                order,
+                self.subjects[subject] if subject != MISSING else None,
+                self.topic[row],
+                self.homework[row],
+                None if raw is _NO_MARK else str(raw),
+                self.mark_reason[row],
+            )
+
+
+def parse_dairy_batch(days: Iterable[Tuple[str, List[Dict[str, Any]]]]) -> DairyBatch:
+    """Parse many (date, dairy) days at once into a DairyBatch."""
+    batch = DairyBatch()
+    for day, dairy in days:
+        batch.add_day(day, dairy)
+    return batch
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# Requests made from this context (and tasks it creates) use this priority
+request_priority: ContextVar[int] = ContextVar(
+    "profimaktab_request_priority", default=PRIORITY_BACKGROUND
+)
+
+
+@contextmanager
+def interactive_requests() -> Iterator[None]:
+    """Run API requests of the block ahead of background ones."""
+    token = request_priority.set(PRIORITY_INTERACTIVE)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class RequestScheduler:
+    """
+    Token bucket shared by every client of the integration.
+
+    A request takes one token; tokens refill at `rate` per second up to
+    `burst`. When requests have to wait, interactive ones are served
+    before background ones, and inside a priority the queue is round-robin
+    over accounts and, within an account, over students, so one busy
+    account cannot starve the others.
+    """
+
+    # Number of recent waits kept for the percentiles
+    WAIT_SAMPLES = 256
+
+    def __init__(self, rate: float = 5.0, burst: int = 10) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        # priority -> account -> student -> waiters
+        self._queues: List[
+            "OrderedDict[str, OrderedDict[str, Deque[asyncio.Future]]]"
+        ] = [OrderedDict(), OrderedDict()]
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.granted = 0
+        self.waited = 0
+        self.max_queue_depth = 0
+        self._waits: Deque[float] = deque(maxlen=self.WAIT_SAMPLES)
+        self._max_wait = 0.0
+
+    def configure(self, rate: float, burst: int) -> None:
+        if (rate, burst) == (self._rate, self._burst):
+            return
+        self._refill()
+        self._rate = rate
+        self._burst = burst
+        self._tokens = min(self._tokens, float(burst))
+        _LOGGER.debug(
+            "ProfiMaktab: request rate limit %.2f/s (burst %d)", rate, burst
+        )
+        self._reschedule()
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(
+            len(waiters)
+            for queue in self._queues
+            for students in queue.values()
+            for waiters in students.values()
+        )
+
+    async def acquire(
+        self, account: str, student: str = "", priority: Optional[int] = None
+    ) -> None:
+        """Wait for a token (fair, by priority)."""
+        if priority is None:
+            priority = request_priority.get()
+
+        self._refill()
+        if self._tokens >= 1 and not self.queue_depth:
+            self._tokens -= 1
+            self.granted += 1
+            self._waits.append(0.0)
+            return
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        students = self._queues[priority].setdefault(account, OrderedDict())
+        students.setdefault(student, deque()).append(future)
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        self._reschedule()
+
+        started = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Токен уже выдан — возвращаем его
+                self._tokens = min(self._burst, self._tokens + 1)
+                self.granted -= 1
+            else:
+                self._discard(priority, account, student, future)
+            self._reschedule()
+            raise
+        wait = time.monotonic() - started
+        self.waited += 1
+        self._waits.append(wait)
+        self._max_wait = max(self._max_wait, wait)
+
+    def _discard(
+        self, priority: int, account: str, student: str, future: asyncio.Future
+    ) -> None:
+        students = self._queues[priority].get(account)
+        waiters = students.get(student) if students else None
+        if not waiters or future not in waiters:
+            return
+        waiters.remove(future)
+        if not waiters:
+            del students[student]
+        if not students:
+            del self._queues[priority][account]
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            float(self._burst), self._tokens + (now - self._updated) * self._rate
+        )
+        self._updated = now
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Pop the next live waiter: by priority, then round-robin."""
+        for queue in self._queues:
+            while queue:
+                account, students = next(iter(queue.items()))
+                student, waiters = next(iter(students.items()))
+                future = waiters.popleft()
+
+                # Ученик и аккаунт уходят в конец очереди
+                del students[student]
+                if waiters:
+                    students[student] = waiters
+                del queue[account]
+                if students:
+                    queue[account] = students
+
+                if not future.done():
+                    return future
+        return None
+
+    def _dispatch(self) -> None:
+        self._timer = None
+        self._refill()
+        while self._tokens >= 1:
+            future = self._next_waiter()
+            if future is None:
+                break
+            self._tokens -= 1
+            self.granted += 1
+            future.set_result(None)
+        self._reschedule()
+
+    def _reschedule(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.queue_depth:
+            return
+        self._refill()
+        delay = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self._rate
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def as_dict(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def _pct(pct: float) -> Optional[float]:
+            if not waits:
+                return None
+            index = min(len(waits) - 1, max(0, round(pct / 100 * len(waits)) - 1))
+            return round(waits[index] * 1000, 1)
+
+        return {
+            "rate": self._rate,
+            "burst": self._burst,
+            "tokens": round(self._tokens, 2),
+            "queue_depth": self.queue_depth,
+            "interactive_queued": sum(
+                len(waiters)
+                for students in self._queues[PRIORITY_INTERACTIVE].values()
+                for waiters in students.values()
+            ),
+            "max_queue_depth": self.max_queue_depth,
+            "granted": self.granted,
+            "waited": self.waited,
+            "wait_p50_ms": _pct(50),
+            "wait_p95_ms": _pct(95),
+            "wait_max_ms": round(self._max_wait * 1000, 1),
+        }
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class RefreshResult:
+    """Outcome of a single refresh job."""
+
+    key: str
+    name: str
+    success: bool
+    latency: float
+    error: Optional[str] = None
+    # Set when the job reports whether its data changed
+    changed: Optional[bool] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "student": self.name,
+            "success": self.success,
+            "changed": self.changed,
+            "latency": round(self.latency, 3),
+            "error": self.error,
+        }
+
+
+@dataclass
+class RefreshJob:
+    """A named coroutine factory run by async_run_bounded."""
+
+    key: str
+    name: str
+    factory: Callable[[], Awaitable[Any]]
+    timeout: Optional[float] = None
+
+
+async def async_run_bounded(
+    jobs: List[RefreshJob],
+    *,
+    max_concurrency: int,
+    timeout: Optional[float] = None,
+) -> List[RefreshResult]:
+    """
+    Run jobs concurrently, at most max_concurrency at a time.
+    Each job gets its own timeout, so one slow job cannot hold up the others.
+    Results are returned in the same order as jobs. A job factory may
+    return a bool telling whether its data changed.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _run(job: RefreshJob) -> RefreshResult:
+        job_timeout = job.timeout if job.timeout is not None else timeout
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                value = await asyncio.wait_for(job.factory(), job_timeout)
+            except asyncio.TimeoutError:
+                return RefreshResult(
+                    job.key,
+                    job.name,
+                    False,
+                    time.monotonic() - started,
+                    f"timeout after {job_timeout}s",
+                )
+            except Exception as err:  # noqa: BLE001
+                return RefreshResult(
+                    job.key,
+                    job.name,
+                    False,
+                    time.monotonic() - started,
+                    str(err) or type(err).__name__,
+                )
+            return RefreshResult(
+                job.key,
+                job.name,
+                True,
+                time.monotonic() - started,
+                changed=value if isinstance(value, bool) else None,
+            )
+
+    return list(await asyncio.gather(*(_run(job) for job in jobs)))
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import logging
+import random
+from datetime import datetime, timedelta, time
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    CONF_SCHOOL_START,
+    CONF_SCHOOL_END,
+    CONF_SCHOOL_DAYS,
+    CONF_UPDATE_INTERVAL,
+    DEFAULT_SCHOOL_START,
+    DEFAULT_SCHOOL_END,
+    DEFAULT_SCHOOL_DAYS,
+    DEFAULT_UPDATE_INTERVAL,
+    SCHEDULER_MAX_BACKOFF,
+    SCHEDULER_JITTER_FRACTION,
+    SCHEDULER_START_JITTER,
+)
+from .update import async_fetch_entry
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_school_time(value: str) -> time:
+    """Parse "HH:MM" (or "HH:MM:SS"); raises ValueError."""
+    parsed = dt_util.parse_time(value)
+    if parsed is None:
+        raise ValueError(f"Invalid time: {value}")
+    return parsed
+
+
+class ProfiMaktabScheduler:
+    """
+    Opt-in refresh schedule for one student.
+
+    Refreshes every update_interval minutes inside the school-hours window
+    and not at all outside it. The interval doubles while the diary stays
+    unchanged (up to SCHEDULER_MAX_BACKOFF times) and resets on a change.
+    Each run is jittered so students and installations do not hit the API
+    at the same second.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        self._hass = hass
+        self._entry = entry
+
+        options = entry.options
+        self._start = parse_school_time(
+            options.get(CONF_SCHOOL_START, DEFAULT_SCHOOL_START)
+        )
+        self._end = parse_school_time(
+            options.get(CONF_SCHOOL_END, DEFAULT_SCHOOL_END)
+        )
+        self._days = {
+            int(day) for day in options.get(CONF_SCHOOL_DAYS, DEFAULT_SCHOOL_DAYS)
+        }
+        self._base_interval = (
+            options.get(CONF_UPDATE_INTERVAL, DEFAULT_UPDATE_INTERVAL) * 60
+        )
+        self._interval = self._base_interval
+        self._unsub: CALLBACK_TYPE | None = None
+        self._running = False
+
+    @callback
+    def async_start(self) -> None:
+        self._running = True
+        self._schedule_next()
+
+    @callback
+    def async_stop(self) -> None:
+        self._running = False
+        self._cancel_timer()
+
+    def _cancel_timer(self) -> None:
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+
+    def _in_window(self, now: datetime) -> bool:
+        return (
+            now.weekday() in self._days
+            and self._start <= now.time() < self._end
+        )
+
+    def _next_window_start(self, now: datetime) -> datetime | None:
+        for offset in range(8):
+            day = now.date() + timedelta(days=offset)
+            if day.weekday() not in self._days:
+                continue
+            start = datetime.combine(day, self._start, tzinfo=now.tzinfo)
+            if start > now:
+                return start
+        return None
+
+    @callback
+    def _schedule_next(self) -> None:
+        self._cancel_timer()
+        if not self._running:
+            return
+
+        now = dt_util.now()
+        if self._in_window(now):
+            delay = self._interval + random.uniform(
+                0, self._interval * SCHEDULER_JITTER_FRACTION
+            )
+        else:
+            # Новый учебный день — сбрасываем backoff
+            self._interval = self._base_interval
+            next_start = self._next_window_start(now)
+            if next_start is None:
+                _LOGGER.debug(
+                    "ProfiMaktab scheduler: no school days configured for %s",
+                    self._entry.title,
+                )
+                return
+            delay = (next_start - now).total_seconds() + random.uniform(
+                0, SCHEDULER_START_JITTER
+            )
+
+        _LOGGER.debug(
+            "ProfiMaktab scheduler: next refresh for %s in %.0fs",
+            self._entry.title,
+            delay,
+        )
+        self._unsub = async_call_later(self._hass, delay, self._handle_timer)
+
+    @callback
+    def _handle_timer(self, _now: datetime) -> None:
+        self._unsub = None
+        self._entry.async_create_background_task(
+            self._hass,
+            self._async_run(),
+            f"{DOMAIN}_scheduled_update_{self._entry.entry_id}",
+        )
+
+    async def _async_run(self) -> None:
+        try:
+            if self._in_window(dt_util.now()):
+                changed = await async_fetch_entry(self._hass, self._entry)
+                if changed:
+                    self._interval = self._base_interval
+                else:
+                    self._interval = min(
+                        self._interval * 2,
+                        self._base_interval * SCHEDULER_MAX_BACKOFF,
+                    )
+        except Exception as err:  # noqa: BLE001
+            _LOGGER.warning(
+                "ProfiMaktab scheduler: refresh failed for %s: %s",
+                self._entry.title,
+                err,
+            )
+            self._interval = min(
+                self._interval * 2,
+                self._base_interval * SCHEDULER_MAX_BACKOFF,
+            )
+        finally:
+            self._schedule_next()
@@ -1,11 +1,39 @@
 from __future__ import annotations
 
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import PERCENTAGE, EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
-from .const import DOMAIN, DATA_PAYLOAD, SIGNAL_DATA_UPDATED
+from homeassistant.util import slugify
+
+from .aggregate import ALL_SUBJECTS, MarkAggregator, term_key
+from .update import local_today, student_display_name
+from .const import (
+    DOMAIN,
+    DATA_CLIENT,
+    DATA_PAYLOAD,
+    DATA_LAST_UPDATED,
+    DATA_STALE,
+    DATA_AGGREGATOR,
+    DATA_LAST_REFRESH,
+    DATA_STUDENT_INFO,
+    DATA_NEXT_DAY,
+    DATA_REQUEST_SCHEDULER,
+    SIGNAL_DATA_UPDATED,
+    SIGNAL_DIAGNOSTICS_UPDATED,
+    SIGNAL_NEW_SUBJECTS,
+    CONF_LESSON_SENSORS,
+    DEFAULT_LESSON_SENSORS,
+    CONF_PREFETCH,
+    DEFAULT_PREFETCH,
+    LESSON_SLOTS,
+)
 
 
 import logging
@@ -19,45 +47,122 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     _LOGGER.debug("ProfiMaktab sensor: setting up sensors for %s", entry.title)
-    async_add_entities(
-        [
-            ProfiMaktabAverageMarkSensor(hass, entry),
-            ProfiMaktabSchoolDaySensor(hass, entry),
-        ]
+    entities = [
+        ProfiMaktabAverageMarkSensor(hass, entry),
+        ProfiMaktabSchoolDaySensor(hass, entry),
+        # 🩺 Диагностика — выключены по умолчанию
+        ProfiMaktabLastRefreshSensor(hass, entry),
+        ProfiMaktabApiErrorRateSensor(hass, entry),
+        ProfiMaktabApiQueueWaitSensor(hass, entry),
+    ]
+
+    # 🌙 Следующий учебный день — если включена предзагрузка
+    if entry.options.get(CONF_PREFETCH, DEFAULT_PREFETCH):
+        entities.append(ProfiMaktabNextSchoolDaySensor(hass, entry))
+
+    # 🧩 Компактные сенсоры по урокам — по желанию
+    if entry.options.get(CONF_LESSON_SENSORS, DEFAULT_LESSON_SENSORS):
+        entities.extend(
+            ProfiMaktabLessonSensor(hass, entry, slot)
+            for slot in range(1, LESSON_SLOTS + 1)
+        )
+
+    # 📊 Средние за четверть: общий + по каждому известному предмету
+    aggregator = hass.data[DOMAIN][entry.entry_id][DATA_AGGREGATOR]
+    entities.append(ProfiMaktabTermAverageSensor(hass, entry))
+    entities.extend(
+        ProfiMaktabTermAverageSensor(hass, entry, subject)
+        for subject in sorted(aggregator.subjects)
     )
-    _LOGGER.info("ProfiMaktab sensor: 2 sensors created for %s", entry.title)
+
+    @callback
+    def _async_add_subjects(subjects) -> None:
+        async_add_entities(
+            ProfiMaktabTermAverageSensor(hass, entry, subject)
+            for subject in sorted(subjects)
+        )
+
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, SIGNAL_NEW_SUBJECTS.format(entry.entry_id), _async_add_subjects
+        )
+    )
+
+    async_add_entities(entities)
+    _LOGGER.info(
+        "ProfiMaktab sensor: %d sensors created for %s", len(entities), entry.title
+    )
+
+
+def lessons_summary(lessons) -> str:
+    """Short one-line summary: "1. Math (5) · 2. Physics"."""
+    parts = []
+    for index, lesson in enumerate(lessons, start=1):
+        part = f"{index}. {lesson.subject or '—'}"
+        if lesson.mark:
+            part += f" ({lesson.mark})"
+        parts.append(part)
+    return " · ".join(parts)
 
 
 class _BaseProfiMaktabSensor(SensorEntity):
     _attr_has_entity_name = True
+    # Dispatcher signal (formatted with entry_id) that triggers a state check
+    _signal = SIGNAL_DATA_UPDATED
 
     def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
         self._hass = hass
         self._entry = entry
+        self._last_written = None
+
+    @property
+    def _entry_data(self):
+        return self._hass.data[DOMAIN][self._entry.entry_id]
 
     @property
     def _payload(self):
-        return self._hass.data[DOMAIN][self._entry.entry_id][DATA_PAYLOAD]
+        return self._entry_data[DATA_PAYLOAD]
+
+    def _freshness_attributes(self):
+        last_updated = self._entry_data.get(DATA_LAST_UPDATED)
+        return {
+            "last_updated": last_updated.isoformat() if last_updated else None,
+            "stale": self._entry_data.get(DATA_STALE, True),
+        }
+
+    def _student_attributes(self):
+        """Current name, class and school (refreshed at most daily)."""
+        info = self._entry_data.get(DATA_STUDENT_INFO) or {}
+        return {
+            "student": student_display_name(self._hass, self._entry),
+            "class": info.get("class"),
+            "school": info.get("school"),
+        }
 
     async def async_added_to_hass(self) -> None:
         """Register dispatcher listener and write initial state."""
         self.async_on_remove(
             async_dispatcher_connect(
                 self._hass,
-                SIGNAL_DATA_UPDATED,
+                self._signal.format(self._entry.entry_id),
                 self._handle_data_update,
             )
         )
         # Сразу обновляем состояние с текущими данными
+        self._last_written = self._state_snapshot()
         self.async_write_ha_state()
 
+    def _state_snapshot(self):
+        return (self.native_value, self.extra_state_attributes)
+
+    @callback
     def _handle_data_update(self) -> None:
-        """Handle updated data from dispatcher (may be called from another thread)."""
-        # Dispatcher может вызвать это из другого потока,
-        # поэтому используем call_soon_threadsafe
-        self._hass.loop.call_soon_threadsafe(
-            self.async_write_ha_state
-        )
+        """Handle updated data; skip the write if nothing visible changed."""
+        snapshot = self._state_snapshot()
+        if snapshot == self._last_written:
+            return
+        self._last_written = snapshot
+        self.async_write_ha_state()
 
 class ProfiMaktabAverageMarkSensor(_BaseProfiMaktabSensor):
     _attr_icon = "mdi:calculator-variant"
@@ -74,7 +179,7 @@ class ProfiMaktabAverageMarkSensor(_BaseProfiMaktabSensor):
     def native_value(self):
         if not self._payload:
             return None
-        return self._payload["average"]
+        return self._payload.average
 
     @property
     def extra_state_attributes(self):
@@ -83,16 +188,19 @@ class ProfiMaktabAverageMarkSensor(_BaseProfiMaktabSensor):
             return None
         return {
             "source": "profimaktab",
-            "student": payload["student"],
-            "marks": payload["marks"],
-            "marks_count": payload["marks_count"],
-            "date": payload["date"],
+            **self._student_attributes(),
+            "marks": payload.marks,
+            "marks_count": payload.marks_count,
+            "date": payload.date,
             "attribution": "Data provided by profiMaktab.uz",
+            **self._freshness_attributes(),
         }
 
 
 class ProfiMaktabSchoolDaySensor(_BaseProfiMaktabSensor):
     _attr_icon = "mdi:school"
+    # Full lesson list (topics, homework) is kept out of the recorder
+    _unrecorded_attributes = frozenset({"lessons"})
 
     @property
     def unique_id(self):
@@ -106,7 +214,7 @@ class ProfiMaktabSchoolDaySensor(_BaseProfiMaktabSensor):
     def native_value(self):
         if not self._payload:
             return None
-        return self._payload["date"]
+        return self._payload.date
 
     @property
     def extra_state_attributes(self):
@@ -115,7 +223,269 @@ class ProfiMaktabSchoolDaySensor(_BaseProfiMaktabSensor):
             return None
         return {
             "source": "profimaktab",
-            "student": payload["student"],
-            "lesson_count": payload["lesson_count"],
-            "lessons": payload["lessons"],
+            **self._student_attributes(),
+            "lesson_count": payload.lesson_count,
+            "summary": lessons_summary(payload.lessons),
+            "lessons": payload.lesson_dicts(),
+            **self._freshness_attributes(),
+        }
+
+
+class ProfiMaktabNextSchoolDaySensor(_BaseProfiMaktabSensor):
+    """Prefetched diary of the next school day (lessons and homework)."""
+
+    _attr_icon = "mdi:calendar-arrow-right"
+    _unrecorded_attributes = frozenset({"lessons", "homework"})
+
+    @property
+    def unique_id(self):
+        return f"{self._entry.entry_id}_next_school_day"
+
+    @property
+    def name(self):
+        return "Next School Day"
+
+    @property
+    def _next_day(self):
+        return self._entry_data.get(DATA_NEXT_DAY)
+
+    @property
+    def native_value(self):
+        next_day = self._next_day
+        return next_day["payload"].date if next_day else None
+
+    @property
+    def extra_state_attributes(self):
+        next_day = self._next_day
+        if not next_day:
+            return None
+        payload = next_day["payload"]
+        return {
+            "source": "profimaktab",
+            **self._student_attributes(),
+            "lesson_count": payload.lesson_count,
+            "summary": lessons_summary(payload.lessons),
+            "homework": [
+                {"subject": lesson.subject, "homework": lesson.homework}
+                for lesson in payload.lessons
+                if lesson.homework
+            ],
+            "lessons": payload.lesson_dicts(),
+            "last_updated": next_day["updated"].isoformat(),
+        }
+
+
+class ProfiMaktabLessonSensor(_BaseProfiMaktabSensor):
+    """Compact per-slot sensor: state is the subject of the N-th lesson."""
+
+    _attr_icon = "mdi:book-open-variant"
+    _unrecorded_attributes = frozenset({"homework"})
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry, slot: int) -> None:
+        super().__init__(hass, entry)
+        self._slot = slot
+
+    @property
+    def unique_id(self):
+        return f"{self._entry.entry_id}_lesson_{self._slot}"
+
+    @property
+    def name(self):
+        return f"Lesson {self._slot}"
+
+    @property
+    def _lesson(self):
+        payload = self._payload
+        if not payload or payload.lesson_count < self._slot:
+            return None
+        return payload.lessons[self._slot - 1]
+
+    @property
+    def native_value(self):
+        lesson = self._lesson
+        return lesson.subject if lesson else None
+
+    @property
+    def extra_state_attributes(self):
+        lesson = self._lesson
+        if not lesson:
+            return None
+        return {
+            "lesson": lesson.order,
+            "topic": lesson.topic,
+            "mark": lesson.mark,
+            "mark_reason": lesson.reason if lesson.mark else None,
+            "homework": lesson.homework,
+        }
+
+
+class ProfiMaktabTermAverageSensor(_BaseProfiMaktabSensor):
+    """Running term average, overall or for one subject."""
+
+    _attr_icon = "mdi:chart-line"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        subject: str | None = None,
+    ) -> None:
+        super().__init__(hass, entry)
+        self._subject = subject
+
+    @property
+    def unique_id(self):
+        if self._subject is None:
+            return f"{self._entry.entry_id}_term_average"
+        return f"{self._entry.entry_id}_term_average_{slugify(self._subject)}"
+
+    @property
+    def name(self):
+        if self._subject is None:
+            return "Term Average"
+        return f"Term Average {self._subject}"
+
+    @property
+    def _aggregator(self):
+        return self._entry_data[DATA_AGGREGATOR]
+
+    @property
+    def _key(self):
+        return self._subject if self._subject is not None else ALL_SUBJECTS
+
+    @property
+    def native_value(self):
+        return self._aggregator.average(term_key(local_today()), self._key)
+
+    @property
+    def extra_state_attributes(self):
+        today = local_today()
+        week, term, year = MarkAggregator.periods(today)
+        aggregator = self._aggregator
+        return {
+            "term": term,
+            "marks_count": aggregator.count(term, self._key),
+            "week_average": aggregator.average(week, self._key),
+            "year_average": aggregator.average(year, self._key),
+        }
+
+
+class ProfiMaktabLastRefreshSensor(_BaseProfiMaktabSensor):
+    """Duration of the last refresh attempt for this student."""
+
+    _signal = SIGNAL_DIAGNOSTICS_UPDATED
+    _attr_icon = "mdi:timer-outline"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    @property
+    def unique_id(self):
+        return f"{self._entry.entry_id}_last_refresh_duration"
+
+    @property
+    def name(self):
+        return "Last Refresh Duration"
+
+    @property
+    def native_value(self):
+        last_refresh = self._entry_data.get(DATA_LAST_REFRESH)
+        return last_refresh["duration"] if last_refresh else None
+
+    @property
+    def extra_state_attributes(self):
+        last_refresh = self._entry_data.get(DATA_LAST_REFRESH)
+        if not last_refresh:
+            return None
+        return {
+            "success": last_refresh["success"],
+            "finished": last_refresh["finished"].isoformat(),
+        }
+
+
+class ProfiMaktabApiErrorRateSensor(_BaseProfiMaktabSensor):
+    """Share of failed HTTP attempts of this account's API client."""
+
+    _signal = SIGNAL_DIAGNOSTICS_UPDATED
+    _attr_icon = "mdi:alert-circle-outline"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    @property
+    def unique_id(self):
+        return f"{self._entry.entry_id}_api_error_rate"
+
+    @property
+    def name(self):
+        return "API Error Rate"
+
+    @property
+    def _metrics(self):
+        return self._entry_data[DATA_CLIENT].metrics
+
+    @property
+    def native_value(self):
+        error_rate = self._metrics.error_rate
+        return round(error_rate * 100, 1) if error_rate is not None else None
+
+    @property
+    def extra_state_attributes(self):
+        metrics = self._metrics
+        return {
+            "requests": metrics.requests,
+            "coalesced": metrics.coalesced,
+            "retries": metrics.retries,
+            "relogins": metrics.relogins,
+            "circuit_rejections": metrics.circuit_rejections,
+        }
+
+
+class ProfiMaktabApiQueueWaitSensor(_BaseProfiMaktabSensor):
+    """p95 wait for the shared API rate limit (all students)."""
+
+    _signal = SIGNAL_DIAGNOSTICS_UPDATED
+    _attr_icon = "mdi:traffic-light-outline"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    @property
+    def unique_id(self):
+        return f"{self._entry.entry_id}_api_queue_wait"
+
+    @property
+    def name(self):
+        return "API Queue Wait"
+
+    @property
+    def _scheduler_state(self):
+        return self._hass.data[DOMAIN][DATA_REQUEST_SCHEDULER].as_dict()
+
+    @property
+    def native_value(self):
+        return self._scheduler_state["wait_p95_ms"]
+
+    @property
+    def extra_state_attributes(self):
+        state = self._scheduler_state
+        return {
+            key: state[key]
+            for key in (
+                "queue_depth",
+                "interactive_queued",
+                "max_queue_depth",
+                "granted",
+                "waited",
+                "wait_p50_ms",
+                "wait_max_ms",
+                "rate",
+                "burst",
+            )
         }
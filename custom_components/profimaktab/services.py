@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import logging
+from datetime import date, timedelta
+
+import voluptuous as vol
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+
+from .aggregate import school_year_key
+from .const import (
+    DOMAIN,
+    SERVICE_BACKFILL,
+    SERVICE_REFRESH,
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_START_DATE,
+    ATTR_END_DATE,
+    ATTR_MAX_CONCURRENCY,
+    ATTR_STUDENT,
+    ATTR_DATE,
+    ATTR_MAX_AGE,
+    DATA_CLIENT,
+    DATA_BACKFILL,
+    DATA_PAYLOAD,
+    DEFAULT_BACKFILL_CONCURRENCY,
+    DEFAULT_REFRESH_MAX_AGE,
+    REFRESH_MAX_DAYS,
+    CONF_MAX_CONCURRENCY,
+    CONF_REFRESH_TIMEOUT,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_REFRESH_TIMEOUT,
+)
+from .model import DairyDay
+from .parser import parse_dairy_batch
+from .ratelimit import interactive_requests
+from .refresh import RefreshJob, async_run_bounded
+from .update import (
+    async_fetch_entry,
+    async_loaded_entries,
+    fresh_payload,
+    local_today,
+    student_display_name,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+BACKFILL_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_START_DATE): cv.date,
+        vol.Optional(ATTR_END_DATE): cv.date,
+        vol.Optional(
+            ATTR_MAX_CONCURRENCY, default=DEFAULT_BACKFILL_CONCURRENCY
+        ): vol.All(vol.Coerce(int), vol.Range(min=1, max=8)),
+    }
+)
+
+REFRESH_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_STUDENT): vol.All(cv.ensure_list, [cv.string]),
+        vol.Exclusive(ATTR_DATE, "day"): cv.date,
+        vol.Exclusive(ATTR_START_DATE, "day"): cv.date,
+        vol.Optional(ATTR_END_DATE): cv.date,
+        vol.Optional(ATTR_MAX_AGE, default=DEFAULT_REFRESH_MAX_AGE): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+    }
+)
+
+
+def _loaded_entry(hass: HomeAssistant, entry_id: str):
+    entry = hass.config_entries.async_get_entry(entry_id)
+    if entry is None or entry.domain != DOMAIN:
+        raise ServiceValidationError(f"Unknown ProfiMaktab entry: {entry_id}")
+    if entry.state is not ConfigEntryState.LOADED:
+        raise ServiceValidationError(f"Entry {entry.title} is not loaded")
+    return entry
+
+
+async def _async_backfill(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Start (or restart) a historical backfill in the background."""
+    entry = _loaded_entry(hass, call.data[ATTR_CONFIG_ENTRY_ID])
+    backfill = hass.data[DOMAIN][entry.entry_id][DATA_BACKFILL]
+    if backfill.running:
+        raise ServiceValidationError(
+            f"Backfill is already running for {entry.title}"
+        )
+
+    today = local_today()
+    end = call.data.get(ATTR_END_DATE, today - timedelta(days=1))
+    start = call.data.get(
+        ATTR_START_DATE, date(int(school_year_key(today)[:4]), 9, 1)
+    )
+    if start > end:
+        raise ServiceValidationError("start_date must not be after end_date")
+
+    _LOGGER.info(
+        "ProfiMaktab: backfill requested for %s (%s..%s)", entry.title, start, end
+    )
+    entry.async_create_background_task(
+        hass,
+        backfill.async_start(start, end, call.data[ATTR_MAX_CONCURRENCY]),
+        f"{DOMAIN}_backfill_{entry.entry_id}",
+    )
+
+
+def _refresh_targets(hass: HomeAssistant, call: ServiceCall) -> list:
+    """Entries selected by config_entry_id and/or student (all if neither)."""
+    entry_ids = call.data.get(ATTR_CONFIG_ENTRY_ID)
+    students = call.data.get(ATTR_STUDENT)
+    if not entry_ids and not students:
+        return [entry for entry, _entry_data in async_loaded_entries(hass)]
+
+    targets = {}
+    for entry_id in entry_ids or []:
+        entry = _loaded_entry(hass, entry_id)
+        targets[entry.entry_id] = entry
+
+    for student in students or []:
+        wanted = student.strip().casefold()
+        matches = [
+            entry
+            for entry, _entry_data in async_loaded_entries(hass)
+            if wanted
+            in (
+                str(entry.data["student_id"]),
+                student_display_name(hass, entry).casefold(),
+                entry.data["student_name"].casefold(),
+            )
+        ]
+        if not matches:
+            raise ServiceValidationError(f"Unknown ProfiMaktab student: {student}")
+        for entry in matches:
+            targets[entry.entry_id] = entry
+
+    return list(targets.values())
+
+
+def _refresh_period(call: ServiceCall) -> tuple[date, date]:
+    today = local_today()
+    if ATTR_DATE in call.data:
+        return call.data[ATTR_DATE], call.data[ATTR_DATE]
+    start = call.data.get(ATTR_START_DATE, call.data.get(ATTR_END_DATE, today))
+    end = call.data.get(ATTR_END_DATE, start)
+    if start > end:
+        raise ServiceValidationError("start_date must not be after end_date")
+    if (end - start).days >= REFRESH_MAX_DAYS:
+        raise ServiceValidationError(
+            f"At most {REFRESH_MAX_DAYS} days can be refreshed at once"
+        )
+    return start, end
+
+
+async def _async_refresh_entry(
+    hass: HomeAssistant,
+    entry,
+    start: date,
+    end: date,
+    max_age: int,
+    max_concurrency: int,
+) -> dict:
+    """
+    Diary days start..end for one entry.
+
+    Today is answered from the entry payload while it is fresh, otherwise
+    refreshed through the normal update path (sensors follow). Other days
+    come from the client's diary cache when younger than max_age and are
+    fetched otherwise.
+    """
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    client = entry_data[DATA_CLIENT]
+    student_id = entry.data["student_id"]
+    student_name = student_display_name(hass, entry)
+    today = local_today()
+
+    days: dict[date, dict] = {}
+    cached = fetched = 0
+
+    if start <= today <= end:
+        payload = fresh_payload(entry_data, today, max_age)
+        if payload is None:
+            await async_fetch_entry(hass, entry)
+            payload = entry_data[DATA_PAYLOAD]
+            fetched += 1
+        else:
+            cached += 1
+        days[today] = payload.as_dict()
+
+    # Прошлые и будущие дни — из кэша клиента или одним диапазоном
+    segments = [
+        (start, min(end, today - timedelta(days=1))),
+        (max(start, today + timedelta(days=1)), end),
+    ]
+    for first, last in segments:
+        if first > last:
+            continue
+        for offset in range((last - first).days + 1):
+            day = first + timedelta(days=offset)
+            if client.get_cached_dairy(student_id, day, max_age=max_age) is None:
+                fetched += 1
+            else:
+                cached += 1
+        raw_days = await client.async_get_dairy_range(
+            student_id,
+            first,
+            last,
+            max_concurrency=max_concurrency,
+            max_age=max_age,
+        )
+        batch = parse_dairy_batch(
+            (day.isoformat(), raw or []) for day, raw in raw_days.items()
+        )
+        for number, day in enumerate(raw_days):
+            days[day] = DairyDay.from_batch(
+                batch, number, student=student_name
+            ).as_dict()
+
+    _LOGGER.debug(
+        "ProfiMaktab: refresh service for %s (cached: %d, fetched: %d)",
+        student_name,
+        cached,
+        fetched,
+    )
+    return {
+        "config_entry_id": entry.entry_id,
+        "student_id": student_id,
+        "student": student_name,
+        "cached": cached,
+        "fetched": fetched,
+        "days": [days[day] for day in sorted(days)],
+    }
+
+
+async def _async_refresh(
+    hass: HomeAssistant, call: ServiceCall
+) -> ServiceResponse:
+    """Refresh selected students and optionally return their diary."""
+    targets = _refresh_targets(hass, call)
+    if not targets:
+        raise ServiceValidationError("No loaded ProfiMaktab entries")
+    start, end = _refresh_period(call)
+    max_age = call.data[ATTR_MAX_AGE]
+
+    max_concurrency = min(
+        entry.options.get(CONF_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY)
+        for entry in targets
+    )
+    responses: dict[str, dict] = {}
+
+    async def _collect(entry) -> None:
+        responses[entry.entry_id] = await _async_refresh_entry(
+            hass, entry, start, end, max_age, max_concurrency
+        )
+
+    results = await async_run_bounded(
+        [
+            RefreshJob(
+                key=entry.entry_id,
+                name=student_display_name(hass, entry),
+                factory=lambda entry=entry: _collect(entry),
+                timeout=entry.options.get(
+                    CONF_REFRESH_TIMEOUT, DEFAULT_REFRESH_TIMEOUT
+                ),
+            )
+            for entry in targets
+        ],
+        max_concurrency=max_concurrency,
+    )
+
+    failed = [result for result in results if not result.success]
+    for result in failed:
+        _LOGGER.error(
+            "ProfiMaktab: refresh service failed for %s: %s",
+            result.name,
+            result.error,
+        )
+    if len(failed) == len(results):
+        raise HomeAssistantError(
+            "Refresh failed: "
+            + "; ".join(f"{result.name}: {result.error}" for result in failed)
+        )
+
+    if not call.return_response:
+        return None
+    return {
+        "students": [
+            responses[result.key]
+            if result.success
+            else {
+                "config_entry_id": result.key,
+                "student": result.name,
+                "error": result.error,
+            }
+            for result in results
+        ]
+    }
+
+
+def async_register_services(hass: HomeAssistant) -> None:
+    """Register integration services (once)."""
+    if hass.services.has_service(DOMAIN, SERVICE_BACKFILL):
+        return
+
+    async def _handle_backfill(call: ServiceCall) -> None:
+        await _async_backfill(hass, call)
+
+    async def _handle_refresh(call: ServiceCall) -> ServiceResponse:
+        with interactive_requests():
+            return await _async_refresh(hass, call)
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_BACKFILL, _handle_backfill, schema=BACKFILL_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_REFRESH,
+        _handle_refresh,
+        schema=REFRESH_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
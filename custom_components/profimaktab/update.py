@@ -1,52 +1,437 @@
 from datetime import date
 import logging
+import time
 
 from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN, DATA_CLIENT, DATA_PAYLOAD, SIGNAL_DATA_UPDATED
-from .parser import parse_dairy
+from .const import (
+    DOMAIN,
+    DATA_CLIENT,
+    DATA_PAYLOAD,
+    DATA_FINGERPRINT,
+    DATA_STATS,
+    DATA_STORE,
+    DATA_LAST_UPDATED,
+    DATA_STALE,
+    DATA_AGGREGATOR,
+    DATA_LAST_REFRESH,
+    DATA_STUDENT_INFO,
+    DATA_NEXT_DAY,
+    EVENT_HOMEWORK_CHANGED,
+    EVENT_NEW_MARK,
+    STUDENT_INFO_MAX_AGE,
+    SIGNAL_DATA_UPDATED,
+    SIGNAL_DIAGNOSTICS_UPDATED,
+    SIGNAL_NEW_SUBJECTS,
+    STORAGE_VERSION,
+    STORAGE_SAVE_DELAY,
+    CONF_MAX_CONCURRENCY,
+    CONF_REFRESH_TIMEOUT,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_REFRESH_TIMEOUT,
+)
+from .aggregate import MarkAggregator
+from .model import DairyDay, diff_days
+from .parser import parse_student
 from .api import ProfiMaktabApiError
+from .refresh import RefreshJob, RefreshResult, async_run_bounded
 
 _LOGGER = logging.getLogger(__name__)
 
 
-async def async_update_entry(hass, entry):
-    """Fetch and update data for a single ConfigEntry."""
+def local_today() -> date:
+    """Today in the HA time zone (not the host's)."""
+    return dt_util.now().date()
+
+
+def _dump_fingerprint(fingerprint):
+    return [fingerprint[0].isoformat(), fingerprint[1]] if fingerprint else None
+
+
+def _load_fingerprint(stored):
+    return (date.fromisoformat(stored[0]), stored[1]) if stored else None
+
+
+def async_loaded_entries(hass):
+    """Yield (entry, entry_data) for every loaded ProfiMaktab entry."""
+    domain_data = hass.data.get(DOMAIN, {})
+    for entry in hass.config_entries.async_entries(DOMAIN):
+        entry_data = domain_data.get(entry.entry_id)
+        if not isinstance(entry_data, dict) or not entry_data.get(DATA_CLIENT):
+            continue
+        yield entry, entry_data
+
+
+async def async_load_entry_payload(hass, entry) -> None:
+    """Load the last saved payload into hass.data; it stays stale until refreshed."""
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}")
+    entry_data[DATA_STORE] = store
+    entry_data[DATA_STALE] = True
+    entry_data[DATA_LAST_UPDATED] = None
+    entry_data[DATA_AGGREGATOR] = MarkAggregator()
+
+    stored = await store.async_load()
+    if not stored:
+        return
+
+    entry_data[DATA_AGGREGATOR] = MarkAggregator.from_dict(stored.get("marks"))
+    entry_data[DATA_STUDENT_INFO] = stored.get("student_info")
+    entry_data[DATA_CLIENT].restore_metadata(stored.get("metadata"))
+
+    entry_data[DATA_PAYLOAD] = DairyDay.from_dict(stored.get("payload"))
+    entry_data[DATA_LAST_UPDATED] = dt_util.parse_datetime(
+        stored.get("last_updated") or ""
+    )
+    entry_data[DATA_FINGERPRINT] = _load_fingerprint(stored.get("fingerprint"))
+    if next_day := stored.get("next_day"):
+        entry_data[DATA_NEXT_DAY] = {
+            "payload": DairyDay.from_dict(next_day["payload"]),
+            "fingerprint": _load_fingerprint(next_day["fingerprint"]),
+            "updated": dt_util.parse_datetime(next_day["updated"]),
+        }
+    _LOGGER.debug(
+        "ProfiMaktab: restored payload for %s from %s",
+        entry.title,
+        entry_data[DATA_LAST_UPDATED],
+    )
+
+
+def _metadata_paths(entry) -> list[str]:
+    """Metadata endpoints of one entry, persisted with its payload."""
+    paths = ["/profile/", f"/student_students/{entry.data['student_id']}"]
+    if contact_id := entry.data.get("contact_id"):
+        paths.append(f"/student_contacts/{contact_id}/")
+    return paths
+
+
+def student_display_name(hass, entry) -> str:
+    """Current student name; falls back to the one chosen at setup."""
+    entry_data = hass.data.get(DOMAIN, {}).get(entry.entry_id) or {}
+    info = entry_data.get(DATA_STUDENT_INFO) or {}
+    return info.get("name") or entry.data["student_name"]
+
+
+def async_schedule_save(entry, entry_data) -> None:
+    """Schedule a delayed write of the current payload."""
+
+    def _data():
+        last_updated = entry_data.get(DATA_LAST_UPDATED)
+        payload = entry_data.get(DATA_PAYLOAD)
+        next_day = entry_data.get(DATA_NEXT_DAY)
+        return {
+            "payload": payload.as_dict() if payload else None,
+            "last_updated": last_updated.isoformat() if last_updated else None,
+            "fingerprint": _dump_fingerprint(entry_data.get(DATA_FINGERPRINT)),
+            "next_day": (
+                {
+                    "payload": next_day["payload"].as_dict(),
+                    "fingerprint": _dump_fingerprint(next_day["fingerprint"]),
+                    "updated": next_day["updated"].isoformat(),
+                }
+                if next_day
+                else None
+            ),
+            "marks": entry_data[DATA_AGGREGATOR].as_dict(),
+            "student_info": entry_data.get(DATA_STUDENT_INFO),
+            "metadata": entry_data[DATA_CLIENT].export_metadata(
+                _metadata_paths(entry)
+            ),
+        }
+
+    entry_data[DATA_STORE].async_delay_save(_data, STORAGE_SAVE_DELAY)
+
+
+def fresh_payload(entry_data, day: date, max_age: float):
+    """
+    The current payload if it is for `day` and was confirmed by a
+    successful refresh no more than max_age seconds ago, else None.
+    """
+    payload = entry_data.get(DATA_PAYLOAD)
+    last_refresh = entry_data.get(DATA_LAST_REFRESH)
+    if (
+        not payload
+        or payload.date != day.isoformat()
+        or entry_data.get(DATA_STALE)
+        or not last_refresh
+        or not last_refresh["success"]
+    ):
+        return None
+    age = (dt_util.utcnow() - last_refresh["finished"]).total_seconds()
+    return payload if age <= max_age else None
+
+
+def _async_fire_changes(hass, entry, previous, current: DairyDay) -> None:
+    """Fire an event per new mark and per changed homework of `current`."""
+    new_marks, homework = diff_days(previous, current)
+    base = {
+        "config_entry_id": entry.entry_id,
+        "student_id": entry.data["student_id"],
+        "student": current.student,
+        "date": current.date,
+    }
+    for lesson, previous_mark in new_marks:
+        hass.bus.async_fire(
+            EVENT_NEW_MARK,
+            {
+                **base,
+                "lesson": lesson.order,
+                "subject": lesson.subject,
+                "topic": lesson.topic,
+                "mark": lesson.mark,
+                "numeric_mark": lesson.numeric_mark,
+                "reason": lesson.reason,
+                "previous_mark": previous_mark,
+            },
+        )
+    for lesson, previous_homework in homework:
+        hass.bus.async_fire(
+            EVENT_HOMEWORK_CHANGED,
+            {
+                **base,
+                "lesson": lesson.order,
+                "subject": lesson.subject,
+                "topic": lesson.topic,
+                "homework": lesson.homework,
+                "previous_homework": previous_homework,
+            },
+        )
+
+
+def _async_set_stale(hass, entry, entry_data, stale: bool) -> None:
+    """Update the stale flag, notifying sensors only when it flips."""
+    if entry_data.get(DATA_STALE) == stale:
+        return
+    entry_data[DATA_STALE] = stale
+    async_dispatcher_send(hass, SIGNAL_DATA_UPDATED.format(entry.entry_id))
+
+
+async def async_fetch_entry(hass, entry):
+    """
+    Fetch, parse and publish today's diary for one entry. Raises on error.
+    Returns False when the diary is unchanged since the last fetch; parsing,
+    payload replacement and dispatch are skipped in that case.
+    """
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    started = time.monotonic()
+    success = False
+    try:
+        changed = await _async_fetch_entry(hass, entry, entry_data)
+        success = True
+        return changed
+    finally:
+        entry_data[DATA_LAST_REFRESH] = {
+            "duration": round(time.monotonic() - started, 3),
+            "success": success,
+            "finished": dt_util.utcnow(),
+        }
+        async_dispatcher_send(
+            hass, SIGNAL_DIAGNOSTICS_UPDATED.format(entry.entry_id)
+        )
+
+
+async def _async_fetch_entry(hass, entry, entry_data):
     student_id = entry.data["student_id"]
-    student_name = entry.data["student_name"]
-    
+    student_name = student_display_name(hass, entry)
+
+    client = entry_data[DATA_CLIENT]
+    stats = entry_data[DATA_STATS]
+
+    today = local_today()
+    previous = entry_data.get(DATA_FINGERPRINT)
+    fingerprint = previous[1] if previous and previous[0] == today else None
+
+    try:
+        raw, fingerprint = await client.async_get_dairy_if_changed(
+            student_id,
+            today,
+            fingerprint,
+        )
+    except Exception:
+        _async_set_stale(hass, entry, entry_data, True)
+        raise
+
+    # 🪪 Имя/класс/школа — в фоне, не чаще раза в сутки
+    _async_schedule_student_info(hass, entry, entry_data)
+
+    if raw is None:
+        stats["unchanged"] += 1
+        _LOGGER.debug("ProfiMaktab: diary unchanged for %s", student_name)
+        _async_set_stale(hass, entry, entry_data, False)
+        return False
+
+    stats["changed"] += 1
+
+    parsed = DairyDay.parse(
+        raw,
+        student=student_name,
+        date=today.isoformat(),
+    )
+
+    previous_payload = entry_data.get(DATA_PAYLOAD)
+    entry_data[DATA_PAYLOAD] = parsed
+    # Fingerprint is stored only once the payload for that day is in place
+    entry_data[DATA_FINGERPRINT] = (today, fingerprint)
+    entry_data[DATA_LAST_UPDATED] = dt_util.utcnow()
+    entry_data[DATA_STALE] = False
+
+    # 📊 Накопительные средние — только оценки этого дня
+    new_subjects = entry_data[DATA_AGGREGATOR].add_day(
+        today, parsed.subject_marks()
+    )
+    async_schedule_save(entry, entry_data)
+    if new_subjects:
+        async_dispatcher_send(
+            hass, SIGNAL_NEW_SUBJECTS.format(entry.entry_id), new_subjects
+        )
+
+    # 🔔 Уведомляем сенсоры этого ученика, затем автоматизации — событиями
+    async_dispatcher_send(hass, SIGNAL_DATA_UPDATED.format(entry.entry_id))
+    _async_fire_changes(hass, entry, previous_payload, parsed)
+
     _LOGGER.info(
-        "ProfiMaktab: fetching data for %s (ID: %s)",
+        "ProfiMaktab: data updated for %s (lessons: %d, avg: %s)",
         student_name,
-        student_id,
+        parsed.lesson_count,
+        parsed.average,
     )
-    
-    try:
-        entry_data = hass.data[DOMAIN][entry.entry_id]
-        client = entry_data[DATA_CLIENT]
+    return True
 
-        raw = await client.async_get_dairy(
-            student_id=student_id,
-            for_date=date.today(),
-        )
 
-        parsed = parse_dairy(
-            raw,
-            student=student_name,
-            date=date.today().isoformat(),
+async def async_prefetch_day(hass, entry, day: date) -> bool:
+    """
+    Fetch an upcoming day's diary into DATA_NEXT_DAY (today's payload is
+    left alone). Returns False when it is unchanged since the last prefetch.
+    """
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    client = entry_data[DATA_CLIENT]
+    student_name = student_display_name(hass, entry)
+
+    next_day = entry_data.get(DATA_NEXT_DAY)
+    previous = next_day["fingerprint"] if next_day else None
+    fingerprint = previous[1] if previous and previous[0] == day else None
+
+    raw, fingerprint = await client.async_get_dairy_if_changed(
+        entry.data["student_id"], day, fingerprint
+    )
+    if raw is None:
+        next_day["updated"] = dt_util.utcnow()
+        return False
+
+    parsed = DairyDay.parse(raw, student=student_name, date=day.isoformat())
+    entry_data[DATA_NEXT_DAY] = {
+        "payload": parsed,
+        "fingerprint": (day, fingerprint),
+        "updated": dt_util.utcnow(),
+    }
+    async_schedule_save(entry, entry_data)
+    async_dispatcher_send(hass, SIGNAL_DATA_UPDATED.format(entry.entry_id))
+    _async_fire_changes(
+        hass, entry, next_day["payload"] if next_day else None, parsed
+    )
+    _LOGGER.debug("ProfiMaktab: prefetched %s for %s", day, student_name)
+    return True
+
+
+def async_rollover(hass, entry) -> bool:
+    """
+    Switch to the new local day without touching the network: a prefetched
+    payload for today becomes current, otherwise the old one is marked
+    stale. Returns True when a prefetched payload was swapped in.
+    """
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    today = local_today()
+    payload = entry_data.get(DATA_PAYLOAD)
+    if payload and payload.date == today.isoformat():
+        return False
+
+    next_day = entry_data.get(DATA_NEXT_DAY)
+    if not next_day or next_day["fingerprint"][0] != today:
+        # Предзагрузка на более поздний день (выходные) остаётся
+        if next_day and next_day["fingerprint"][0] < today:
+            entry_data[DATA_NEXT_DAY] = None
+        entry_data[DATA_STALE] = True
+        async_dispatcher_send(hass, SIGNAL_DATA_UPDATED.format(entry.entry_id))
+        return False
+
+    parsed = next_day["payload"]
+    entry_data[DATA_PAYLOAD] = parsed
+    entry_data[DATA_FINGERPRINT] = next_day["fingerprint"]
+    entry_data[DATA_LAST_UPDATED] = next_day["updated"]
+    entry_data[DATA_STALE] = False
+    entry_data[DATA_NEXT_DAY] = None
+
+    new_subjects = entry_data[DATA_AGGREGATOR].add_day(
+        today, parsed.subject_marks()
+    )
+    async_schedule_save(entry, entry_data)
+    if new_subjects:
+        async_dispatcher_send(
+            hass, SIGNAL_NEW_SUBJECTS.format(entry.entry_id), new_subjects
         )
+    async_dispatcher_send(hass, SIGNAL_DATA_UPDATED.format(entry.entry_id))
+    _LOGGER.info(
+        "ProfiMaktab: switched %s to prefetched %s",
+        entry.title,
+        today,
+    )
+    return True
 
-        entry_data[DATA_PAYLOAD] = parsed
 
-        # 🔔 Уведомляем все сенсоры
-        async_dispatcher_send(hass, SIGNAL_DATA_UPDATED)
+def _async_schedule_student_info(hass, entry, entry_data) -> None:
+    """Refresh student info in the background once it is a day old."""
+    info = entry_data.get(DATA_STUDENT_INFO) or {}
+    checked = dt_util.parse_datetime(info.get("checked") or "")
+    now = dt_util.utcnow()
+    if checked and (now - checked).total_seconds() < STUDENT_INFO_MAX_AGE:
+        return
+    # Отмечаем попытку сразу: повторные обновления не запускают новых запросов
+    entry_data[DATA_STUDENT_INFO] = {**info, "checked": now.isoformat()}
+    entry.async_create_background_task(
+        hass,
+        _async_refresh_student_info(hass, entry, entry_data),
+        f"{DOMAIN}_student_info_{entry.entry_id}",
+    )
 
-        _LOGGER.info(
-            "ProfiMaktab: data updated for %s (lessons: %d, avg: %s)",
-            student_name,
-            parsed.get("lesson_count", 0),
-            parsed.get("average", 0),
+
+async def _async_refresh_student_info(hass, entry, entry_data) -> None:
+    try:
+        data = await entry_data[DATA_CLIENT].async_get_student(
+            entry.data["student_id"], max_age=STUDENT_INFO_MAX_AGE
+        )
+    except ProfiMaktabApiError as err:
+        _LOGGER.debug(
+            "ProfiMaktab: student info refresh failed for %s: %s",
+            entry.title,
+            err,
         )
+        return
+
+    info = entry_data.get(DATA_STUDENT_INFO) or {}
+    fresh = {key: value for key, value in parse_student(data).items() if value}
+    entry_data[DATA_STUDENT_INFO] = {**info, **fresh}
+    async_schedule_save(entry, entry_data)
+    if any(info.get(key) != value for key, value in fresh.items()):
+        _LOGGER.debug("ProfiMaktab: student info updated for %s", entry.title)
+        async_dispatcher_send(hass, SIGNAL_DATA_UPDATED.format(entry.entry_id))
+
+
+async def async_update_entry(hass, entry):
+    """Fetch and update data for a single ConfigEntry."""
+    student_id = entry.data["student_id"]
+    student_name = student_display_name(hass, entry)
+
+    _LOGGER.info(
+        "ProfiMaktab: fetching data for %s (ID: %s)",
+        student_name,
+        student_id,
+    )
+
+    try:
+        await async_fetch_entry(hass, entry)
+        return True
     except ProfiMaktabApiError as err:
         _LOGGER.error(
             "ProfiMaktab: update failed for %s: %s",
@@ -58,3 +443,49 @@ async def async_update_entry(hass, entry):
             "ProfiMaktab: unexpected error for %s",
             student_name,
         )
+    return False
+
+
+async def async_update_all(hass) -> list[RefreshResult]:
+    """
+    Refresh every loaded entry concurrently.
+
+    Concurrency is bounded by the lowest max_concurrency option across
+    entries; each student gets its own refresh_timeout.
+    """
+    jobs: list[RefreshJob] = []
+    max_concurrency = None
+
+    for entry, _entry_data in async_loaded_entries(hass):
+        limit = entry.options.get(CONF_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY)
+        max_concurrency = limit if max_concurrency is None else min(max_concurrency, limit)
+
+        jobs.append(
+            RefreshJob(
+                key=entry.entry_id,
+                name=student_display_name(hass, entry),
+                factory=lambda entry=entry: async_fetch_entry(hass, entry),
+                timeout=entry.options.get(
+                    CONF_REFRESH_TIMEOUT, DEFAULT_REFRESH_TIMEOUT
+                ),
+            )
+        )
+
+    if not jobs:
+        return []
+
+    results = await async_run_bounded(jobs, max_concurrency=max_concurrency)
+
+    for result in results:
+        if result.success:
+            _LOGGER.debug(
+                "ProfiMaktab: %s refreshed in %.2fs", result.name, result.latency
+            )
+        else:
+            _LOGGER.error(
+                "ProfiMaktab: refresh failed for %s after %.2fs: %s",
+                result.name,
+                result.latency,
+                result.error,
+            )
+    return results
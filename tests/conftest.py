@@ -0,0 +1,16 @@
+"""
+Fixtures for the ProfiMaktab tests.
+
+Run with pytest-homeassistant-custom-component installed:
+
+    pytest tests
+"""
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Load custom_components/profimaktab in every test."""
+    yield
@@ -0,0 +1,86 @@
+"""Tests for the running mark sums per week, term and school year."""
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from custom_components.profimaktab.aggregate import (
+    MarkAggregator,
+    school_year_key,
+    term_key,
+    week_key,
+)
+
+
+@pytest.mark.parametrize(
+    ("day", "year", "term"),
+    [
+        (date(2026, 9, 1), "2026-2027", "2026-2027/T1"),
+        (date(2026, 11, 5), "2026-2027", "2026-2027/T1"),
+        (date(2026, 11, 6), "2026-2027", "2026-2027/T2"),
+        (date(2026, 12, 31), "2026-2027", "2026-2027/T2"),
+        (date(2027, 1, 1), "2026-2027", "2026-2027/T3"),
+        (date(2027, 3, 24), "2026-2027", "2026-2027/T3"),
+        (date(2027, 3, 25), "2026-2027", "2026-2027/T4"),
+        (date(2027, 8, 31), "2026-2027", "2026-2027/T4"),
+    ],
+)
+def test_term_boundaries(day: date, year: str, term: str) -> None:
+    assert school_year_key(day) == year
+    assert term_key(day) == term
+
+
+def test_week_key_uses_iso_weeks() -> None:
+    assert week_key(date(2026, 10, 17)) == "2026-W42"
+    # 2027-01-01 belongs to the last ISO week of 2026
+    assert week_key(date(2027, 1, 1)) == "2026-W53"
+
+
+def test_running_sums_per_period_and_subject() -> None:
+    aggregator = MarkAggregator()
+    new = aggregator.add_day(
+        date(2026, 10, 12), [("Matematika", 5), ("Fizika", 4)]
+    )
+    assert new == {"Matematika", "Fizika"}
+    assert aggregator.add_day(date(2026, 10, 13), [("Matematika", 3)]) == set()
+    aggregator.add_day(date(2026, 11, 9), [("Matematika", 4)])
+
+    assert aggregator.average("2026-2027/T1") == 4.0
+    assert aggregator.average("2026-2027/T1", "Matematika") == 4.0
+    assert aggregator.count("2026-2027/T1", "Matematika") == 2
+    assert aggregator.average("2026-2027/T2") == 4.0
+    assert aggregator.count("2026-2027") == 4
+    assert aggregator.average("2026-2027") == 4.0
+    assert aggregator.average("2026-W42", "Fizika") == 4.0
+    assert aggregator.average("2026-2027/T3") is None
+    assert aggregator.count("2026-2027/T3") == 0
+
+
+def test_reingesting_a_day_replaces_it() -> None:
+    aggregator = MarkAggregator()
+    day = date(2026, 10, 12)
+    aggregator.add_day(day, [("Matematika", 5)])
+    aggregator.add_day(day, [("Matematika", 3), ("Matematika", 4)])
+
+    assert aggregator.count("2026-2027") == 2
+    assert aggregator.average("2026-2027") == 3.5
+
+    # A day without marks removes its contribution
+    aggregator.add_day(day, [])
+    assert aggregator.count("2026-2027") == 0
+    assert not aggregator.has_day(day)
+    assert aggregator.as_dict() == {"days": {}}
+
+
+def test_round_trip() -> None:
+    aggregator = MarkAggregator()
+    aggregator.add_day(date(2026, 10, 12), [("Matematika", 5), ("Fizika", 2)])
+    aggregator.add_day(date(2027, 2, 1), [("Tarix", 4)])
+
+    restored = MarkAggregator.from_dict(aggregator.as_dict())
+    assert restored.subjects == {"Matematika", "Fizika", "Tarix"}
+    for period in ("2026-2027", "2026-2027/T1", "2026-2027/T3"):
+        assert restored.average(period) == aggregator.average(period)
+        assert restored.count(period) == aggregator.count(period)
+    assert MarkAggregator.from_dict(None).subjects == set()
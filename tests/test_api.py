@@ -0,0 +1,288 @@
+"""Tests for retries, Retry-After and the circuit breaker of the API client."""
+from __future__ import annotations
+
+from email.utils import format_datetime
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import aiohttp
+import pytest
+
+from custom_components.profimaktab import api
+from custom_components.profimaktab.api import (
+    CircuitBreaker,
+    ProfiMaktabApiError,
+    ProfiMaktabCircuitOpenError,
+    ProfiMaktabClient,
+)
+
+
+class _Response:
+    def __init__(self, status: int, body: bytes = b"{}", headers=None) -> None:
+        self.status = status
+        self.headers = headers or {}
+        self._body = body
+        self.content_length = len(body)
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self) -> str:
+        return self._body.decode()
+
+    async def __aenter__(self) -> "_Response":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+
+class _Session:
+    """Answers requests from a list; an exception in the list is raised."""
+
+    def __init__(self, *responses) -> None:
+        self.responses = list(responses)
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        item = self.responses.pop(0)
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def request(self, method, url, **kwargs):
+        return self._next()
+
+    def post(self, url, **kwargs):
+        return self._next()
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    """Breakers are shared per host; every test starts with a closed one."""
+    CircuitBreaker._hosts.clear()  # noqa: SLF001
+    yield
+    CircuitBreaker._hosts.clear()  # noqa: SLF001
+
+
+def _client(session: _Session, **kwargs) -> ProfiMaktabClient:
+    client = ProfiMaktabClient(session, "parent", "secret", backoff_base=0, **kwargs)
+    # Opaque token: counts as fresh, no login request
+    client._access_token = "token"  # noqa: SLF001
+    return client
+
+
+async def test_retries_server_errors() -> None:
+    """5xx and connection errors are retried until a response succeeds."""
+    session = _Session(
+        _Response(503),
+        aiohttp.ClientConnectionError("reset"),
+        _Response(200, b'{"ok": true}'),
+    )
+    client = _client(session)
+
+    assert await client._request("GET", "/profile/") == {"ok": True}  # noqa: SLF001
+    assert session.calls == 3
+    assert client.metrics.retries == 2
+
+
+async def test_gives_up_after_max_retries() -> None:
+    session = _Session(*(_Response(502) for _ in range(3)))
+    client = _client(session, max_retries=2)
+
+    with pytest.raises(ProfiMaktabApiError):
+        await client._request("GET", "/profile/")  # noqa: SLF001
+    assert session.calls == 3
+
+
+async def test_client_errors_are_not_retried() -> None:
+    session = _Session(_Response(404, b"not found"))
+    client = _client(session)
+
+    with pytest.raises(ProfiMaktabApiError):
+        await client._request("GET", "/profile/")  # noqa: SLF001
+    assert session.calls == 1
+    assert client.breaker_state["state"] == "closed"
+
+
+async def test_retry_after_sets_the_delay() -> None:
+    session = _Session(
+        _Response(429, headers={"Retry-After": "7"}),
+        _Response(200, b"[]"),
+    )
+    client = _client(session, backoff_max=30)
+
+    with patch.object(api.asyncio, "sleep", AsyncMock()) as sleep:
+        assert await client._request("GET", "/dairy/") == []  # noqa: SLF001
+    sleep.assert_awaited_once_with(7.0)
+    # 429 is throttling, not an outage
+    assert client.breaker_state["state"] == "closed"
+
+
+async def test_retry_after_beyond_backoff_max_fails_fast() -> None:
+    session = _Session(_Response(503, headers={"Retry-After": "120"}))
+    client = _client(session, backoff_max=30)
+
+    with pytest.raises(ProfiMaktabApiError):
+        await client._request("GET", "/dairy/")  # noqa: SLF001
+    assert session.calls == 1
+
+
+def test_retry_after_parsing() -> None:
+    assert api._retry_after({}) is None  # noqa: SLF001
+    assert api._retry_after({"Retry-After": "5"}) == 5.0  # noqa: SLF001
+    assert api._retry_after({"Retry-After": "-3"}) == 0.0  # noqa: SLF001
+    assert api._retry_after({"Retry-After": "soon"}) is None  # noqa: SLF001
+
+    when = datetime.now(timezone.utc) + timedelta(seconds=60)
+    delay = api._retry_after(  # noqa: SLF001
+        {"Retry-After": format_datetime(when, usegmt=True)}
+    )
+    assert 55 <= delay <= 60
+
+
+def test_breaker_state_transitions() -> None:
+    breaker = CircuitBreaker("host", failure_threshold=2, reset_timeout=60)
+    assert breaker.state == "closed"
+
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+    breaker._opened_at -= 60  # noqa: SLF001
+    assert breaker.state == "half_open"
+    # Exactly one trial request
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    # A failed trial opens the circuit again at once
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    breaker._opened_at -= 60  # noqa: SLF001
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow_request()
+
+
+def test_breaker_release_trial() -> None:
+    breaker = CircuitBreaker("host", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.release_trial()
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+
+
+async def test_open_circuit_rejects_requests() -> None:
+    session = _Session()
+    client = _client(session)
+    breaker = CircuitBreaker.for_host(client.breaker_state["host"])
+    for _ in range(5):
+        breaker.record_failure()
+
+    with pytest.raises(ProfiMaktabCircuitOpenError):
+        await client._request("GET", "/profile/")  # noqa: SLF001
+    assert session.calls == 0
+    assert client.metrics.circuit_rejections == 1
+
+
+@pytest.mark.parametrize(
+    "error",
+    [RuntimeError("Session is closed"), ValueError("unexpected body")],
+)
+async def test_unexpected_error_releases_half_open_trial(error) -> None:
+    """An unexpected error during the trial must not leave the breaker stuck."""
+    session = _Session(error, _Response(200, b"{}"))
+    client = _client(session)
+    breaker = CircuitBreaker.for_host(client.breaker_state["host"])
+    for _ in range(5):
+        breaker.record_failure()
+    breaker._opened_at -= 60  # noqa: SLF001
+    assert breaker.state == "half_open"
+
+    with pytest.raises(type(error)):
+        await client._request("GET", "/profile/")  # noqa: SLF001
+
+    # The next request becomes the trial and closes the circuit
+    assert await client._request("GET", "/profile/") == {}  # noqa: SLF001
+    assert breaker.state == "closed"
+
+
+async def test_trial_error_during_login_releases_trial() -> None:
+    """A login that fails oddly inside the trial releases it as well."""
+    session = _Session(
+        AttributeError("'list' object has no attribute 'get'"),
+        _Response(200, b'{"access": "token"}'),
+        _Response(200, b"{}"),
+    )
+    client = ProfiMaktabClient(session, "parent", "secret", backoff_base=0)
+    breaker = CircuitBreaker.for_host(client.breaker_state["host"])
+    for _ in range(5):
+        breaker.record_failure()
+    breaker._opened_at -= 60  # noqa: SLF001
+
+    with pytest.raises(AttributeError):
+        await client._request("GET", "/profile/")  # noqa: SLF001
+
+    assert await client._request("GET", "/profile/") == {}  # noqa: SLF001
+    assert breaker.state == "closed"
+    client.close()
+
+
+@pytest.mark.parametrize("body", [b"<html>Bad gateway</html>", b"[]"])
+async def test_bad_login_body_is_an_api_error(body) -> None:
+    """A non-JSON or non-object 200 from /token/ is an API error, not a crash."""
+    session = _Session(
+        _Response(200, body),
+        _Response(200, b'{"access": "token"}'),
+        _Response(200, b"{}"),
+    )
+    client = ProfiMaktabClient(session, "parent", "secret", backoff_base=0)
+
+    with pytest.raises(ProfiMaktabApiError):
+        await client._request("GET", "/profile/")  # noqa: SLF001
+    assert client.breaker_state["state"] == "closed"
+
+    assert await client._request("GET", "/profile/") == {}  # noqa: SLF001
+    client.close()
+
+
+async def test_bad_refresh_body_falls_back_to_login() -> None:
+    session = _Session(
+        _Response(200, b"not json"),
+        _Response(200, b'{"access": "new"}'),
+    )
+    client = ProfiMaktabClient(session, "parent", "secret", backoff_base=0)
+    client._refresh_token = "refresh"  # noqa: SLF001
+
+    await client.async_ensure_authenticated()
+    assert session.calls == 2
+    assert client._access_token == "new"  # noqa: SLF001
+    client.close()
+
+
+async def test_bad_response_body_is_an_api_error() -> None:
+    session = _Session(_Response(200, b"{broken"))
+    client = _client(session)
+
+    with pytest.raises(ProfiMaktabApiError):
+        await client._request("GET", "/profile/")  # noqa: SLF001
+
+
+async def test_dairy_days_fetches_only_uncached_days() -> None:
+    session = _Session(_Response(200, b"[1]"), _Response(200, b"[2]"))
+    client = _client(session, today=lambda: date(2026, 10, 17))
+    first, second = date(2026, 10, 12), date(2026, 10, 14)
+
+    assert await client.async_get_dairy_days(1, [first, second]) == {
+        first: [1],
+        second: [2],
+    }
+    # Served from the cache the second time
+    assert await client.async_get_dairy_days(1, [second]) == {second: [2]}
+    assert session.calls == 2
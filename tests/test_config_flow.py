@@ -0,0 +1,58 @@
+"""Tests for the ProfiMaktab config flow."""
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, patch
+
+from homeassistant import config_entries
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+from homeassistant.data_entry_flow import FlowResultType
+
+from custom_components.profimaktab.api import ProfiMaktabClient
+from custom_components.profimaktab.const import DOMAIN
+
+CONTACTS = {
+    "students": [
+        {"id": 1, "user": {"name": "Ali"}},
+        {"id": 2, "user": {"name": "Vali"}},
+    ]
+}
+
+
+async def test_select_several_children(hass: HomeAssistant) -> None:
+    """Every selected child gets an entry before the user flow finishes."""
+    with (
+        patch.object(
+            ProfiMaktabClient,
+            "async_get_profile",
+            AsyncMock(return_value={"additional_data": {"contact_id": 7}}),
+        ),
+        patch.object(
+            ProfiMaktabClient,
+            "async_get_student_contacts",
+            AsyncMock(return_value=CONTACTS),
+        ),
+        patch(
+            "custom_components.profimaktab.async_setup_entry",
+            AsyncMock(return_value=True),
+        ),
+    ):
+        result = await hass.config_entries.flow.async_init(
+            DOMAIN, context={"source": config_entries.SOURCE_USER}
+        )
+        result = await hass.config_entries.flow.async_configure(
+            result["flow_id"],
+            {CONF_USERNAME: "parent", CONF_PASSWORD: "secret"},
+        )
+        assert result["step_id"] == "select_child"
+
+        result = await hass.config_entries.flow.async_configure(
+            result["flow_id"], {"student_ids": ["1", "2"]}
+        )
+
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    assert result["title"] == "Ali"
+    entries = hass.config_entries.async_entries(DOMAIN)
+    assert sorted(entry.data["student_id"] for entry in entries) == [1, 2]
+    assert {entry.unique_id for entry in entries} == {"1", "2"}
+    assert not hass.config_entries.flow.async_progress()
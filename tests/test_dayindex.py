@@ -0,0 +1,61 @@
+"""Tests for the calendar's index of parsed diary days."""
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from custom_components.profimaktab.dayindex import DayIndex
+from custom_components.profimaktab.model import DairyDay
+
+
+def _day(day: date) -> DairyDay:
+    dairy = [{"lesson_order": 1, "subject": {"name": "Matematika"}}]
+    return DairyDay.parse(dairy, student="Ali", date=day.isoformat())
+
+
+def test_range_is_sorted_and_inclusive() -> None:
+    index = DayIndex(10)
+    for offset in (4, 0, 2, 7):
+        day = date(2026, 10, 12) + timedelta(days=offset)
+        index.put(day, _day(day), 100.0)
+
+    days = [day for day, _, _ in index.range(date(2026, 10, 12), date(2026, 10, 16))]
+    assert days == [date(2026, 10, 12), date(2026, 10, 14), date(2026, 10, 16)]
+
+
+def test_evicts_the_day_farthest_from_today() -> None:
+    index = DayIndex(2)
+    today = date(2026, 10, 17)
+    for day in (date(2026, 9, 1), date(2026, 10, 16)):
+        index.put(day, _day(day), today=today)
+    index.put(date(2026, 10, 20), _day(date(2026, 10, 20)), today=today)
+
+    assert len(index) == 2
+    assert index.get(date(2026, 9, 1)) is None
+    assert index.get(date(2026, 10, 20)) is not None
+
+
+def test_missing_uses_the_per_day_max_age() -> None:
+    index = DayIndex(10)
+    old, recent = date(2026, 9, 1), date(2026, 10, 16)
+    index.put(old, _day(old), 1000.0)
+    index.put(recent, _day(recent), 1000.0)
+
+    def max_age(day: date) -> float:
+        return 500.0 if day == old else 50.0
+
+    assert index.missing([old, recent, date(2026, 10, 17)], max_age, now=1100.0) == [
+        recent,
+        date(2026, 10, 17),
+    ]
+
+
+def test_round_trip() -> None:
+    index = DayIndex(10)
+    day = date(2026, 10, 12)
+    index.put(day, _day(day), 123.0)
+
+    restored = DayIndex.from_dict(index.as_dict(), 10)
+    payload, fetched = restored.get(day)
+    assert fetched == 123.0
+    assert payload.as_dict() == _day(day).as_dict()
+    assert len(DayIndex.from_dict(None, 10)) == 0
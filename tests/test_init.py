@@ -0,0 +1,40 @@
+"""Tests for setting up and unloading config entries."""
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, patch
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from custom_components.profimaktab.const import DATA_CLIENTS, DOMAIN
+
+
+async def test_failed_setup_releases_the_client(hass: HomeAssistant) -> None:
+    """A setup step that raises must not leak the shared client reference."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="Ali",
+        unique_id="1",
+        data={
+            CONF_USERNAME: "parent",
+            CONF_PASSWORD: "secret",
+            "contact_id": 7,
+            "student_id": 1,
+            "student_name": "Ali",
+        },
+    )
+    entry.add_to_hass(hass)
+
+    with patch(
+        "custom_components.profimaktab.async_load_entry_payload",
+        AsyncMock(side_effect=OSError("disk full")),
+    ):
+        assert not await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+
+    assert entry.state is ConfigEntryState.SETUP_ERROR
+    assert len(hass.data[DOMAIN][DATA_CLIENTS]) == 0
+    assert entry.entry_id not in hass.data[DOMAIN]
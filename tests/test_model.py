@@ -0,0 +1,98 @@
+"""Tests for the compact diary model and lesson diffing."""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from custom_components.profimaktab.model import DairyDay, diff_days
+
+
+def _lesson(
+    order: int,
+    subject: str,
+    mark: Optional[str] = None,
+    homework: Optional[str] = None,
+) -> Dict[str, Any]:
+    item: Dict[str, Any] = {
+        "lesson_order": order,
+        "subject": {"name": subject},
+        "themes": [{"title": f"{subject} {order}", "notes": homework}],
+    }
+    if mark is not None:
+        item["marks"] = [{"value": mark, "reason": "Javob"}]
+    return item
+
+
+def _day(lessons: List[Dict[str, Any]], date: str = "2026-10-12") -> DairyDay:
+    return DairyDay.parse(lessons, student="Ali", date=date)
+
+
+def _summary(changes) -> list:
+    return [
+        (lesson.order, lesson.subject, previous) for lesson, previous in changes
+    ]
+
+
+def test_no_changes() -> None:
+    lessons = [_lesson(1, "Matematika", "5", "12-mashq")]
+    assert diff_days(_day(lessons), _day(lessons)) == ([], [])
+
+
+def test_new_and_changed_marks() -> None:
+    previous = _day([_lesson(1, "Matematika"), _lesson(2, "Fizika", "3")])
+    current = _day([_lesson(1, "Matematika", "5"), _lesson(2, "Fizika", "4")])
+
+    new_marks, homework = diff_days(previous, current)
+    assert _summary(new_marks) == [(1, "Matematika", None), (2, "Fizika", "3")]
+    assert homework == []
+
+
+def test_homework_changes() -> None:
+    previous = _day([_lesson(1, "Matematika", homework="12-mashq")])
+    current = _day(
+        [
+            _lesson(1, "Matematika", homework="13-mashq"),
+            _lesson(2, "Tarix", homework="§4"),
+        ]
+    )
+
+    new_marks, homework = diff_days(previous, current)
+    assert new_marks == []
+    assert _summary(homework) == [(1, "Matematika", "12-mashq"), (2, "Tarix", None)]
+
+
+def test_lessons_are_matched_by_order_and_subject() -> None:
+    """A lesson moved to another slot counts as a new lesson."""
+    previous = _day([_lesson(1, "Matematika", "5")])
+    current = _day([_lesson(2, "Matematika", "5")])
+
+    new_marks, _ = diff_days(previous, current)
+    assert _summary(new_marks) == [(2, "Matematika", None)]
+
+
+def test_repeated_lessons_are_matched_in_order() -> None:
+    previous = _day([_lesson(1, "Matematika", "5"), _lesson(1, "Matematika")])
+    current = _day([_lesson(1, "Matematika", "5"), _lesson(1, "Matematika", "4")])
+
+    new_marks, _ = diff_days(previous, current)
+    assert _summary(new_marks) == [(1, "Matematika", None)]
+    assert new_marks[0][0].mark == "4"
+
+
+def test_without_baseline_every_mark_is_new() -> None:
+    """Homework is not reported for the first payload of a day."""
+    current = _day([_lesson(1, "Matematika", "5", "12-mashq"), _lesson(2, "Tarix")])
+
+    for previous in (None, _day([_lesson(1, "Matematika")], date="2026-10-11")):
+        new_marks, homework = diff_days(previous, current)
+        assert _summary(new_marks) == [(1, "Matematika", None)]
+        assert homework == []
+
+
+def test_round_trip_through_dict() -> None:
+    day = _day([_lesson(1, "Matematika", "5", "12-mashq"), _lesson(2, "Fizika", "н")])
+
+    restored = DairyDay.from_dict(day.as_dict())
+    assert restored.as_dict() == day.as_dict()
+    assert restored.marks == [5]
+    assert restored.average == 5
+    assert DairyDay.from_dict(None) is None
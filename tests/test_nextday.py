@@ -0,0 +1,141 @@
+"""Tests for the midnight rollover to a prefetched day."""
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.profimaktab.aggregate import MarkAggregator
+from custom_components.profimaktab.const import (
+    CONF_SCHOOL_DAYS,
+    DATA_AGGREGATOR,
+    DATA_FINGERPRINT,
+    DATA_LAST_UPDATED,
+    DATA_NEXT_DAY,
+    DATA_PAYLOAD,
+    DATA_STALE,
+    DATA_STORE,
+    DOMAIN,
+)
+from custom_components.profimaktab.model import DairyDay
+from custom_components.profimaktab.nextday import ProfiMaktabNextDay
+from custom_components.profimaktab.update import async_rollover
+
+MONDAY = date(2026, 10, 12)
+PREFETCHED_AT = datetime(2026, 10, 11, 19, 5, tzinfo=timezone.utc)
+
+
+def _payload(day: date) -> DairyDay:
+    dairy = [
+        {
+            "lesson_order": 1,
+            "subject": {"name": "Matematika"},
+            "marks": [{"value": 5, "reason": "Javob"}],
+        }
+    ]
+    return DairyDay.parse(dairy, student="Ali", date=day.isoformat())
+
+
+def _setup(hass: HomeAssistant, current: date, next_day: date | None):
+    entry = MockConfigEntry(domain=DOMAIN, data={"student_id": 1})
+    entry_data = {
+        DATA_PAYLOAD: _payload(current),
+        DATA_FINGERPRINT: (current, "etag:old"),
+        DATA_LAST_UPDATED: None,
+        DATA_STALE: False,
+        DATA_AGGREGATOR: MarkAggregator(),
+        DATA_STORE: MagicMock(),
+        DATA_NEXT_DAY: (
+            {
+                "payload": _payload(next_day),
+                "fingerprint": (next_day, "etag:next"),
+                "updated": PREFETCHED_AT,
+            }
+            if next_day
+            else None
+        ),
+    }
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = entry_data
+    return entry, entry_data
+
+
+def _rollover(hass: HomeAssistant, entry, today: date) -> bool:
+    with patch(
+        "custom_components.profimaktab.update.local_today", return_value=today
+    ):
+        return async_rollover(hass, entry)
+
+
+async def test_prefetched_day_is_swapped_in(hass: HomeAssistant) -> None:
+    entry, entry_data = _setup(hass, date(2026, 10, 10), MONDAY)
+
+    assert _rollover(hass, entry, MONDAY)
+
+    assert entry_data[DATA_PAYLOAD].date == MONDAY.isoformat()
+    assert entry_data[DATA_FINGERPRINT] == (MONDAY, "etag:next")
+    assert entry_data[DATA_LAST_UPDATED] == PREFETCHED_AT
+    assert entry_data[DATA_STALE] is False
+    assert entry_data[DATA_NEXT_DAY] is None
+    assert entry_data[DATA_AGGREGATOR].has_day(MONDAY)
+    entry_data[DATA_STORE].async_delay_save.assert_called_once()
+
+
+async def test_without_prefetch_the_payload_goes_stale(hass: HomeAssistant) -> None:
+    entry, entry_data = _setup(hass, date(2026, 10, 9), None)
+
+    assert not _rollover(hass, entry, date(2026, 10, 10))
+
+    assert entry_data[DATA_STALE] is True
+    assert entry_data[DATA_PAYLOAD].date == "2026-10-09"
+
+
+async def test_prefetch_for_a_later_day_is_kept(hass: HomeAssistant) -> None:
+    """Saturday night: Monday's prefetch waits for Monday."""
+    entry, entry_data = _setup(hass, date(2026, 10, 10), MONDAY)
+
+    assert not _rollover(hass, entry, date(2026, 10, 11))
+
+    assert entry_data[DATA_STALE] is True
+    assert entry_data[DATA_NEXT_DAY]["fingerprint"][0] == MONDAY
+
+
+async def test_outdated_prefetch_is_dropped(hass: HomeAssistant) -> None:
+    entry, entry_data = _setup(hass, date(2026, 10, 9), date(2026, 10, 10))
+
+    assert not _rollover(hass, entry, MONDAY)
+
+    assert entry_data[DATA_NEXT_DAY] is None
+    assert entry_data[DATA_STALE] is True
+
+
+async def test_current_day_is_left_alone(hass: HomeAssistant) -> None:
+    entry, entry_data = _setup(hass, MONDAY, date(2026, 10, 13))
+
+    assert not _rollover(hass, entry, MONDAY)
+
+    assert entry_data[DATA_STALE] is False
+    assert entry_data[DATA_NEXT_DAY] is not None
+
+
+@pytest.mark.parametrize(
+    ("today", "school_days", "expected"),
+    [
+        (date(2026, 10, 16), ["0", "1", "2", "3", "4", "5"], date(2026, 10, 17)),
+        (date(2026, 10, 16), ["0", "1", "2", "3", "4"], MONDAY),
+        (date(2026, 10, 17), ["0", "1", "2", "3", "4"], MONDAY),
+        (MONDAY, [], None),
+    ],
+)
+async def test_next_school_day(
+    hass: HomeAssistant, today: date, school_days: list, expected
+) -> None:
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={"student_id": 1},
+        options={CONF_SCHOOL_DAYS: school_days},
+    )
+    assert ProfiMaktabNextDay(hass, entry).next_school_day(today) == expected
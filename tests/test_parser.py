@@ -0,0 +1,141 @@
+"""Parity of the diary parser with the original dict-based parse_dairy."""
+from __future__ import annotations
+
+from statistics import mean
+from typing import Any, Dict, List
+
+import pytest
+
+from custom_components.profimaktab.model import DairyDay
+from custom_components.profimaktab.parser import MISSING, parse_dairy_batch
+
+
+def _baseline_parse_dairy(
+    dairy: List[Dict[str, Any]], *, student: str, date: str
+) -> Dict[str, Any]:
+    """parse_dairy as it was before the columnar parser."""
+    lessons = []
+    marks: List[int] = []
+
+    for item in sorted(dairy, key=lambda x: x.get("lesson_order", 0)):
+        subject = item.get("subject", {}).get("name")
+        themes = item.get("themes") or []
+        topic = themes[0]["title"] if themes else None
+        homework = themes[0].get("notes") if themes else None
+
+        mark_value = None
+        mark_reason = None
+        if item.get("marks"):
+            m = item["marks"][0]
+            mark_value = str(m.get("value"))
+            mark_reason = m.get("reason")
+            try:
+                marks.append(int(mark_value))
+            except Exception:
+                pass
+
+        lessons.append(
+            {
+                "lesson": item.get("lesson_order"),
+                "subject": subject,
+                "topic": topic,
+                "homework": homework,
+                "mark": (
+                    {"value": mark_value, "reason": mark_reason}
+                    if mark_value
+                    else None
+                ),
+            }
+        )
+
+    return {
+        "date": date,
+        "student": student,
+        "lessons": lessons,
+        "lesson_count": len(lessons),
+        "marks": marks,
+        "marks_count": len(marks),
+        "average": round(mean(marks), 1) if marks else 0,
+    }
+
+
+def _lesson(order, subject="Matematika", mark=None, **extra) -> Dict[str, Any]:
+    item: Dict[str, Any] = {"subject": {"name": subject}, **extra}
+    if order is not MISSING:
+        item["lesson_order"] = order
+    if mark is not None:
+        item["marks"] = [{"value": mark, "reason": "Javob"}]
+    return item
+
+
+DAYS = {
+    "ints": [
+        _lesson(2, "Fizika", 4, themes=[{"title": "Kuch", "notes": "3-mashq"}]),
+        _lesson(1, mark="5"),
+        _lesson(3, "Tarix", themes=[{"title": "Temuriylar"}]),
+    ],
+    "string_orders": [_lesson("2", mark=5), _lesson("1", "Fizika", mark=3)],
+    "float_orders": [_lesson(2.0, mark=4), _lesson(1.0, "Tarix")],
+    "odd_orders": [_lesson(None, mark=5)],
+    "missing_order": [_lesson(MISSING, mark=2), _lesson(1, "Fizika")],
+    "odd_marks": [
+        _lesson(1, mark=5.0),
+        _lesson(2, "Fizika", mark="н"),
+        _lesson(3, "Tarix", mark=" 4 "),
+        _lesson(4, "Kimyo", marks=[{"value": None}]),
+        _lesson(5, "Ona tili", marks=[]),
+    ],
+    "no_subject": [{"lesson_order": 1, "marks": [{"value": 3}]}],
+}
+
+
+@pytest.mark.parametrize("name", sorted(DAYS))
+def test_parse_matches_baseline(name: str) -> None:
+    dairy = DAYS[name]
+    expected = _baseline_parse_dairy(dairy, student="Ali", date="2026-10-12")
+
+    assert DairyDay.parse(dairy, student="Ali", date="2026-10-12").as_dict() == (
+        expected
+    )
+
+
+def test_batch_days_match_baseline() -> None:
+    names = sorted(DAYS)
+    batch = parse_dairy_batch(
+        (f"2026-10-{10 + number}", DAYS[name]) for number, name in enumerate(names)
+    )
+
+    for number, name in enumerate(names):
+        date = f"2026-10-{10 + number}"
+        expected = _baseline_parse_dairy(DAYS[name], student="Ali", date=date)
+        assert DairyDay.from_batch(batch, number, student="Ali").as_dict() == expected
+        assert batch.day_marks(number) == expected["marks"]
+
+
+def test_out_of_range_values_do_not_fail_the_day() -> None:
+    """Values that do not fit the integer columns are kept, not counted."""
+    dairy = [
+        _lesson(1, mark="99999999999"),
+        _lesson(2**40, "Fizika", mark=2**40),
+        _lesson("first", "Tarix", mark=-(2**31)),
+        _lesson(3, "Kimyo", mark=5),
+    ]
+
+    payload = DairyDay.parse(dairy, student="Ali", date="2026-10-12").as_dict()
+
+    # Orders that are not numbers sort as 0
+    assert [lesson["lesson"] for lesson in payload["lessons"]] == [
+        "first",
+        1,
+        3,
+        2**40,
+    ]
+    assert [lesson["mark"]["value"] for lesson in payload["lessons"]] == [
+        str(-(2**31)),
+        "99999999999",
+        "5",
+        str(2**40),
+    ]
+    # Only marks that fit are numeric marks
+    assert payload["marks"] == [5]
+    assert payload["average"] == 5
@@ -0,0 +1,108 @@
+"""Tests for the shared token-bucket request scheduler."""
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from custom_components.profimaktab.ratelimit import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    RequestScheduler,
+    interactive_requests,
+    request_priority,
+)
+
+
+async def _run_queued(scheduler: RequestScheduler, requests) -> list:
+    """Queue (label, account, student, priority) requests; return grant order."""
+    order = []
+
+    async def _request(label, account, student, priority):
+        await scheduler.acquire(account, student, priority)
+        order.append(label)
+
+    tasks = [asyncio.create_task(_request(*request)) for request in requests]
+    await asyncio.gather(*tasks)
+    return order
+
+
+async def test_burst_is_granted_without_waiting() -> None:
+    scheduler = RequestScheduler(rate=1, burst=3)
+    started = time.monotonic()
+    for _ in range(3):
+        await scheduler.acquire("parent")
+    assert time.monotonic() - started < 0.1
+    assert scheduler.granted == 3
+    assert scheduler.waited == 0
+
+
+async def test_interactive_requests_go_first() -> None:
+    scheduler = RequestScheduler(rate=200, burst=1)
+    await scheduler.acquire("parent")
+
+    order = await _run_queued(
+        scheduler,
+        [
+            ("background-1", "parent", "1", PRIORITY_BACKGROUND),
+            ("background-2", "parent", "1", PRIORITY_BACKGROUND),
+            ("interactive", "parent", "1", PRIORITY_INTERACTIVE),
+        ],
+    )
+    assert order == ["interactive", "background-1", "background-2"]
+
+
+async def test_round_robin_over_accounts_and_students() -> None:
+    scheduler = RequestScheduler(rate=200, burst=1)
+    await scheduler.acquire("busy")
+
+    order = await _run_queued(
+        scheduler,
+        [
+            ("busy/1a", "busy", "1", PRIORITY_BACKGROUND),
+            ("busy/1b", "busy", "1", PRIORITY_BACKGROUND),
+            ("busy/1c", "busy", "1", PRIORITY_BACKGROUND),
+            ("busy/2a", "busy", "2", PRIORITY_BACKGROUND),
+            ("quiet/3a", "quiet", "3", PRIORITY_BACKGROUND),
+        ],
+    )
+    # One busy account (and one busy student) cannot starve the others
+    assert order == ["busy/1a", "quiet/3a", "busy/2a", "busy/1b", "busy/1c"]
+    assert scheduler.max_queue_depth == 5
+    assert scheduler.queue_depth == 0
+
+
+def test_priority_follows_the_context() -> None:
+    assert request_priority.get() == PRIORITY_BACKGROUND
+    with interactive_requests():
+        assert request_priority.get() == PRIORITY_INTERACTIVE
+    assert request_priority.get() == PRIORITY_BACKGROUND
+
+
+async def test_cancelled_waiter_leaves_the_queue() -> None:
+    scheduler = RequestScheduler(rate=1, burst=1)
+    await scheduler.acquire("parent")
+
+    waiter = asyncio.create_task(scheduler.acquire("parent", "1"))
+    await asyncio.sleep(0)
+    assert scheduler.queue_depth == 1
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert scheduler.queue_depth == 0
+    assert scheduler.granted == 1
+
+
+async def test_rate_limits_throughput() -> None:
+    scheduler = RequestScheduler(rate=50, burst=1)
+    started = time.monotonic()
+    for _ in range(6):
+        await scheduler.acquire("parent")
+    # 1 from the burst, then 5 refills at 50/s
+    assert time.monotonic() - started >= 0.09
+    stats = scheduler.as_dict()
+    assert stats["granted"] == 6
+    assert stats["waited"] == 5
+    assert stats["wait_max_ms"] > 0
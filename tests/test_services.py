@@ -0,0 +1,80 @@
+"""Tests for the profimaktab.refresh service."""
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, patch
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from custom_components.profimaktab.api import ProfiMaktabClient
+from custom_components.profimaktab.const import (
+    DATA_STALE,
+    DOMAIN,
+    SERVICE_REFRESH,
+)
+
+DAIRY = [
+    {
+        "lesson_order": 1,
+        "subject": {"id": 1, "name": "Matematika"},
+        "themes": [{"title": "Kasrlar", "notes": "12-mashq"}],
+        "marks": [{"value": 5, "reason": "Javob"}],
+    }
+]
+
+
+async def test_refresh_fetches_stale_today(hass: HomeAssistant) -> None:
+    """A stale payload for today is fetched again and returned."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="Ali",
+        unique_id="1",
+        data={
+            CONF_USERNAME: "parent",
+            CONF_PASSWORD: "secret",
+            "contact_id": 7,
+            "student_id": 1,
+            "student_name": "Ali",
+        },
+    )
+    entry.add_to_hass(hass)
+
+    get_dairy = AsyncMock(return_value=(DAIRY, "etag:1"))
+    with (
+        patch.object(ProfiMaktabClient, "async_get_dairy_if_changed", get_dairy),
+        patch.object(
+            ProfiMaktabClient,
+            "async_get_student_contacts",
+            AsyncMock(return_value={"students": []}),
+        ),
+        patch.object(
+            ProfiMaktabClient, "async_get_student", AsyncMock(return_value={})
+        ),
+    ):
+        assert await hass.config_entries.async_setup(entry.entry_id)
+        # Initial update and child discovery run as background tasks
+        await hass.async_block_till_done(wait_background_tasks=True)
+
+        hass.data[DOMAIN][entry.entry_id][DATA_STALE] = True
+        get_dairy.reset_mock()
+
+        response = await hass.services.async_call(
+            DOMAIN,
+            SERVICE_REFRESH,
+            {"student": "Ali"},
+            blocking=True,
+            return_response=True,
+        )
+
+    assert get_dairy.await_count == 1
+    student = response["students"][0]
+    assert student["fetched"] == 1
+    assert student["cached"] == 0
+    [day] = student["days"]
+    assert day["lessons"][0]["subject"] == "Matematika"
+    assert day["marks"] == [5]
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
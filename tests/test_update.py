@@ -0,0 +1,86 @@
+"""Tests for the update path: change events and student names."""
+from __future__ import annotations
+
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_capture_events,
+)
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.profimaktab.const import (
+    DATA_STUDENT_INFO,
+    DOMAIN,
+    EVENT_HOMEWORK_CHANGED,
+    EVENT_NEW_MARK,
+)
+from custom_components.profimaktab.model import DairyDay
+from custom_components.profimaktab.update import (
+    _async_fire_changes,
+    student_display_name,
+)
+
+
+def _day(mark=None, homework="12-mashq") -> DairyDay:
+    lesson = {
+        "lesson_order": 1,
+        "subject": {"name": "Matematika"},
+        "themes": [{"title": "Kasrlar", "notes": homework}],
+    }
+    if mark is not None:
+        lesson["marks"] = [{"value": mark, "reason": "Javob"}]
+    return DairyDay.parse([lesson], student="Ali", date="2026-10-12")
+
+
+async def test_events_carry_only_the_changed_lesson(hass: HomeAssistant) -> None:
+    entry = MockConfigEntry(domain=DOMAIN, data={"student_id": 1})
+    marks = async_capture_events(hass, EVENT_NEW_MARK)
+    homework = async_capture_events(hass, EVENT_HOMEWORK_CHANGED)
+
+    _async_fire_changes(hass, entry, _day(), _day(mark="5", homework="13-mashq"))
+    await hass.async_block_till_done()
+
+    [mark] = marks
+    assert mark.data == {
+        "config_entry_id": entry.entry_id,
+        "student_id": 1,
+        "student": "Ali",
+        "date": "2026-10-12",
+        "lesson": 1,
+        "subject": "Matematika",
+        "topic": "Kasrlar",
+        "mark": "5",
+        "numeric_mark": 5,
+        "reason": "Javob",
+        "previous_mark": None,
+    }
+    [change] = homework
+    assert change.data["homework"] == "13-mashq"
+    assert change.data["previous_homework"] == "12-mashq"
+
+
+async def test_no_events_without_changes(hass: HomeAssistant) -> None:
+    entry = MockConfigEntry(domain=DOMAIN, data={"student_id": 1})
+    marks = async_capture_events(hass, EVENT_NEW_MARK)
+    homework = async_capture_events(hass, EVENT_HOMEWORK_CHANGED)
+
+    _async_fire_changes(hass, entry, _day(mark="5"), _day(mark="5"))
+    await hass.async_block_till_done()
+
+    assert marks == []
+    assert homework == []
+
+
+async def test_student_display_name(hass: HomeAssistant) -> None:
+    """The refreshed student name wins over the one chosen at setup."""
+    entry = MockConfigEntry(
+        domain=DOMAIN, data={"student_id": 1, "student_name": "Ali"}
+    )
+    # Not loaded yet
+    assert student_display_name(hass, entry) == "Ali"
+
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {DATA_STUDENT_INFO: None}
+    assert student_display_name(hass, entry) == "Ali"
+
+    hass.data[DOMAIN][entry.entry_id][DATA_STUDENT_INFO] = {"name": "Ali Valiyev"}
+    assert student_display_name(hass, entry) == "Ali Valiyev"